@@ -1,13 +1,40 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from app.config import Config
 from app.models.db import db
-from app.routes.session_api import ns as session_ns
-from app.routes.execution_api import ns as execution_ns
-from app.routes import code_session_route, execution_routes, health_routes
 from app.celery_app import init_celery
-from app.api import api
+
+ETAG_PATH_PREFIXES = (
+    '/executions',
+    '/code-sessions',
+    '/api/v1/executions',
+    '/api/v1/code-sessions',
+)
+
+def init_db(app):
+    """Create missing tables (``flask --app main init-db``, or AUTO_CREATE_SCHEMA=true)"""
+    from app.models import code_sessions_model, execution_archive_model, execution_model  # noqa: F401 (register the tables)
+    from app.services import execution_archive
+    with app.app_context():
+        db.create_all()
+        execution_archive.ensure_partitions()
+
+
+def create_worker_app():
+    """Minimal app for Celery workers: config, the DB engine and Celery, no HTTP layer"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    init_celery(app)
+    return app
+
 
 def create_app():
+    # the HTTP layer (flask-restx, Swagger models, routes) is only imported by the API
+    from app.api import api
+    from app.routes.session_api import ns as session_ns
+    from app.routes.execution_api import ns as execution_ns
+    from app.routes import code_session_route, execution_routes, health_routes
+
     app = Flask(__name__)
     app.config.from_object(Config)
     
@@ -16,8 +43,14 @@ def create_app():
     db.init_app(app)
     init_celery(app)
 
-    with app.app_context():
-        db.create_all()
+    if Config.AUTO_CREATE_SCHEMA:
+        init_db(app)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database tables"""
+        init_db(app)
+        print("Database tables created")
     
     # Initialize API with Swagger
     api.init_app(app)
@@ -43,6 +76,19 @@ def create_app():
     def health():
         return jsonify({"status": "healthy"})
     
+    # Strong ETags on session/execution reads: unchanged resources answer 304
+    @app.after_request
+    def add_etag(response):
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.is_streamed
+            and request.path.startswith(ETAG_PATH_PREFIXES)
+        ):
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+    
     
     return app
 
@@ -1,7 +1,26 @@
 from celery import Celery
+from kombu import Queue
+from app.config import Config
 
 celery = Celery('livecode_execution')
 
+# One queue per language so a burst of slow C++ builds cannot delay Python snippets
+EXECUTION_QUEUES = {
+    'python': 'exec.python',
+    'javascript': 'exec.javascript',
+    'c++': 'exec.cpp',
+}
+DEFAULT_QUEUE = 'celery'
+
+
+def route_execution(name, args, kwargs, options, task=None, **kw):
+    """Celery router: send execute_code_task to its language's queue"""
+    if name != 'execute_code_task':
+        return None
+    language = kwargs.get('language') if len(args) < 2 else args[1]
+    return {'queue': EXECUTION_QUEUES.get(language, DEFAULT_QUEUE)}
+
+
 def init_celery(app):
     """Initialize Celery with Flask app context"""
     celery.conf.update(
@@ -12,7 +31,29 @@ def init_celery(app):
         accept_content=['json'],
         timezone='UTC',
         enable_utc=True,
-        imports=['app.tasks.execution_tasks'], 
+        imports=['app.tasks.execution_tasks', 'app.tasks.session_tasks', 'app.tasks.retention_tasks'],
+        worker_pool=Config.WORKER_POOL,
+        worker_concurrency=Config.worker_concurrency(),
+        # one task per free slot, so queued jobs go to whichever worker is idle
+        worker_prefetch_multiplier=1,
+        # workers started without -Q consume every queue
+        task_default_queue=DEFAULT_QUEUE,
+        task_queues=[Queue(DEFAULT_QUEUE)] + [Queue(name) for name in EXECUTION_QUEUES.values()],
+        task_routes=(route_execution,),
+        # coalesced autosaves reach Postgres at most this late (run `celery beat`)
+        beat_schedule={
+            'flush-session-drafts': {
+                'task': 'flush_session_drafts',
+                'schedule': Config.SESSION_FLUSH_INTERVAL,
+                'options': {'expires': Config.SESSION_FLUSH_INTERVAL},
+            },
+            # executions older than EXECUTION_RETENTION_DAYS move to EXECUTION_ARCHIVE_DIR
+            'archive-executions': {
+                'task': 'archive_executions',
+                'schedule': Config.EXECUTION_ARCHIVE_INTERVAL,
+                'options': {'expires': Config.EXECUTION_ARCHIVE_INTERVAL},
+            },
+        },
     )
     
     class ContextTask(celery.Task):
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -16,7 +17,11 @@ class Config:
         database_url = database_url.replace("postgres://", "postgresql://", 1)
     SQLALCHEMY_DATABASE_URI = database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # create missing tables when the API starts; otherwise run `flask --app main init-db` once per deploy
+    AUTO_CREATE_SCHEMA = os.getenv('AUTO_CREATE_SCHEMA', 'False').lower() == 'true'
     
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
     # Celery config
     CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -24,10 +29,141 @@ class Config:
     CELERY_RESULT_SERIALIZER = 'json'
     CELERY_ACCEPT_CONTENT = ['json']
     CELERY_TIMEZONE = 'UTC'
-    
+
+    # Celery worker execution model. Tasks mostly wait on a child process, so the
+    # threads pool runs many programs at once in one worker process. Concurrency is
+    # WORKER_CONCURRENCY_PER_CPU per available core, capped at WORKER_MAX_CONCURRENCY.
+    WORKER_POOL = os.getenv('WORKER_POOL', 'threads')
+    WORKER_CONCURRENCY_PER_CPU = int(os.getenv('WORKER_CONCURRENCY_PER_CPU', '4'))
+    WORKER_MAX_CONCURRENCY = int(os.getenv('WORKER_MAX_CONCURRENCY', '32'))
+
+    # Workers publish a heartbeat (queues, concurrency, in-flight) to Redis every
+    # WORKER_HEARTBEAT_INTERVAL seconds; a worker missing for WORKER_HEARTBEAT_TTL is gone
+    WORKER_HEARTBEAT_INTERVAL = int(os.getenv('WORKER_HEARTBEAT_INTERVAL', '5'))
+    WORKER_HEARTBEAT_TTL = int(os.getenv('WORKER_HEARTBEAT_TTL', '15'))
+
+    # Prometheus exporter port on each worker (0 disables; the API serves GET /metrics)
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '9808'))
+
+    # Language runners: default time limits, per-worker-process slot limits
+    # ("c++=4,python=0", 0 = no limit), plugin modules that register more runners, and
+    # how long a task waits for a slot before it is requeued RUNNER_REQUEUE_DELAY seconds later
+    EXECUTION_TIMEOUT = int(os.getenv('EXECUTION_TIMEOUT', '30'))
+    COMPILE_TIMEOUT = int(os.getenv('COMPILE_TIMEOUT', '10'))
+    RUNNER_MAX_CONCURRENCY = os.getenv('RUNNER_MAX_CONCURRENCY', '')
+    RUNNER_PLUGINS = os.getenv('RUNNER_PLUGINS', '')
+    RUNNER_SLOT_WAIT = float(os.getenv('RUNNER_SLOT_WAIT', '0.5'))
+    RUNNER_REQUEUE_DELAY = float(os.getenv('RUNNER_REQUEUE_DELAY', '1'))
+
+    # Kernel-enforced limits on user programs (0 = unlimited); RUNNER_LIMITS overrides them
+    # per language ("javascript.memory_mb=4096,c++.cpu_seconds=5"). EXECUTION_CGROUP_ROOT is
+    # a delegated cgroup v2 directory for per-execution sub-groups (empty = rlimits only).
+    # EXECUTION_MAX_PROCESSES is the cgroup's pids.max. RLIMIT_NPROC counts every process of
+    # the worker's user, so EXECUTION_RLIMIT_NPROC is off unless executions run as their own user
+    EXECUTION_LIMITS_ENABLED = os.getenv('EXECUTION_LIMITS_ENABLED', 'True').lower() == 'true'
+    EXECUTION_MEMORY_LIMIT_MB = int(os.getenv('EXECUTION_MEMORY_LIMIT_MB', '512'))
+    EXECUTION_CPU_LIMIT = int(os.getenv('EXECUTION_CPU_LIMIT', '10'))
+    EXECUTION_MAX_PROCESSES = int(os.getenv('EXECUTION_MAX_PROCESSES', '256'))
+    EXECUTION_MAX_FILE_SIZE_MB = int(os.getenv('EXECUTION_MAX_FILE_SIZE_MB', '16'))
+    EXECUTION_RLIMIT_NPROC = int(os.getenv('EXECUTION_RLIMIT_NPROC', '0'))
+    RUNNER_LIMITS = os.getenv('RUNNER_LIMITS', '')
+    EXECUTION_CGROUP_ROOT = os.getenv('EXECUTION_CGROUP_ROOT', '')
+
+    # Warm runtime pool (pre-started Python fork-servers / Node.js runners per worker)
+    RUNTIME_POOL_ENABLED = os.getenv('RUNTIME_POOL_ENABLED', 'True').lower() == 'true'
+    RUNTIME_POOL_SIZE = int(os.getenv('RUNTIME_POOL_SIZE', '2'))
+    RUNTIME_POOL_MAX_USES = int(os.getenv('RUNTIME_POOL_MAX_USES', '200'))
+
+    # Compiled C++ binary cache (shared by all workers on one host)
+    CPP_CACHE_ENABLED = os.getenv('CPP_CACHE_ENABLED', 'True').lower() == 'true'
+    CPP_CACHE_DIR = os.getenv('CPP_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'livecode-cpp-cache'))
+    CPP_CACHE_MAX_BYTES = int(os.getenv('CPP_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+    # Precompiled headers for the leading standard includes of C++ programs
+    # (';' separates the include sets built at worker start, ',' the headers in a set)
+    CPP_PCH_ENABLED = os.getenv('CPP_PCH_ENABLED', 'True').lower() == 'true'
+    CPP_PCH_WARM = os.getenv('CPP_PCH_WARM', 'bits/stdc++.h;iostream')
+    CPP_PCH_MAX_SETS = int(os.getenv('CPP_PCH_MAX_SETS', '8'))
+    CPP_PCH_BUILD_TIMEOUT = int(os.getenv('CPP_PCH_BUILD_TIMEOUT', '120'))
+
+    # Task messages carry a content hash; the source is stored once in Redis for
+    # SOURCE_TTL seconds (must outlive the longest queue wait) and cached by workers
+    SOURCE_TTL = int(os.getenv('SOURCE_TTL', '86400'))
+    SOURCE_LOCAL_CACHE_BYTES = int(os.getenv('SOURCE_LOCAL_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+    # Result memoization for byte-identical programs (opt-in)
+    RESULT_MEMO_ENABLED = os.getenv('RESULT_MEMO_ENABLED', 'False').lower() == 'true'
+    RESULT_MEMO_TTL = int(os.getenv('RESULT_MEMO_TTL', '3600'))
+    RESULT_MEMO_MAX_ENTRIES = int(os.getenv('RESULT_MEMO_MAX_ENTRIES', '10000'))
+
+    # Output capture: each stream keeps a head+tail of MAX_OUTPUT_SIZE bytes and the
+    # program is killed (OUTPUT_LIMIT) once it has written OUTPUT_KILL_LIMIT bytes
+    MAX_OUTPUT_SIZE = int(os.getenv('MAX_OUTPUT_SIZE', str(1024 * 100)))
+    OUTPUT_KILL_LIMIT = int(os.getenv('OUTPUT_KILL_LIMIT', str(1024 * 1024)))
+
+    # Output storage: streams above OUTPUT_INLINE_LIMIT bytes move to execution_outputs
+    # (the executions row keeps a preview) and are zlib-compressed above the threshold
+    OUTPUT_INLINE_LIMIT = int(os.getenv('OUTPUT_INLINE_LIMIT', '1024'))
+    OUTPUT_COMPRESS_THRESHOLD = int(os.getenv('OUTPUT_COMPRESS_THRESHOLD', '2048'))
+
+    # Live output streaming (Server-Sent Events)
+    EXECUTION_EVENTS_TTL = int(os.getenv('EXECUTION_EVENTS_TTL', '3600'))
+    MAX_STREAMED_OUTPUT = int(os.getenv('MAX_STREAMED_OUTPUT', str(1024 * 100)))
+    STREAM_HEARTBEAT_SECONDS = int(os.getenv('STREAM_HEARTBEAT_SECONDS', '15'))
+    STREAM_IDLE_TIMEOUT = int(os.getenv('STREAM_IDLE_TIMEOUT', '60'))
+
+    # Upper bound for GET /executions/<id>?wait=<seconds> long-polls
+    LONG_POLL_MAX_WAIT = int(os.getenv('LONG_POLL_MAX_WAIT', '30'))
+
+    # Admission control, checked before an execution is queued (0 disables a limit).
+    # SESSION_QUOTA_TTL=0 keeps the per-session quota for the session's lifetime.
+    SESSION_MAX_EXECUTIONS = int(os.getenv('SESSION_MAX_EXECUTIONS', '100'))
+    SESSION_QUOTA_TTL = int(os.getenv('SESSION_QUOTA_TTL', '0'))
+    SESSION_RATE_LIMIT = int(os.getenv('SESSION_RATE_LIMIT', '10'))
+    SESSION_RATE_WINDOW = int(os.getenv('SESSION_RATE_WINDOW', '60'))
+    GLOBAL_RATE_LIMIT = int(os.getenv('GLOBAL_RATE_LIMIT', '0'))
+    GLOBAL_RATE_WINDOW = int(os.getenv('GLOBAL_RATE_WINDOW', '60'))
+
+    # Redis read cache for GET /executions/<id> and GET /code-sessions/<id>; QUEUED/RUNNING
+    # executions are cached for READ_CACHE_ACTIVE_TTL only, finished ones for READ_CACHE_TTL
+    READ_CACHE_ENABLED = os.getenv('READ_CACHE_ENABLED', 'True').lower() == 'true'
+    READ_CACHE_TTL = int(os.getenv('READ_CACHE_TTL', '3600'))
+    READ_CACHE_ACTIVE_TTL = int(os.getenv('READ_CACHE_ACTIVE_TTL', '5'))
+    SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', '300'))
+
+    # Page size for GET /executions/session/<id> (?limit= is capped at EXECUTION_PAGE_MAX)
+    EXECUTION_PAGE_SIZE = int(os.getenv('EXECUTION_PAGE_SIZE', '50'))
+    EXECUTION_PAGE_MAX = int(os.getenv('EXECUTION_PAGE_MAX', '200'))
+
+    # Autosave drafts live in Redis and are flushed to Postgres every
+    # SESSION_FLUSH_INTERVAL seconds (and before a Run); flushed drafts expire after SESSION_DRAFT_TTL
+    SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '5'))
+    SESSION_DRAFT_TTL = int(os.getenv('SESSION_DRAFT_TTL', '3600'))
+
+    # Executions queued more than EXECUTION_RETENTION_DAYS ago (0 = keep forever) are moved to
+    # gzip JSON Lines files under EXECUTION_ARCHIVE_DIR every EXECUTION_ARCHIVE_INTERVAL seconds,
+    # at most EXECUTION_ARCHIVE_BATCH x EXECUTION_ARCHIVE_MAX_BATCHES per run. Restored executions
+    # stay for EXECUTION_RESTORE_DAYS; Postgres keeps EXECUTION_PARTITIONS_AHEAD monthly partitions ready
+    EXECUTION_RETENTION_DAYS = int(os.getenv('EXECUTION_RETENTION_DAYS', '90'))
+    EXECUTION_ARCHIVE_DIR = os.getenv('EXECUTION_ARCHIVE_DIR', 'archive')
+    EXECUTION_ARCHIVE_INTERVAL = float(os.getenv('EXECUTION_ARCHIVE_INTERVAL', '3600'))
+    EXECUTION_ARCHIVE_BATCH = int(os.getenv('EXECUTION_ARCHIVE_BATCH', '5000'))
+    EXECUTION_ARCHIVE_MAX_BATCHES = int(os.getenv('EXECUTION_ARCHIVE_MAX_BATCHES', '20'))
+    EXECUTION_RESTORE_DAYS = int(os.getenv('EXECUTION_RESTORE_DAYS', '7'))
+    EXECUTION_PARTITIONS_AHEAD = int(os.getenv('EXECUTION_PARTITIONS_AHEAD', '3'))
+
+    # Largest number of sessions accepted by POST /executions/batch
+    BATCH_MAX_SESSIONS = int(os.getenv('BATCH_MAX_SESSIONS', '500'))
+
     # adding debug mode
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     
+    @staticmethod
+    def worker_concurrency():
+        """Programs a worker process runs at once"""
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        return max(1, min(Config.WORKER_MAX_CONCURRENCY, Config.WORKER_CONCURRENCY_PER_CPU * cpus))
+
     @staticmethod
     def init_app(app):
         print(f"Database URI: {Config.SQLALCHEMY_DATABASE_URI}")  # Debug print
@@ -0,0 +1,135 @@
+"""Prometheus metrics for the API (``GET /metrics``) and the workers (exporter on WORKER_METRICS_PORT).
+
+Workers record per-execution histograms, timeouts, truncations and in-flight
+executions. The API counts admission rejections and reports queue depth by
+reading the broker's Redis lists at scrape time.
+
+With several processes per container (gunicorn workers, prefork pool) set
+PROMETHEUS_MULTIPROC_DIR to an empty directory so every process's samples are
+aggregated into one scrape.
+"""
+import logging
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess, start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily
+from app.config import Config
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# seconds; executions range from a warm Python print to a 30s C++ timeout
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+QUEUE_WAIT = Histogram(
+    'livecode_execution_queue_wait_seconds', 'Time from queued_at to started_at',
+    ['language', 'status'], buckets=LATENCY_BUCKETS
+)
+COMPILE_TIME = Histogram(
+    'livecode_execution_compile_seconds', 'Compile time, including compile cache lookups (C++)',
+    ['language', 'status'], buckets=LATENCY_BUCKETS
+)
+RUN_TIME = Histogram(
+    'livecode_execution_run_seconds', 'Time spent running the program',
+    ['language', 'status'], buckets=LATENCY_BUCKETS
+)
+LATENCY = Histogram(
+    'livecode_execution_latency_seconds', 'Time from queued_at to finished_at',
+    ['language', 'status'], buckets=LATENCY_BUCKETS
+)
+EXECUTIONS = Counter('livecode_executions_total', 'Finished executions', ['language', 'status'])
+TIMEOUTS = Counter('livecode_execution_timeouts_total', 'Executions killed by the time limit', ['language'])
+TRUNCATIONS = Counter(
+    'livecode_execution_truncations_total', 'Executions whose output was truncated or hit the kill limit',
+    ['language']
+)
+REJECTIONS = Counter(
+    'livecode_admission_rejections_total', 'Executions refused by admission control', ['reason']
+)
+REQUEUES = Counter(
+    'livecode_runner_requeues_total', 'Executions sent back to the queue because every runner slot was busy',
+    ['language']
+)
+IN_FLIGHT = Gauge(
+    'livecode_executions_in_flight', 'Executions running on this worker', ['language'],
+    multiprocess_mode='livesum'
+)
+
+
+class QueueDepthCollector:
+    """``livecode_queue_depth``: messages waiting in each Celery queue, read from Redis on scrape"""
+
+    def collect(self):
+        from app.celery_app import DEFAULT_QUEUE, EXECUTION_QUEUES
+
+        gauge = GaugeMetricFamily('livecode_queue_depth', 'Messages waiting in a Celery queue', labels=['queue'])
+        queues = [DEFAULT_QUEUE] + list(EXECUTION_QUEUES.values())
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for queue in queues:
+                pipe.llen(queue)
+            for queue, depth in zip(queues, pipe.execute()):
+                gauge.add_metric([queue], depth)
+        except Exception as e:
+            logger.warning(f"Could not read queue depth: {str(e)}")
+            return
+        yield gauge
+
+
+_queue_depth_registered = False
+
+
+def _registry():
+    """The registry to expose: this process's, or all processes' in multiprocess mode"""
+    global _queue_depth_registered
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(QueueDepthCollector())
+        return registry
+    if not _queue_depth_registered:
+        REGISTRY.register(QueueDepthCollector())
+        _queue_depth_registered = True
+    return REGISTRY
+
+
+def render():
+    """``(body, content_type)`` for GET /metrics"""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_worker_exporter():
+    """Serve the worker's metrics on WORKER_METRICS_PORT (0 disables it)"""
+    if not Config.WORKER_METRICS_PORT:
+        return
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    try:
+        start_http_server(Config.WORKER_METRICS_PORT, registry=registry)
+        logger.info(f"Worker metrics on :{Config.WORKER_METRICS_PORT}/metrics")
+    except OSError as e:
+        logger.warning(f"Could not start the worker metrics exporter: {str(e)}")
+
+
+def observe_execution(language, status, queued_at, started_at, finished_at,
+                      execution_time_ms=None, compile_time_ms=None, truncated=False):
+    """Record one finished execution"""
+    language = language or 'unknown'
+    labels = (language, status)
+    EXECUTIONS.labels(*labels).inc()
+    if queued_at and started_at:
+        QUEUE_WAIT.labels(*labels).observe((started_at - queued_at).total_seconds())
+    if queued_at and finished_at:
+        LATENCY.labels(*labels).observe((finished_at - queued_at).total_seconds())
+    if compile_time_ms is not None:
+        COMPILE_TIME.labels(*labels).observe(compile_time_ms / 1000)
+    if execution_time_ms is not None:
+        RUN_TIME.labels(*labels).observe(max(execution_time_ms - (compile_time_ms or 0), 0) / 1000)
+    if status == 'TIMEOUT':
+        TIMEOUTS.labels(language).inc()
+    if truncated or status == 'OUTPUT_LIMIT':
+        TRUNCATIONS.labels(language).inc()
@@ -10,6 +10,7 @@ class CodeSession(db.Model):
     language = db.Column(db.String(20), nullable=False)
     source_code = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), nullable=False, default="ACTIVE")
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     executions = db.relationship("Execution", backref="session", lazy=True, cascade="all, delete-orphan")
@@ -0,0 +1,16 @@
+from datetime import datetime
+from app.models.db import db
+
+
+class ExecutionArchive(db.Model):
+    """Where an archived execution lives: one gzip member of a file under EXECUTION_ARCHIVE_DIR"""
+    __tablename__ = "execution_archive"
+
+    execution_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    session_id = db.Column(db.UUID(as_uuid=True), nullable=False, index=True)
+    queued_at = db.Column(db.DateTime, nullable=False)
+    archive_file = db.Column(db.String(255), nullable=False)  # relative to EXECUTION_ARCHIVE_DIR
+    byte_offset = db.Column(db.BigInteger, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    restored_at = db.Column(db.DateTime)
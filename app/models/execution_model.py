@@ -1,17 +1,44 @@
 import uuid
 from datetime import datetime
 from app.models.db import db
+from app.models.execution_output_model import ExecutionOutput  # noqa: F401 (relationship target)
 
 
 class Execution(db.Model):
     __tablename__ = "executions"
 
     id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey("code_sessions.id"), nullable=False, index=True)
+    session_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey("code_sessions.id"), nullable=False)
+    batch_id = db.Column(db.UUID(as_uuid=True), index=True)
     status = db.Column(db.String(20), nullable=False)
-    stdout = db.Column(db.Text)
-    stderr = db.Column(db.Text)
+    # full output, or only a preview when output_external (see execution_outputs)
+    stdout = db.deferred(db.Column(db.Text), group="output")
+    stderr = db.deferred(db.Column(db.Text), group="output")
+    output_external = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     execution_time_ms = db.Column(db.Integer)
-    queued_at = db.Column(db.DateTime)
+    # resource accounting: phase wall times and the program's wait4 rusage
+    compile_time_ms = db.Column(db.Integer)
+    run_time_ms = db.Column(db.Integer)
+    cpu_user_ms = db.Column(db.Integer)
+    cpu_sys_ms = db.Column(db.Integer)
+    max_rss_kb = db.Column(db.Integer)
+    voluntary_ctx_switches = db.Column(db.Integer)
+    involuntary_ctx_switches = db.Column(db.Integer)
+    # partition key: part of the table's primary key, the ORM still identifies rows by id
+    queued_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     started_at = db.Column(db.DateTime)
     finished_at = db.Column(db.DateTime)
+    outputs = db.relationship(
+        "ExecutionOutput",
+        primaryjoin="Execution.id == foreign(ExecutionOutput.execution_id)",
+        lazy=True,
+        cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # session history, newest first (also serves plain session_id lookups)
+        db.Index("ix_executions_session_queued", session_id, queued_at.desc(), id.desc()),
+        # monthly range partitions on Postgres, see services/execution_archive.py
+        {"postgresql_partition_by": "RANGE (queued_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
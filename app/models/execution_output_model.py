@@ -0,0 +1,12 @@
+from app.models.db import db
+
+
+class ExecutionOutput(db.Model):
+    __tablename__ = "execution_outputs"
+
+    # no foreign key: a partitioned executions table has no unique constraint on id alone
+    execution_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    stream = db.Column(db.String(6), primary_key=True)  # stdout / stderr
+    codec = db.Column(db.String(10), nullable=False)  # raw / zlib
+    size = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    data = db.Column(db.LargeBinary, nullable=False)
@@ -0,0 +1,12 @@
+import redis
+from app.config import Config
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client, one connection pool per process"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(Config.REDIS_URL, decode_responses=True)
+    return _client
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.services.code_session_service import Session_Service
+from app.services.session_drafts import VersionConflict
 
 bp = Blueprint('sessions', __name__, url_prefix="/code-sessions")
 
@@ -20,8 +21,18 @@ def update_session(session_id):
     data = request.get_json()
     language = data.get('language')
     source_code = data.get('source_code')
-
-    result = Session_Service.update_session(session_id=session_id, language=language, source_code=source_code)
+    ops = data.get('ops')
+    base_version = data.get('base_version')
+
+    try:
+        result = Session_Service.update_session(
+            session_id=session_id, language=language, source_code=source_code,
+            ops=ops, base_version=base_version
+        )
+    except VersionConflict as e:
+        return jsonify({"error": str(e), "version": e.version, "source_code": e.source_code}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if result is None:
         return jsonify({"error": "Session not found"}), 404
@@ -1,5 +1,9 @@
+from flask import Response, request
 from flask_restx import Namespace, Resource, fields
+from werkzeug.exceptions import TooManyRequests
+from app.services.admission_control import AdmissionRejected
 from app.services.code_execution_service import CodeExecutionService
+from app.services.execution_archive import ArchiveUnavailable, SessionDeleted
 
 # Create namespace
 ns = Namespace('executions', description='Code execution operations')
@@ -7,7 +11,25 @@ ns = Namespace('executions', description='Code execution operations')
 # Define models for Swagger documentation
 execution_response_model = ns.model('ExecutionResponse', {
     'execution_id': fields.String(description='Execution ID'),
-    'status': fields.String(description='Execution status', enum=['QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'TIMEOUT'])
+    'status': fields.String(description='Execution status', enum=['QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'TIMEOUT', 'OUTPUT_LIMIT', 'MEMORY_LIMIT', 'CPU_LIMIT'])
+})
+
+execute_request_model = ns.model('ExecuteRequest', {
+    'bypass_cache': fields.Boolean(
+        required=False,
+        default=False,
+        description='Always run the program, even if an identical one has a memoized result (use for programs relying on randomness or time)'
+    )
+})
+
+execution_resources_model = ns.model('ExecutionResources', {
+    'compile_time_ms': fields.Integer(description='Compile phase wall time (C++)'),
+    'run_time_ms': fields.Integer(description='Run phase wall time'),
+    'cpu_user_ms': fields.Integer(description='User CPU time of the program'),
+    'cpu_sys_ms': fields.Integer(description='System CPU time of the program'),
+    'max_rss_kb': fields.Integer(description='Peak resident memory in KiB'),
+    'voluntary_ctx_switches': fields.Integer(description='Voluntary context switches (waiting on I/O)'),
+    'involuntary_ctx_switches': fields.Integer(description='Involuntary context switches (preempted)')
 })
 
 execution_detail_model = ns.model('ExecutionDetail', {
@@ -15,7 +37,8 @@ execution_detail_model = ns.model('ExecutionDetail', {
     'status': fields.String(description='Execution status'),
     'stdout': fields.String(description='Standard output'),
     'stderr': fields.String(description='Standard error'),
-    'execution_time_ms': fields.Integer(description='Execution time in milliseconds')
+    'execution_time_ms': fields.Integer(description='Execution time in milliseconds'),
+    'resources': fields.Nested(execution_resources_model, allow_null=True, description='Resource usage, once finished')
 })
 
 execution_list_item = ns.model('ExecutionListItem', {
@@ -28,7 +51,43 @@ execution_list_item = ns.model('ExecutionListItem', {
 
 execution_list_response = ns.model('ExecutionListResponse', {
     'session_id': fields.String(description='Session ID'),
-    'executions': fields.List(fields.Nested(execution_list_item))
+    'executions': fields.List(fields.Nested(execution_list_item)),
+    'next_cursor': fields.String(description='Pass as cursor to get the next page (null on the last page)')
+})
+
+batch_request_model = ns.model('BatchExecuteRequest', {
+    'session_ids': fields.List(fields.String, required=True, description='Sessions to execute'),
+    'bypass_cache': fields.Boolean(required=False, default=False, description='Skip the result memo for every session')
+})
+
+batch_execution_item = ns.model('BatchExecutionItem', {
+    'session_id': fields.String(description='Session ID'),
+    'execution_id': fields.String(description='Execution ID'),
+    'status': fields.String(description='Execution status')
+})
+
+batch_rejection_item = ns.model('BatchRejectionItem', {
+    'session_id': fields.String(description='Session ID'),
+    'error': fields.String(description='Why no execution was created'),
+    'retry_after': fields.Integer(description='Seconds to wait before retrying (rate limits only)')
+})
+
+batch_response_model = ns.model('BatchExecuteResponse', {
+    'batch_id': fields.String(description='Batch ID'),
+    'executions': fields.List(fields.Nested(batch_execution_item)),
+    'rejected': fields.List(fields.Nested(batch_rejection_item))
+})
+
+batch_progress_model = ns.model('BatchProgress', {
+    'batch_id': fields.String(description='Batch ID'),
+    'total': fields.Integer(description='Executions in the batch'),
+    'finished': fields.Integer(description='Executions in a terminal state'),
+    'done': fields.Boolean(description='Whether every execution has finished'),
+    'status_counts': fields.Raw(description='Number of executions per status')
+})
+
+execution_restore_model = ns.clone('ExecutionRestore', execution_detail_model, {
+    'restored': fields.Boolean(description='Whether the execution was brought back from the archive')
 })
 
 error_model = ns.model('Error', {
@@ -39,32 +98,129 @@ error_model = ns.model('Error', {
 @ns.route('/<string:execution_id>')
 @ns.param('execution_id', 'The execution identifier')
 class ExecutionDetail(Resource):
-    @ns.doc('get_execution')
+    @ns.doc('get_execution', params={
+        'wait': 'Long-poll: block up to this many seconds until the execution reaches a terminal state'
+    })
     @ns.marshal_with(execution_detail_model)
-    @ns.response(404, 'Execution not found', error_model)
+    @ns.response(404, 'Execution not found or archived', error_model)
     @ns.response(200, 'Success')
     def get(self, execution_id):
         """Retrieve execution status and result"""
-        result = CodeExecutionService.get_execution(execution_id)
+        wait = request.args.get('wait', 0, type=float)
+        result = CodeExecutionService.get_execution(execution_id, wait=wait)
         
         if result is None:
+            if CodeExecutionService.is_archived(execution_id):
+                ns.abort(404, "Execution archived", archived=True)
             ns.abort(404, "Execution not found")
         
         return result, 200
 
 
+@ns.route('/<string:execution_id>/restore')
+@ns.param('execution_id', 'The execution identifier')
+class ExecutionRestore(Resource):
+    @ns.doc('restore_execution')
+    @ns.marshal_with(execution_restore_model)
+    @ns.response(404, 'Execution not found', error_model)
+    @ns.response(410, 'The execution\'s session has been deleted', error_model)
+    @ns.response(503, 'Archive file not readable', error_model)
+    @ns.response(200, 'Success')
+    def post(self, execution_id):
+        """Bring an archived execution back so it can be read again"""
+        try:
+            result = CodeExecutionService.restore_execution(execution_id)
+        except SessionDeleted as e:
+            ns.abort(410, str(e))
+        except ArchiveUnavailable as e:
+            ns.abort(503, str(e))
+        
+        if result is None:
+            ns.abort(404, "Execution not found")
+        
+        return result, 200
+
+
+@ns.route('/batch')
+class BatchExecute(Resource):
+    @ns.doc('execute_batch')
+    @ns.expect(batch_request_model, validate=False)
+    @ns.marshal_with(batch_response_model, code=202)
+    @ns.response(400, 'Invalid session list', error_model)
+    @ns.response(202, 'Executions queued successfully')
+    def post(self):
+        """Execute the code of many sessions at once (asynchronous)"""
+        data = request.get_json(silent=True) or {}
+        bypass_cache = bool(data.get('bypass_cache', False))
+        
+        try:
+            result = CodeExecutionService.execute_batch(data.get('session_ids'), bypass_cache=bypass_cache)
+        except ValueError as e:
+            ns.abort(400, str(e))
+        
+        return result, 202
+
+
+@ns.route('/batch/<string:batch_id>')
+@ns.param('batch_id', 'The batch identifier')
+class BatchProgress(Resource):
+    @ns.doc('get_batch')
+    @ns.marshal_with(batch_progress_model)
+    @ns.response(404, 'Batch not found', error_model)
+    @ns.response(200, 'Success')
+    def get(self, batch_id):
+        """Aggregate progress of a batch"""
+        result = CodeExecutionService.get_batch(batch_id)
+        
+        if result is None:
+            ns.abort(404, "Batch not found")
+        
+        return result, 200
+
+
+@ns.route('/<string:execution_id>/stream')
+@ns.param('execution_id', 'The execution identifier')
+class ExecutionStream(Resource):
+    @ns.doc('stream_execution')
+    @ns.produces(['text/event-stream'])
+    @ns.response(404, 'Execution not found', error_model)
+    @ns.response(200, 'Event stream of status, stdout and stderr events')
+    def get(self, execution_id):
+        """Stream execution output and status changes (Server-Sent Events)"""
+        last_event_id = request.headers.get('Last-Event-ID', 0, type=int)
+        events = CodeExecutionService.stream_execution(execution_id, last_event_id)
+        
+        if events is None:
+            ns.abort(404, "Execution not found")
+        
+        return Response(events, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+
 @ns.route('/session/<string:session_id>')
 @ns.param('session_id', 'The session identifier')
 class SessionExecutionList(Resource):
-    @ns.doc('get_session_executions')
+    @ns.doc('get_session_executions', params={
+        'limit': 'Page size (default 50, max 200)',
+        'cursor': 'next_cursor from the previous page'
+    })
     @ns.marshal_with(execution_list_response)
+    @ns.response(400, 'Invalid limit or cursor', error_model)
     def get(self, session_id):
-        """Get all executions for a session"""
-        executions = CodeExecutionService.get_session_executions(session_id)
+        """Get a session's executions, newest first"""
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        
+        try:
+            page = CodeExecutionService.get_session_executions(session_id, limit=limit, cursor=cursor)
+        except ValueError as e:
+            ns.abort(400, str(e))
         
         return {
             "session_id": str(session_id),
-            "executions": executions
+            **page
         }, 200
 
 
@@ -72,12 +228,20 @@ class SessionExecutionList(Resource):
 @ns.param('session_id', 'The session identifier')
 class SessionExecute(Resource):
     @ns.doc('execute_session')
+    @ns.expect(execute_request_model, validate=False)
     @ns.marshal_with(execution_response_model, code=202)
     @ns.response(404, 'Session not found', error_model)
+    @ns.response(429, 'Execution quota or rate limit exceeded (see Retry-After)', error_model)
     @ns.response(202, 'Execution queued successfully')
     def post(self, session_id):
         """Execute code from a session (asynchronous)"""
-        result = CodeExecutionService.execute_code(session_id)
+        data = request.get_json(silent=True) or {}
+        bypass_cache = bool(data.get('bypass_cache', False))
+        
+        try:
+            result = CodeExecutionService.execute_code(session_id, bypass_cache=bypass_cache)
+        except AdmissionRejected as e:
+            raise TooManyRequests(str(e), retry_after=e.retry_after)
         
         if result is None:
             ns.abort(404, "Session not found")
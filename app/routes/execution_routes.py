@@ -1,32 +1,101 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from app.services.admission_control import AdmissionRejected
 from app.services.code_execution_service import CodeExecutionService
+from app.services.execution_archive import ArchiveUnavailable, SessionDeleted
 
 bp = Blueprint('executions', __name__, url_prefix='/executions')
 
 @bp.route('/<uuid:execution_id>', methods=['GET'])
 def get_execution(execution_id):
-    """Retrieve execution status and result"""
-    result = CodeExecutionService.get_execution(execution_id)
+    """Retrieve execution status and result (?wait=<seconds> to long-poll for completion)"""
+    wait = request.args.get('wait', 0, type=float)
+    result = CodeExecutionService.get_execution(execution_id, wait=wait)
     
     if result is None:
+        if CodeExecutionService.is_archived(execution_id):
+            return jsonify({"error": "Execution archived", "archived": True}), 404
         return jsonify({"error": "Execution not found"}), 404
     
     return jsonify(result), 200
 
+@bp.route('/<uuid:execution_id>/restore', methods=['POST'])
+def restore_execution(execution_id):
+    """Bring an archived execution back so it can be read again"""
+    try:
+        result = CodeExecutionService.restore_execution(execution_id)
+    except SessionDeleted as e:
+        return jsonify({"error": str(e)}), 410
+    except ArchiveUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    
+    if result is None:
+        return jsonify({"error": "Execution not found"}), 404
+    
+    return jsonify(result), 200
+
+@bp.route('/batch', methods=['POST'])
+def execute_batch():
+    """Execute the code of many sessions at once"""
+    data = request.get_json(silent=True) or {}
+    bypass_cache = bool(data.get('bypass_cache', False))
+    
+    try:
+        result = CodeExecutionService.execute_batch(data.get('session_ids'), bypass_cache=bypass_cache)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(result), 202
+
+@bp.route('/batch/<uuid:batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Aggregate progress of a batch"""
+    result = CodeExecutionService.get_batch(batch_id)
+    
+    if result is None:
+        return jsonify({"error": "Batch not found"}), 404
+    
+    return jsonify(result), 200
+
+@bp.route('/<uuid:execution_id>/stream', methods=['GET'])
+def stream_execution(execution_id):
+    """Stream execution output and status changes as Server-Sent Events"""
+    last_event_id = request.headers.get('Last-Event-ID', 0, type=int)
+    events = CodeExecutionService.stream_execution(execution_id, last_event_id)
+    
+    if events is None:
+        return jsonify({"error": "Execution not found"}), 404
+    
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # disable proxy buffering (nginx)
+    })
+
 @bp.route('/session/<uuid:session_id>', methods=['GET'])
 def get_session_executions(session_id):
-    """Get all executions for a session"""
-    executions = CodeExecutionService.get_session_executions(session_id)
+    """Get a session's executions, newest first (?limit=&cursor= to page)"""
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    
+    try:
+        page = CodeExecutionService.get_session_executions(session_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     return jsonify({
         "session_id": str(session_id),
-        "executions": executions
+        **page
     }), 200
 
 @bp.route('/session/<uuid:session_id>/execute', methods=['POST'])
 def execute_session(session_id):
     """Execute code from a session"""
-    result = CodeExecutionService.execute_code(session_id)
+    data = request.get_json(silent=True) or {}
+    bypass_cache = bool(data.get('bypass_cache', False))
+    
+    try:
+        result = CodeExecutionService.execute_code(session_id, bypass_cache=bypass_cache)
+    except AdmissionRejected as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': str(e.retry_after)}
     
     if result is None:
         return jsonify({"error": "Session not found"}), 404
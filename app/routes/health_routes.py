@@ -1,28 +1,25 @@
+import time
 import redis
-from flask import Blueprint, jsonify
-from app.config import Config
+from flask import Blueprint, Response, jsonify
+from sqlalchemy import text
+from app import metrics
+from app.celery_app import EXECUTION_QUEUES
+from app.models.db import db
+from app.redis_client import get_redis
+from app.services import worker_registry
 
 bp = Blueprint('health', __name__)
 
 @bp.route('/health/redis')
 def check_redis():
-    """Check Redis connection status"""
+    """Check Redis connection status (PING over the shared connection pool)"""
     try:
-        # Connect to Redis
-        redis_client = redis.from_url(Config.CELERY_BROKER_URL)
-        
-        # Test connection
-        redis_client.ping()
-        
-        # Get Redis info
-        info = redis_client.info()
+        start = time.perf_counter()
+        get_redis().ping()
         
         return jsonify({
             "status": "connected",
-            "redis_version": info.get('redis_version'),
-            "connected_clients": info.get('connected_clients'),
-            "used_memory_human": info.get('used_memory_human'),
-            "uptime_in_seconds": info.get('uptime_in_seconds')
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2)
         }), 200
         
     except redis.ConnectionError as e:
@@ -39,20 +36,16 @@ def check_redis():
 
 @bp.route('/health/celery')
 def check_celery():
-    """Check Celery worker status"""
+    """Check Celery worker status from the heartbeat registry"""
     try:
-        from app.celery_app import celery
-        
-        # Check active workers
-        inspect = celery.control.inspect()
-        active_workers = inspect.active()
-        stats = inspect.stats()
+        heartbeats = worker_registry.workers()
         
-        if active_workers:
+        if heartbeats:
             return jsonify({
                 "status": "running",
-                "workers": list(active_workers.keys()),
-                "stats": stats
+                "workers": [heartbeat['hostname'] for heartbeat in heartbeats],
+                "stats": {heartbeat['hostname']: heartbeat for heartbeat in heartbeats},
+                "capacity": worker_registry.capacity(heartbeats)
             }), 200
         else:
             return jsonify({
@@ -66,3 +59,43 @@ def check_celery():
             "error": str(e),
             "message": "Cannot connect to Celery"
         }), 500
+
+@bp.route('/health/ready')
+def check_ready():
+    """Readiness: database and Redis reachable and execution capacity per language"""
+    checks = {}
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks["database"] = "ok"
+    except Exception as e:
+        db.session.rollback()
+        checks["database"] = f"error: {str(e)}"
+    
+    try:
+        capacity = worker_registry.capacity(worker_registry.workers())
+        checks["redis"] = "ok"
+    except Exception as e:
+        capacity = None
+        checks["redis"] = f"error: {str(e)}"
+    
+    if capacity is None or checks["database"] != "ok" or capacity["workers"] == 0:
+        return jsonify({"status": "not_ready", "checks": checks, "capacity": capacity}), 503
+    
+    # a language is usable when a live worker consumes its queue
+    languages = {
+        language: queue in capacity["queues"]
+        for language, queue in EXECUTION_QUEUES.items()
+    }
+    status = "ready" if all(languages.values()) else "degraded"
+    return jsonify({
+        "status": status,
+        "checks": checks,
+        "languages": languages,
+        "capacity": capacity
+    }), 200
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
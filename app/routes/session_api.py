@@ -1,5 +1,6 @@
 from flask_restx import Namespace, Resource, fields
 from app.services.code_session_service import Session_Service
+from app.services.session_drafts import VersionConflict
 
 # Create namespace
 ns = Namespace('code-sessions', description='Code session operations')
@@ -15,13 +16,21 @@ session_create_model = ns.model('SessionCreate', {
     'source_code': fields.String(required=False, default='', description='Source code')
 })
 
+edit_op_model = ns.model('EditOp', {
+    'pos': fields.Integer(required=True, description='Character offset of the edit'),
+    'delete': fields.Integer(required=False, default=0, description='Characters removed at pos'),
+    'insert': fields.String(required=False, default='', description='Text inserted at pos')
+})
+
 session_update_model = ns.model('SessionUpdate', {
     'language': fields.String(
         required=False, 
         description='Programming language (python, javascript, c++)',
         enum=['python', 'javascript', 'c++']
     ),
-    'source_code': fields.String(required=False, description='Source code')
+    'source_code': fields.String(required=False, description='Full source code (replaces the text)'),
+    'ops': fields.List(fields.Nested(edit_op_model), required=False, description='Text edits, applied in order'),
+    'base_version': fields.Integer(required=False, description='Version the edits are based on')
 })
 
 session_response_model = ns.model('SessionResponse', {
@@ -29,6 +38,7 @@ session_response_model = ns.model('SessionResponse', {
     'status': fields.String(description='Session status'),
     'language': fields.String(description='Programming language'),
     'source_code': fields.String(description='Source code'),
+    'version': fields.Integer(description='Autosave version'),
     'created_at': fields.String(description='Creation timestamp'),
     'updated_at': fields.String(description='Update timestamp')
 })
@@ -38,10 +48,22 @@ session_brief_response_model = ns.model('SessionBriefResponse', {
     'status': fields.String(description='Session status')
 })
 
+session_update_response_model = ns.model('SessionUpdateResponse', {
+    'session_id': fields.String(description='Session ID'),
+    'status': fields.String(description='Session status'),
+    'version': fields.Integer(description='Version after the edit')
+})
+
 error_model = ns.model('Error', {
     'error': fields.String(description='Error message')
 })
 
+conflict_model = ns.model('VersionConflict', {
+    'error': fields.String(description='Error message'),
+    'version': fields.Integer(description='Current version'),
+    'source_code': fields.String(description='Current source code')
+})
+
 success_model = ns.model('Success', {
     'message': fields.String(description='Success message')
 })
@@ -91,15 +113,34 @@ class SessionDetail(Resource):
     
     @ns.doc('update_session')
     @ns.expect(session_update_model)
-    @ns.marshal_with(session_brief_response_model)
+    @ns.response(200, 'Saved', session_update_response_model)
+    @ns.response(400, 'Invalid edit', error_model)
     @ns.response(404, 'Session not found', error_model)
+    @ns.response(409, 'base_version is outdated', conflict_model)
     def patch(self, session_id):
-        """Autosave the learner's current source code"""
+        """Autosave the learner's code, as text edits against base_version or as the full source
+        
+        Example payload:
+        {
+            "base_version": 3,
+            "ops": [{"pos": 12, "delete": 0, "insert": "x"}]
+        }
+        """
         data = ns.payload
         language = data.get('language')
         source_code = data.get('source_code')
+        ops = data.get('ops')
+        base_version = data.get('base_version')
         
-        result = Session_Service.update_session(session_id=session_id, language=language, source_code=source_code)
+        try:
+            result = Session_Service.update_session(
+                session_id=session_id, language=language, source_code=source_code,
+                ops=ops, base_version=base_version
+            )
+        except VersionConflict as e:
+            return {"error": str(e), "version": e.version, "source_code": e.source_code}, 409
+        except ValueError as e:
+            ns.abort(400, str(e))
         
         if result is None:
             ns.abort(404, "Session not found")
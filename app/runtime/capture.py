@@ -0,0 +1,239 @@
+"""Incremental, bounded output capture for user processes.
+
+``subprocess.run(capture_output=True)`` only hands output back once the child
+exits and buffers all of it in the worker. These helpers read the child's pipes
+as data arrives instead, so the worker can forward chunks (e.g. to live stream
+subscribers) while the program runs. Each stream keeps at most
+``MAX_OUTPUT_SIZE`` bytes: its head plus a rolling tail. Once the program has
+written more than ``OUTPUT_KILL_LIMIT`` bytes in total, capture stops and
+``OutputLimitExceeded`` is raised so the caller can kill the child right away.
+
+Children are reaped with ``wait4`` so every run also reports its resource usage
+(CPU time, peak RSS, context switches) as a ``Usage``. Linux charges the
+spawning worker's own peak RSS to an exec'd child's ``ru_maxrss``, so for
+processes started here peak RSS is sampled from ``/proc/<pid>/status`` instead.
+"""
+import codecs
+import locale
+import os
+import selectors
+import signal
+import subprocess
+import time
+from collections import namedtuple
+from app.config import Config
+
+READ_SIZE = 65536
+# how often the peak RSS of a running child is sampled
+RSS_SAMPLE_INTERVAL = 0.02
+
+# CPU times in milliseconds, peak resident set size in KiB (Linux ru_maxrss)
+Usage = namedtuple('Usage', 'cpu_user_ms cpu_sys_ms max_rss_kb voluntary_ctx_switches involuntary_ctx_switches')
+
+
+def usage_from_rusage(rusage):
+    return Usage(
+        int(rusage.ru_utime * 1000),
+        int(rusage.ru_stime * 1000),
+        rusage.ru_maxrss,
+        rusage.ru_nvcsw,
+        rusage.ru_nivcsw,
+    )
+
+
+class PeakRss:
+    """Tracks a running child's VmHWM (peak RSS of its current image, in KiB)"""
+
+    def __init__(self, pid):
+        self.path = f'/proc/{pid}/status'
+        self.kb = None
+        self.sample()
+
+    def sample(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        self.kb = max(self.kb or 0, int(line.split()[1]))
+                        return
+        except (OSError, ValueError):
+            pass
+
+    def apply(self, usage):
+        """``usage`` with max_rss_kb replaced by the sampled peak, when there is one"""
+        if usage is None or self.kb is None:
+            return usage
+        return usage._replace(max_rss_kb=self.kb)
+
+
+def wait_with_usage(process, timeout=None):
+    """``process.wait()`` that also returns the child's Usage (via ``wait4``)"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, 0 if deadline is None else os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, usage_from_rusage(rusage)
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def kill_group(pid):
+    """SIGKILL the process group led by ``pid`` (children started with ``start_new_session``)"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_with_usage(process):
+    """Kill the child and everything it spawned, then reap it; returns its Usage (None if it was already reaped)"""
+    kill_group(process.pid)
+    process.kill()
+    if process.returncode is not None:
+        return None
+    return wait_with_usage(process)[1]
+
+
+def decode(data, errors='strict'):
+    # same decoding subprocess.run(text=True) applies
+    data = data.decode(locale.getpreferredencoding(False), errors)
+    return data.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class OutputLimitExceeded(Exception):
+    """The program wrote more than OUTPUT_KILL_LIMIT bytes"""
+
+    def __init__(self, stdout, stderr, written):
+        super().__init__(f'Output limit exceeded ({written} bytes written)')
+        self.stdout = stdout
+        self.stderr = stderr
+        self.written = written
+        self.usage = None
+
+
+class CapturedProcess(subprocess.CompletedProcess):
+    """CompletedProcess that also records whether output was truncated and the child's Usage"""
+
+    def __init__(self, args, returncode, stdout, stderr, truncated=False, usage=None):
+        super().__init__(args, returncode, stdout, stderr)
+        self.truncated = truncated
+        self.usage = usage
+
+
+def timeout_expired(args, timeout, usage=None):
+    """``subprocess.TimeoutExpired`` carrying the killed child's Usage as ``.usage``"""
+    error = subprocess.TimeoutExpired(args, timeout)
+    error.usage = usage
+    return error
+
+
+class BoundedBuffer:
+    """Keeps the first and the last bytes of a stream within ``capacity`` bytes"""
+
+    def __init__(self, capacity):
+        self.tail_size = capacity // 4
+        self.head_size = capacity - self.tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, chunk):
+        self.total += len(chunk)
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head.extend(chunk[:room])
+            chunk = chunk[room:]
+        if chunk:
+            self.tail.extend(chunk)
+            if len(self.tail) > self.tail_size:
+                del self.tail[:len(self.tail) - self.tail_size]
+
+    @property
+    def truncated(self):
+        return self.total > len(self.head) + len(self.tail)
+
+    def text(self):
+        if not self.truncated:
+            return decode(bytes(self.head + self.tail))
+        omitted = self.total - len(self.head) - len(self.tail)
+        return (
+            decode(bytes(self.head), 'replace')
+            + f"\n... [Output truncated - {omitted} bytes omitted] ...\n"
+            + decode(bytes(self.tail), 'replace')
+        )
+
+
+def read_pipes(stdout_fd, stderr_fd, deadline, on_output=None, peak_rss=None):
+    """Read both pipes until EOF and return ``(stdout, stderr, truncated)``.
+
+    ``on_output(stream, text)`` is called with each decoded chunk, where stream
+    is ``'stdout'`` or ``'stderr'``. ``peak_rss`` (a PeakRss) is sampled every
+    RSS_SAMPLE_INTERVAL while waiting. Raises TimeoutError once ``deadline``
+    (a ``time.monotonic()`` value) passes and OutputLimitExceeded once more than
+    ``OUTPUT_KILL_LIMIT`` bytes were read; the caller must kill the child.
+    """
+    streams = {stdout_fd: 'stdout', stderr_fd: 'stderr'}
+    buffers = {fd: BoundedBuffer(Config.MAX_OUTPUT_SIZE) for fd in streams}
+    decoders = {
+        fd: codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors='replace')
+        for fd in streams
+    }
+    written = 0
+    with selectors.DefaultSelector() as selector:
+        for fd in streams:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            if peak_rss is not None:
+                peak_rss.sample()
+                remaining = min(remaining, RSS_SAMPLE_INTERVAL)
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, READ_SIZE)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+                buffers[key.fd].write(chunk)
+                written += len(chunk)
+                if on_output is not None:
+                    text = decoders[key.fd].decode(chunk)
+                    if text:
+                        on_output(streams[key.fd], text)
+                if written > Config.OUTPUT_KILL_LIMIT:
+                    raise OutputLimitExceeded(
+                        buffers[stdout_fd].text(), buffers[stderr_fd].text(), written
+                    )
+
+    stdout, stderr = buffers[stdout_fd], buffers[stderr_fd]
+    return stdout.text(), stderr.text(), stdout.truncated or stderr.truncated
+
+
+def run(args, timeout, on_output=None, **popen_kwargs):
+    """Drop-in for ``subprocess.run(args, capture_output=True, text=True, timeout=...)``
+
+    The child leads its own process group, so whatever it forks is killed with it.
+    """
+    deadline = time.monotonic() + timeout
+    popen_kwargs.setdefault('start_new_session', True)
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_kwargs) as process:
+        peak_rss = PeakRss(process.pid)
+        try:
+            stdout, stderr, truncated = read_pipes(
+                process.stdout.fileno(), process.stderr.fileno(), deadline, on_output, peak_rss
+            )
+            returncode, usage = wait_with_usage(process, timeout=max(deadline - time.monotonic(), 0.001))
+            if popen_kwargs['start_new_session']:
+                kill_group(process.pid)  # anything the program left running in the background
+        except (TimeoutError, subprocess.TimeoutExpired):
+            peak_rss.sample()
+            raise timeout_expired(args, timeout, peak_rss.apply(kill_with_usage(process)))
+        except OutputLimitExceeded as e:
+            peak_rss.sample()
+            e.usage = peak_rss.apply(kill_with_usage(process))
+            raise
+    return CapturedProcess(args, returncode, stdout, stderr, truncated, peak_rss.apply(usage))
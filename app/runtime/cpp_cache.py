@@ -0,0 +1,216 @@
+"""Content-addressed cache of compiled C++ programs.
+
+Entries live under ``CPP_CACHE_DIR/entries/<key>`` where the key is a SHA-256 of
+the compiler version, the compiler flags and the source. An entry holds the
+compiled ``program`` (when compilation succeeded) and ``result.json`` with the
+compiler's return code and diagnostics, so failing sources are not recompiled
+either.
+
+Entries are built in ``CPP_CACHE_DIR/tmp`` and renamed into place, which is
+atomic on one filesystem, so every worker process on a host can share the
+directory. Least recently used entries are evicted once the cache grows past
+``CPP_CACHE_MAX_BYTES``. The executable of an entry is hard-linked into a
+private directory for as long as it runs, so eviction cannot pull it away
+mid-execution; an entry evicted before it is linked is simply compiled again.
+Compiler output is captured like program output, as a bounded head and tail.
+Compiles use the precompiled standard headers from
+``cpp_pch`` when one is ready; the binary is the same either way, so the key
+does not depend on it.
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import namedtuple
+from app.config import Config
+from app.runtime import capture
+
+logger = logging.getLogger(__name__)
+
+COMPILER = 'g++'
+COMPILER_FLAGS = ['-std=c++17']
+
+CompiledProgram = namedtuple('CompiledProgram', 'returncode stdout stderr executable cache_status')
+
+_compiler_version = None
+_stats = {'hit': 0, 'miss': 0}
+_stats_lock = threading.Lock()
+
+
+def compiler_version():
+    """First line of ``g++ --version``, looked up once per process"""
+    global _compiler_version
+    if _compiler_version is None:
+        result = subprocess.run([COMPILER, '--version'], capture_output=True, text=True, timeout=10)
+        _compiler_version = result.stdout.splitlines()[0] if result.stdout else ''
+    return _compiler_version
+
+
+def cache_key(source_code, flags=COMPILER_FLAGS):
+    digest = hashlib.sha256()
+    for part in (compiler_version(), ' '.join(flags), source_code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _record(cache_status):
+    with _stats_lock:
+        _stats[cache_status] += 1
+        hits, misses = _stats['hit'], _stats['miss']
+    logger.info(f"C++ compile cache {cache_status} (hits={hits}, misses={misses})")
+
+
+def _compile(source_code, build_dir, timeout):
+    source_file = os.path.join(build_dir, 'program.cpp')
+    executable_file = os.path.join(build_dir, 'program.exe' if os.name == 'nt' else 'program')
+
+    with open(source_file, 'w') as f:
+        f.write(source_code)
+
+    # imported here because cpp_pch builds on this module's compiler settings
+    from app.runtime import cpp_pch
+    pch_header = cpp_pch.header_for(source_code)
+    include_pch = ['-include', pch_header] if pch_header else []
+
+    logger.info(f"Compiling C++ code{' with precompiled headers' if pch_header else ''}...")
+    args = [COMPILER] + include_pch + [source_file, '-o', executable_file] + COMPILER_FLAGS
+    try:
+        result = capture.run(args, timeout=timeout)
+    except capture.OutputLimitExceeded as e:
+        # a source that floods the compiler with diagnostics fails to compile
+        logger.warning(f"C++ compiler killed: {str(e)}")
+        stderr = e.stderr + f"\n... [Compiler output limit exceeded - stopped after {e.written} bytes]"
+        result = capture.CapturedProcess(args, 1, e.stdout, stderr, True, e.usage)
+    os.remove(source_file)
+    return result, executable_file
+
+
+def _entry_size(path):
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+def _evict(root):
+    entries_dir = os.path.join(root, 'entries')
+    with open(os.path.join(root, '.lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another worker is already evicting
+
+        entries = []
+        for key in os.listdir(entries_dir):
+            path = os.path.join(entries_dir, key)
+            try:
+                entries.append((os.path.getmtime(path), _entry_size(path), path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= Config.CPP_CACHE_MAX_BYTES:
+                break
+            # move the entry out of sight before deleting it
+            doomed = tempfile.mkdtemp(dir=os.path.join(root, 'tmp'))
+            try:
+                os.rename(path, os.path.join(doomed, 'entry'))
+            except OSError:
+                shutil.rmtree(doomed, ignore_errors=True)
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted C++ cache entry {os.path.basename(path)}")
+
+
+def _load(entry_dir, cache_status):
+    with open(os.path.join(entry_dir, 'result.json')) as f:
+        meta = json.load(f)
+    executable = os.path.join(entry_dir, meta['executable']) if meta['executable'] else None
+    return CompiledProgram(meta['returncode'], meta['stdout'], meta['stderr'], executable, cache_status)
+
+
+def _pin(executable, pin_dir):
+    pinned = os.path.join(pin_dir, os.path.basename(executable))
+    os.link(executable, pinned)
+    return pinned
+
+
+def _compile_cached(source_code, timeout, pin_dir):
+    root = Config.CPP_CACHE_DIR
+    entries_dir = os.path.join(root, 'entries')
+    tmp_dir = os.path.join(root, 'tmp')
+
+    entry_dir = os.path.join(entries_dir, cache_key(source_code))
+    try:
+        os.utime(entry_dir)  # mark as recently used
+        compiled = _load(entry_dir, 'hit')
+        if compiled.executable:
+            compiled = compiled._replace(executable=_pin(compiled.executable, pin_dir))
+        _record('hit')
+        return compiled
+    except FileNotFoundError:
+        pass  # not cached, or evicted since
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Unreadable C++ cache entry {os.path.basename(entry_dir)}, compiling again: {str(e)}")
+
+    build_dir = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        result, executable_file = _compile(source_code, build_dir, timeout)
+        meta = {
+            'returncode': result.returncode,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'executable': os.path.basename(executable_file) if result.returncode == 0 else None,
+        }
+        with open(os.path.join(build_dir, 'result.json'), 'w') as f:
+            json.dump(meta, f)
+        executable = _pin(executable_file, pin_dir) if meta['executable'] else None
+        try:
+            os.rename(build_dir, entry_dir)
+        except OSError:
+            # another worker published the same entry first, keep theirs
+            shutil.rmtree(build_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    _record('miss')
+    _evict(root)
+    return CompiledProgram(meta['returncode'], meta['stdout'], meta['stderr'], executable, 'miss')
+
+
+@contextlib.contextmanager
+def compiled_program(source_code, timeout):
+    """Compile ``source_code`` (or reuse a cached build) and yield a CompiledProgram
+
+    The executable stays in place until the block exits, even if its cache
+    entry is evicted meanwhile.
+    """
+    if Config.CPP_CACHE_ENABLED:
+        os.makedirs(os.path.join(Config.CPP_CACHE_DIR, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(Config.CPP_CACHE_DIR, 'tmp'), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=os.path.join(Config.CPP_CACHE_DIR, 'tmp')) as pin_dir:
+            yield _compile_cached(source_code, timeout, pin_dir)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result, executable_file = _compile(source_code, temp_dir, timeout)
+        executable = executable_file if result.returncode == 0 else None
+        yield CompiledProgram(result.returncode, result.stdout, result.stderr, executable, 'disabled')
@@ -0,0 +1,175 @@
+"""Precompiled standard headers for C++ compilation.
+
+Most learner programs start with the same handful of standard includes
+(``<iostream>``, ``<vector>``, ``<bits/stdc++.h>``), and parsing those headers
+is most of the compile time. Every distinct set of leading standard includes
+gets its own precompiled header under
+``CPP_CACHE_DIR/pch/<key>/pch.h.gch``. The key is a SHA-256 of the compiler
+version, the compiler flags and the header list, so a PCH is only used with the
+exact ``-std=c++17`` flags it was built with.
+
+The program is then compiled with ``-include pch.h``. That pulls in headers
+the program was going to include first anyway, so it still means the same
+thing. Only the run of ``#include <...>`` lines at the very top of the file
+counts. Any macro, conditional or local include ends the run, because it could
+change how later headers parse.
+
+A missing PCH is built in a background thread under an flock, so only one
+process per host builds it. The build runs in ``CPP_CACHE_DIR/tmp`` and is
+renamed into place. Until it is ready, programs compile the normal way. Sets
+that fail to build (an unknown header, say) are remembered and not retried.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from app.config import Config
+from app.runtime import cpp_cache
+
+logger = logging.getLogger(__name__)
+
+HEADER_NAME = 'pch.h'
+FAILED_MARKER = 'failed'
+
+INCLUDE_RE = re.compile(r'#\s*include\s*<([^<>\s]+)>\s*(//.*)?$')
+STANDARD_HEADER_RE = re.compile(r'(bits/stdc\+\+\.h|[a-z_][a-z0-9_]*(\.h)?)$')
+
+_building = set()
+_building_lock = threading.Lock()
+
+
+def standard_includes(source_code):
+    """Sorted standard headers the program includes before anything else, or ()"""
+    headers = set()
+    in_comment = False
+    for line in source_code.splitlines():
+        stripped = line.strip()
+        if in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        if not stripped or stripped.startswith('//'):
+            continue
+        if stripped.startswith('/*'):
+            in_comment = '*/' not in stripped
+            continue
+        match = INCLUDE_RE.match(stripped)
+        if not match or not STANDARD_HEADER_RE.match(match.group(1)):
+            break
+        headers.add(match.group(1))
+    return tuple(sorted(headers))
+
+
+def pch_key(headers):
+    digest = hashlib.sha256()
+    for part in (cpp_cache.compiler_version(), ' '.join(cpp_cache.COMPILER_FLAGS), ' '.join(headers)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _pch_root():
+    return os.path.join(Config.CPP_CACHE_DIR, 'pch')
+
+
+def build(headers):
+    """Build the PCH for ``headers`` unless it exists or another process is building it"""
+    root = _pch_root()
+    tmp_dir = os.path.join(Config.CPP_CACHE_DIR, 'tmp')
+    os.makedirs(root, exist_ok=True)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    key = pch_key(headers)
+    pch_dir = os.path.join(root, key)
+    with open(os.path.join(root, key + '.lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another worker on this host is building it
+        if os.path.isdir(pch_dir):
+            return
+        if len([name for name in os.listdir(root) if not name.endswith('.lock')]) >= Config.CPP_PCH_MAX_SETS:
+            logger.info(f"Not precompiling <{'>, <'.join(headers)}>: CPP_PCH_MAX_SETS reached")
+            return
+
+        build_dir = tempfile.mkdtemp(dir=tmp_dir)
+        try:
+            header_file = os.path.join(build_dir, HEADER_NAME)
+            with open(header_file, 'w') as f:
+                f.writelines(f'#include <{header}>\n' for header in headers)
+
+            logger.info(f"Precompiling C++ headers <{'>, <'.join(headers)}>...")
+            result = subprocess.run(
+                [cpp_cache.COMPILER, '-x', 'c++-header', header_file, '-o', header_file + '.gch']
+                + cpp_cache.COMPILER_FLAGS,
+                capture_output=True,
+                text=True,
+                timeout=Config.CPP_PCH_BUILD_TIMEOUT
+            )
+            if result.returncode != 0:
+                logger.warning(f"Could not precompile <{'>, <'.join(headers)}>: {result.stderr.strip()[:500]}")
+                with open(os.path.join(build_dir, FAILED_MARKER), 'w') as f:
+                    f.write(result.stderr)
+            os.rename(build_dir, pch_dir)
+        except Exception:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+
+def _build_in_background(headers):
+    with _building_lock:
+        if headers in _building:
+            return
+        _building.add(headers)
+
+    def run():
+        try:
+            build(headers)
+        except Exception as e:
+            logger.warning(f"Precompiling <{'>, <'.join(headers)}> failed: {str(e)}")
+        finally:
+            with _building_lock:
+                _building.discard(headers)
+
+    threading.Thread(target=run, name='cpp-pch-build', daemon=True).start()
+
+
+def header_for(source_code):
+    """Path to pass to ``-include`` for this program, or None to compile without a PCH"""
+    if not Config.CPP_PCH_ENABLED:
+        return None
+    headers = standard_includes(source_code)
+    if not headers:
+        return None
+
+    pch_dir = os.path.join(_pch_root(), pch_key(headers))
+    header_file = os.path.join(pch_dir, HEADER_NAME)
+    if os.path.exists(header_file + '.gch'):
+        return header_file
+    if not os.path.exists(os.path.join(pch_dir, FAILED_MARKER)):
+        _build_in_background(headers)
+    return None
+
+
+def warm_up():
+    """Build the PCHs listed in CPP_PCH_WARM in the background, ahead of the first C++ execution"""
+    if not Config.CPP_PCH_ENABLED:
+        return
+    include_sets = []
+    for include_set in Config.CPP_PCH_WARM.split(';'):
+        headers = tuple(sorted({header.strip() for header in include_set.split(',') if header.strip()}))
+        if headers:
+            include_sets.append(headers)
+
+    def run():
+        for headers in include_sets:
+            try:
+                build(headers)
+            except Exception as e:
+                logger.warning(f"Precompiling <{'>, <'.join(headers)}> failed: {str(e)}")
+
+    threading.Thread(target=run, name='cpp-pch-warm', daemon=True).start()
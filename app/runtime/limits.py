@@ -0,0 +1,223 @@
+"""Kernel-enforced resource limits for user programs.
+
+Every program runs under rlimits:
+- ``RLIMIT_AS``: address space, so a 10 GB allocation fails instead of pushing the host into swap
+- ``RLIMIT_CPU``: SIGXCPU at the limit, SIGKILL one second later
+- ``RLIMIT_FSIZE``: the largest file the program may write
+
+``RLIMIT_NPROC`` is only set when EXECUTION_RLIMIT_NPROC asks for it. Linux
+counts it per user, across the worker, its warm runners and every concurrent
+program, and root ignores it. The process cap is the cgroup's ``pids.max``.
+
+Processes started with ``subprocess`` get them through the ``prlimit`` utility
+that wraps the command, because ``preexec_fn`` is not safe in the threaded
+worker. The single-threaded Python fork-server calls ``setrlimit`` in the forked
+child instead.
+
+When ``EXECUTION_CGROUP_ROOT`` names a delegated cgroup v2 directory with the
+memory and pids controllers, every execution also gets its own sub-group. It
+caps resident memory (``memory.max``, no swap) and process count
+(``pids.max``), and it reports OOM kills. When the execution ends,
+``cgroup.kill`` removes any process it left behind.
+
+``breach`` turns how a program died into MEMORY_LIMIT, CPU_LIMIT or
+OUTPUT_LIMIT (file size) instead of a generic FAILED.
+"""
+import contextlib
+import logging
+import os
+import resource
+import shutil
+import signal
+import time
+import uuid
+from collections import namedtuple
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+# 0 means unlimited
+Limits = namedtuple('Limits', 'memory_mb cpu_seconds processes file_size_mb')
+
+_cgroup_root = None
+_cgroup_checked = False
+_prlimit = shutil.which('prlimit')
+
+
+def configured(language, overrides=None):
+    """Limits for ``language``: the EXECUTION_* defaults, a runner's ``overrides``, then RUNNER_LIMITS"""
+    values = {
+        'memory_mb': Config.EXECUTION_MEMORY_LIMIT_MB,
+        'cpu_seconds': Config.EXECUTION_CPU_LIMIT,
+        'processes': Config.EXECUTION_MAX_PROCESSES,
+        'file_size_mb': Config.EXECUTION_MAX_FILE_SIZE_MB,
+    }
+    values.update(overrides or {})
+    # "javascript.memory_mb=2048,c++.cpu_seconds=5"
+    for item in Config.RUNNER_LIMITS.split(','):
+        name, _, value = item.partition('=')
+        target, _, field = name.strip().rpartition('.')
+        if target == language and field in values and value.strip():
+            values[field] = int(value)
+    return Limits(**values)
+
+
+def rlimits(limits):
+    """``[(resource, (soft, hard)), ...]`` for the limits that are set"""
+    if not Config.EXECUTION_LIMITS_ENABLED:
+        return []
+    settings = []
+    if limits.memory_mb:
+        settings.append((resource.RLIMIT_AS, (limits.memory_mb * MIB,) * 2))
+    if limits.cpu_seconds:
+        settings.append((resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1)))
+    if Config.EXECUTION_RLIMIT_NPROC:
+        settings.append((resource.RLIMIT_NPROC, (Config.EXECUTION_RLIMIT_NPROC,) * 2))
+    if limits.file_size_mb:
+        settings.append((resource.RLIMIT_FSIZE, (limits.file_size_mb * MIB,) * 2))
+    return settings
+
+
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_AS: '--as',
+    resource.RLIMIT_CPU: '--cpu',
+    resource.RLIMIT_NPROC: '--nproc',
+    resource.RLIMIT_FSIZE: '--fsize',
+}
+
+
+def command(args, limits, cgroup=None):
+    """``args`` wrapped so the program starts inside ``cgroup`` and under ``limits``"""
+    settings = rlimits(limits)
+    if settings and _prlimit:
+        args = [_prlimit] + [f'{PRLIMIT_OPTIONS[key]}={soft}:{hard}' for key, (soft, hard) in settings] + ['--'] + args
+    elif settings:
+        logger.warning("prlimit is not installed, user programs run without rlimits")
+    if cgroup is not None:
+        # join before exec, so the program never runs outside its group
+        args = ['sh', '-c', 'echo $$ > "$0" && exec "$@"', cgroup.procs_path] + args
+    return args
+
+
+def breach(returncode, stderr, usage, limits, events=None, memory_markers=()):
+    """``(status, note)`` when the program died from a resource limit, else None"""
+    if returncode == 0:
+        return None
+    events = events or {}
+    stderr_tail = (stderr or '')[-4000:]
+    if events.get('oom_kill') or (limits.memory_mb and any(marker in stderr_tail for marker in memory_markers)):
+        return 'MEMORY_LIMIT', f"Memory limit exceeded ({limits.memory_mb} MB)"
+    cpu_ms = (usage.cpu_user_ms + usage.cpu_sys_ms) if usage else 0
+    if limits.cpu_seconds and (
+        returncode == -signal.SIGXCPU
+        or (returncode == -signal.SIGKILL and cpu_ms >= limits.cpu_seconds * 1000)
+    ):
+        return 'CPU_LIMIT', f"CPU time limit exceeded ({limits.cpu_seconds} seconds)"
+    if limits.file_size_mb and returncode == -signal.SIGXFSZ:
+        return 'OUTPUT_LIMIT', f"File size limit exceeded ({limits.file_size_mb} MB)"
+    if events.get('pids_max'):
+        return 'FAILED', f"Process limit reached ({limits.processes} processes)"
+    return None
+
+
+def _cgroup_available():
+    """The usable cgroup v2 root, checked once per process"""
+    global _cgroup_root, _cgroup_checked
+    if _cgroup_checked:
+        return _cgroup_root
+    _cgroup_checked = True
+    root = Config.EXECUTION_CGROUP_ROOT
+    if not root or not Config.EXECUTION_LIMITS_ENABLED:
+        return None
+    try:
+        with open(os.path.join(root, 'cgroup.subtree_control')) as f:
+            enabled = set(f.read().split())
+        missing = {'memory', 'pids'} - enabled
+        if missing:
+            with open(os.path.join(root, 'cgroup.subtree_control'), 'w') as f:
+                f.write(' '.join(f'+{controller}' for controller in sorted(missing)))
+        _cgroup_root = root
+        logger.info(f"Running each execution in its own cgroup under {root}")
+    except OSError as e:
+        logger.warning(f"cgroup v2 root {root} is not usable, relying on rlimits only: {str(e)}")
+    return _cgroup_root
+
+
+class ExecutionCgroup:
+    """A cgroup v2 sub-group for one execution"""
+
+    def __init__(self, root, limits):
+        self.path = os.path.join(root, f'exec-{uuid.uuid4().hex}')
+        self.procs_path = os.path.join(self.path, 'cgroup.procs')
+        os.mkdir(self.path)
+        try:
+            if limits.memory_mb:
+                self._write('memory.max', limits.memory_mb * MIB)
+                self._write('memory.swap.max', 0)
+            if limits.processes:
+                self._write('pids.max', limits.processes)
+        except OSError:
+            self.close()
+            raise
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(str(value))
+
+    def _read_counters(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return {key: int(value) for key, value in (line.split() for line in f if line.strip())}
+        except (OSError, ValueError):
+            return {}
+
+    def add(self, pid):
+        with open(self.procs_path, 'w') as f:
+            f.write(str(pid))
+
+    def events(self):
+        """``oom_kill`` and ``pids_max`` event counts"""
+        return {
+            'oom_kill': self._read_counters('memory.events').get('oom_kill', 0),
+            'pids_max': self._read_counters('pids.events').get('max', 0),
+        }
+
+    def close(self):
+        """Kill whatever the program left running and remove the group"""
+        try:
+            self._write('cgroup.kill', 1)
+        except OSError:
+            pass
+        deadline = time.monotonic() + 1
+        while True:
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Could not remove cgroup {self.path}: {str(e)}")
+                    return
+                time.sleep(0.01)
+
+
+@contextlib.contextmanager
+def cgroup(limits):
+    """Yield an ExecutionCgroup, or None when cgroups are not available"""
+    root = _cgroup_available()
+    if root is None:
+        yield None
+        return
+    try:
+        group = ExecutionCgroup(root, limits)
+    except OSError as e:
+        logger.warning(f"Could not create an execution cgroup: {str(e)}")
+        yield None
+        return
+    try:
+        yield group
+    finally:
+        group.close()
@@ -0,0 +1,81 @@
+'use strict';
+// Warm Node.js runner used by the worker runtime pool.
+//
+// The worker starts this script ahead of time so that Node has already booted
+// and loaded the common core modules. It then writes one program to stdin and
+// closes it; the program is evaluated in this context the same way `node -e`
+// does, writing straight to this process's stdout/stderr. Each runner is used
+// for exactly one execution.
+//
+// Programs that do not compile as a script are handed to a real `node -e`,
+// which inherits this runner's stdio, limits and cgroup. That covers ES module
+// syntax (import/export, import.meta, top-level await), which `node -e` runs as
+// a module since Node 20.19, and plain syntax errors, so both print exactly
+// what the cold path prints.
+const childProcess = require('child_process');
+const path = require('path');
+const vm = require('vm');
+const Module = require('module');
+
+for (const name of ['assert', 'buffer', 'crypto', 'events', 'fs', 'os', 'readline', 'util']) {
+  require(name);
+}
+
+function compiles(source) {
+  try {
+    new vm.Script(source, { filename: '[eval]' });
+    return true;
+  } catch (err) {
+    return false;
+  }
+}
+
+function runWithNode(source) {
+  const result = childProcess.spawnSync(process.execPath, ['-e', source], { stdio: 'inherit' });
+  if (result.signal) {
+    process.kill(process.pid, result.signal);
+  }
+  process.exit(result.error ? 1 : result.status);
+}
+
+// The frames below the learner's code (vm, this file and the stdin plumbing) are
+// the runner's; drop them before Node prints an uncaught error
+function stripRunnerFrames(err) {
+  if (!(err instanceof Error) || typeof err.stack !== 'string') {
+    return;
+  }
+  const lines = err.stack.split('\n');
+  let first = lines.findIndex((line) => /^\s+at /.test(line) && line.includes(__filename));
+  if (first === -1) {
+    return;
+  }
+  while (first > 0 && lines[first - 1].includes('(node:vm:')) {
+    first -= 1;
+  }
+  err.stack = lines.slice(0, first).join('\n');
+}
+
+const chunks = [];
+process.stdin.on('data', (chunk) => chunks.push(chunk));
+process.stdin.on('end', () => {
+  const source = Buffer.concat(chunks).toString('utf8');
+  const cwd = process.cwd();
+  if (!compiles(source)) {
+    runWithNode(source);
+    return;
+  }
+
+  const evalModule = new Module(path.join(cwd, '[eval]'));
+  evalModule.filename = path.join(cwd, '[eval]');
+  evalModule.paths = Module._nodeModulePaths(cwd);
+
+  globalThis.module = evalModule;
+  globalThis.exports = evalModule.exports;
+  globalThis.require = (id) => evalModule.require(id);
+  globalThis.__filename = '[eval]';
+  globalThis.__dirname = '.';
+  process.argv.splice(1);
+
+  process.on('uncaughtExceptionMonitor', stripRunnerFrames);
+  vm.runInThisContext(source, { filename: '[eval]', displayErrors: true });
+});
@@ -0,0 +1,337 @@
+"""Warm interpreter pools for the execution worker.
+
+Python runs go through a pre-started fork-server (see ``python_fork_server.py``)
+that forks a clean child per execution. Node.js runs take a pre-started,
+single-use runner (see ``node_runner.js``) and a replacement is spawned right
+away. Both capture output through ``app.runtime.capture``, return
+``CapturedProcess`` objects and raise ``subprocess.TimeoutExpired`` (or
+``OutputLimitExceeded``) so callers can treat them like ``capture.run``.
+Programs run under their language's ``limits.Limits`` and, when ``run`` is
+given one, inside the execution's cgroup.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import struct
+import subprocess
+import threading
+import time
+from app.config import Config
+from app.runtime import limits as execution_limits
+from app.runtime.capture import (
+    CapturedProcess, OutputLimitExceeded, PeakRss, Usage, kill_group, kill_with_usage, read_pipes,
+    timeout_expired, wait_with_usage
+)
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_FORK_SERVER = os.path.join(RUNTIME_DIR, 'python_fork_server.py')
+NODE_RUNNER = os.path.join(RUNTIME_DIR, 'node_runner.js')
+
+HEADER = struct.Struct('!QQ')
+REPLY = struct.Struct('!i')
+EXIT_REPLY = struct.Struct('!iQQQQQ')
+# how long the fork-server gets to report a child it was told to kill
+KILL_WAIT = 5
+
+
+class PythonForkServer:
+    """One warm Python interpreter that forks a child per execution"""
+    reusable = True
+
+    def __init__(self, limits):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        rlimits = [[key, soft, hard] for key, (soft, hard) in execution_limits.rlimits(limits)]
+        try:
+            self.process = subprocess.Popen(
+                ['python', PYTHON_FORK_SERVER, str(child_sock.fileno()), json.dumps(rlimits)],
+                pass_fds=(child_sock.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception:
+            parent_sock.close()
+            raise
+        finally:
+            child_sock.close()
+        self.sock = parent_sock
+        self.uses = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def _recv_reply(self, timeout, reply=REPLY):
+        self.sock.settimeout(timeout)
+        data = bytearray()
+        while len(data) < reply.size:
+            chunk = self.sock.recv(reply.size - len(data))
+            if not chunk:
+                raise ConnectionError('Python fork-server exited unexpectedly')
+            data.extend(chunk)
+        return reply.unpack(data)
+
+    def _recv_exit(self, timeout):
+        """``(returncode, Usage)`` of the child that just exited"""
+        returncode, user_us, sys_us, max_rss_kb, nvcsw, nivcsw = self._recv_reply(timeout, EXIT_REPLY)
+        return returncode, Usage(user_us // 1000, sys_us // 1000, max_rss_kb, nvcsw, nivcsw)
+
+    def run(self, source_code, timeout, on_output=None, cgroup=None):
+        self.uses += 1
+        args = ['python', '-c', source_code]
+        deadline = time.monotonic() + timeout
+        payload = source_code.encode('utf-8')
+        cgroup_procs = cgroup.procs_path.encode('utf-8') if cgroup is not None else b''
+
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            self.sock.settimeout(timeout)
+            socket.send_fds(self.sock, [HEADER.pack(len(payload), len(cgroup_procs))], [stdout_w, stderr_w])
+            self.sock.sendall(payload + cgroup_procs)
+            os.close(stdout_w)
+            os.close(stderr_w)
+            stdout_w = stderr_w = None
+
+            (pid,) = self._recv_reply(max(deadline - time.monotonic(), 0.001))
+            try:
+                stdout, stderr, truncated = read_pipes(stdout_r, stderr_r, deadline, on_output)
+                returncode, usage = self._recv_exit(max(deadline - time.monotonic(), 0.001))
+            except TimeoutError:
+                raise timeout_expired(args, timeout, self._kill_child(pid))
+            except OutputLimitExceeded as e:
+                e.usage = self._kill_child(pid)
+                raise
+        finally:
+            for fd in (stdout_r, stderr_r, stdout_w, stderr_w):
+                if fd is not None:
+                    os.close(fd)
+
+        return CapturedProcess(args, returncode, stdout, stderr, truncated, usage)
+
+    def _exit_reported(self):
+        """True when the exit of the current child is already waiting on the socket"""
+        self.sock.settimeout(0)
+        try:
+            return len(self.sock.recv(EXIT_REPLY.size, socket.MSG_PEEK)) == EXIT_REPLY.size
+        except (BlockingIOError, InterruptedError):
+            return False
+
+    def _kill_child(self, pid):
+        """Kill the running child (and anything it forked) and return its Usage
+
+        Returns None when the fork-server does not report the child within
+        KILL_WAIT; the server is then killed, so the pool replaces it.
+        """
+        kill_group(pid)
+        if not self._exit_reported():
+            # not reaped yet, so the pid is still this child's (it may have left its group)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        try:
+            return self._recv_exit(KILL_WAIT)[1]
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Python fork-server did not report killed child {pid}, replacing it: {str(e)}")
+            self.sock.close()
+            self.process.kill()
+            self.process.wait()
+            return None
+
+    def close(self):
+        self.sock.close()
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class NodeRunner:
+    """One pre-started Node.js process that evaluates a single program"""
+    reusable = False
+
+    def __init__(self, limits):
+        # prlimit execs node, so the runner keeps the pid it was started with
+        self.process = subprocess.Popen(
+            execution_limits.command(['node', NODE_RUNNER], limits),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self.uses = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def _boot_cpu_ms(self):
+        """CPU the runner spent booting, so it can be left out of the program's usage (Linux only)"""
+        try:
+            with open(f'/proc/{self.process.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            ticks = os.sysconf('SC_CLK_TCK')
+            return int(fields[11]) * 1000 // ticks, int(fields[12]) * 1000 // ticks
+        except (OSError, ValueError, IndexError):
+            return 0, 0
+
+    def _program_usage(self, usage, boot_cpu_ms, peak_rss):
+        usage = peak_rss.apply(usage)
+        if usage is None:
+            return None
+        return usage._replace(
+            cpu_user_ms=max(usage.cpu_user_ms - boot_cpu_ms[0], 0),
+            cpu_sys_ms=max(usage.cpu_sys_ms - boot_cpu_ms[1], 0),
+        )
+
+    def run(self, source_code, timeout, on_output=None, cgroup=None):
+        self.uses += 1
+        args = ['node', '-e', source_code]
+        deadline = time.monotonic() + timeout
+        boot_cpu_ms = self._boot_cpu_ms()
+        peak_rss = PeakRss(self.process.pid)
+        if cgroup is not None:
+            # the runner is idle until it has read the program, so nothing runs outside the group
+            cgroup.add(self.process.pid)
+        try:
+            # the runner reads the whole program before it starts writing output
+            self.process.stdin.write(source_code.encode('utf-8'))
+            self.process.stdin.close()
+            stdout, stderr, truncated = read_pipes(
+                self.process.stdout.fileno(), self.process.stderr.fileno(), deadline, on_output, peak_rss
+            )
+            returncode, usage = wait_with_usage(self.process, timeout=max(deadline - time.monotonic(), 0.001))
+            kill_group(self.process.pid)
+        except (TimeoutError, subprocess.TimeoutExpired):
+            peak_rss.sample()
+            usage = kill_with_usage(self.process)
+            raise timeout_expired(args, timeout, self._program_usage(usage, boot_cpu_ms, peak_rss))
+        except OutputLimitExceeded as e:
+            peak_rss.sample()
+            e.usage = self._program_usage(kill_with_usage(self.process), boot_cpu_ms, peak_rss)
+            raise
+        return CapturedProcess(
+            args, returncode, stdout, stderr, truncated, self._program_usage(usage, boot_cpu_ms, peak_rss)
+        )
+
+    def close(self):
+        if self.alive():
+            kill_group(self.process.pid)
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            stream.close()
+
+
+class RuntimePool:
+    """Keeps up to ``size`` warm runners for one language"""
+
+    def __init__(self, language, factory, size, max_uses, max_idle=None):
+        self.language = language
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        # reusable runners started on demand under concurrent load are kept up to here
+        self.max_idle = max(size, max_idle or size)
+        self._idle = queue.LifoQueue()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(factory())
+        logger.info(f"Started {size} warm {language} runner(s)")
+
+    def _acquire(self):
+        while True:
+            try:
+                runner = self._idle.get_nowait()
+            except queue.Empty:
+                logger.info(f"No idle warm {self.language} runner, starting one on demand")
+                return self.factory()
+            if runner.alive():
+                return runner
+            runner.close()
+
+    def _release(self, runner):
+        keep = runner.reusable and runner.uses < self.max_uses and runner.alive()
+        if keep and not self._closed and self._idle.qsize() < self.max_idle:
+            self._idle.put(runner)
+            return
+        runner.close()
+        if self._closed or self._idle.qsize() >= self.size:
+            return
+        try:
+            self._idle.put(self.factory())
+        except Exception as e:
+            logger.warning(f"Could not replace warm {self.language} runner: {str(e)}")
+
+    def run(self, source_code, timeout, on_output=None, cgroup=None):
+        runner = self._acquire()
+        try:
+            return runner.run(source_code, timeout, on_output, cgroup)
+        except (OSError, ConnectionError):
+            # the runner is in an unknown state, never hand it out again
+            runner.uses = self.max_uses
+            raise
+        finally:
+            self._release(runner)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+RUNNER_FACTORIES = {
+    'python': PythonForkServer,
+    'javascript': NodeRunner,
+}
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_pool(language, limits):
+    """Return this process's warm pool for ``language`` (runners confined to ``limits``), or None when disabled"""
+    global _pools_pid
+    if not Config.RUNTIME_POOL_ENABLED or Config.RUNTIME_POOL_SIZE <= 0:
+        return None
+    if language not in RUNNER_FACTORIES:
+        return None
+
+    with _pools_lock:
+        # pools never survive a fork, each worker process owns its own
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(language)
+        if pool is None:
+            pool = RuntimePool(
+                language,
+                functools.partial(RUNNER_FACTORIES[language], limits),
+                Config.RUNTIME_POOL_SIZE,
+                Config.RUNTIME_POOL_MAX_USES,
+                max_idle=Config.worker_concurrency(),
+            )
+            _pools[language] = pool
+        return pool
+
+
+@atexit.register
+def shutdown():
+    with _pools_lock:
+        if _pools_pid == os.getpid():
+            for pool in _pools.values():
+                pool.close()
+        _pools.clear()
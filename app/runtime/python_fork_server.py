@@ -0,0 +1,169 @@
+"""Warm Python fork-server used by the worker runtime pool.
+
+The worker starts this script once with one end of a Unix socket pair and the
+rlimits for user programs (JSON ``[[resource, soft, hard], ...]``). Common
+stdlib modules are imported up front, then every request forks a fresh child
+that runs the learner's program the same way ``python -c`` would. The child
+leads its own process group, joins the execution's cgroup when one is given
+and applies the rlimits before it runs anything. The server only ever talks
+over the socket, never over its own stdout/stderr.
+
+One difference from ``python -c``: the string hash seed is fixed when the
+interpreter starts, so every child of one server hashes ``str``/``bytes`` the
+same way (``random`` is reseeded at fork). Servers are recycled after
+RUNTIME_POOL_MAX_USES executions, which picks a new seed.
+
+Protocol (all integers are network byte order):
+    request:  8-byte source length and 8-byte cgroup.procs path length +
+              [stdout fd, stderr fd] as SCM_RIGHTS, followed by the UTF-8
+              source and the path (empty without a cgroup)
+    replies:  4-byte child pid, then once the child exits its 4-byte return
+              code (negative signal number when killed, like subprocess)
+              followed by its rusage from wait4: user and sys CPU in
+              microseconds, max RSS in KiB, voluntary and involuntary
+              context switches (8 bytes each)
+"""
+import json
+import os
+import resource
+import socket
+import struct
+import sys
+import types
+
+PRELOAD_MODULES = (
+    'collections', 'itertools', 'functools', 'math', 'random', 're',
+    'string', 'json', 'datetime', 'decimal', 'fractions', 'heapq',
+    'bisect', 'statistics', 'typing', 'dataclasses', 'traceback',
+)
+
+HEADER = struct.Struct('!QQ')
+REPLY = struct.Struct('!i')
+EXIT_REPLY = struct.Struct('!iQQQQQ')
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError('worker closed the fork-server socket')
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _exit_code(exc):
+    # mirror how the interpreter turns SystemExit into a process status
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _confine(rlimits, cgroup_procs):
+    os.setsid()
+    if cgroup_procs:
+        with open(cgroup_procs, 'w') as f:
+            f.write(str(os.getpid()))
+    for key, soft, hard in rlimits:
+        resource.setrlimit(key, (soft, hard))
+
+
+def _run_child(source):
+    sys.argv = ['-c']
+    sys.path[0] = ''
+    main_module = types.ModuleType('__main__')
+    sys.modules['__main__'] = main_module
+
+    code = 0
+    try:
+        exec(compile(source, '<string>', 'exec'), main_module.__dict__)
+    except SystemExit as exc:
+        code = _exit_code(exc)
+    except SyntaxError as exc:
+        exc.__traceback__ = None
+        sys.excepthook(type(exc), exc, None)
+        code = 1
+    except BaseException as exc:
+        # drop this frame so the traceback starts at the user's module
+        exc.__traceback__ = exc.__traceback__.tb_next
+        sys.excepthook(type(exc), exc, exc.__traceback__)
+        code = 1
+
+    try:
+        import threading
+        threading._shutdown()
+        import atexit
+        atexit._run_exitfuncs()
+    except BaseException:
+        pass
+
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            code = code or 120
+    return code
+
+
+def _serve(sock, rlimits):
+    while True:
+        try:
+            header, fds, _flags, _addr = socket.recv_fds(sock, HEADER.size, 2)
+        except OSError:
+            return
+        if not header:
+            return
+        length, cgroup_length = HEADER.unpack(header)
+        source = _recv_exact(sock, length).decode('utf-8')
+        cgroup_procs = _recv_exact(sock, cgroup_length).decode('utf-8')
+        stdout_fd, stderr_fd = fds
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_fd, 2)
+            os.close(stdout_fd)
+            os.close(stderr_fd)
+            try:
+                _confine(rlimits, cgroup_procs)
+            except OSError as exc:
+                print(f'Could not apply resource limits: {exc}', file=sys.stderr)
+                os._exit(1)
+            os._exit(_run_child(source))
+
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        sock.sendall(REPLY.pack(pid))
+        _, status, rusage = os.wait4(pid, 0)
+        sock.sendall(EXIT_REPLY.pack(
+            os.waitstatus_to_exitcode(status),
+            int(rusage.ru_utime * 1_000_000),
+            int(rusage.ru_stime * 1_000_000),
+            rusage.ru_maxrss,
+            rusage.ru_nvcsw,
+            rusage.ru_nivcsw,
+        ))
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    rlimits = json.loads(sys.argv[2]) if len(sys.argv) > 2 else []
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    try:
+        _serve(sock, rlimits)
+    finally:
+        sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Language runner registry.
+
+A ``Runner`` describes one language:
+- its commands (how to run a program, and how to report its version)
+- its compile and run timeouts
+- its warm-up hooks
+- how many of its programs one worker process may run at once
+- its resource limits (``limits.Limits``)
+
+``execute_code_task`` looks the runner up by language, takes one of its slots
+and calls ``execute``. That returns the same result dict the task always
+stored. A runtime with a slot limit (C++ compiles are CPU-bound) cannot take
+every worker thread away from cheap Python and JavaScript runs.
+
+New languages are plugins. A module named in RUNNER_PLUGINS is imported the
+first time the registry is used, and it calls ``register(MyRunner())``.
+Nothing in the task has to change.
+"""
+import contextlib
+import importlib
+import logging
+import os
+import subprocess
+import threading
+import time
+from app.config import Config
+from app.runtime import capture, cpp_cache, cpp_pch
+from app.runtime import limits as execution_limits
+from app.runtime import pool as runtime_pool
+
+logger = logging.getLogger(__name__)
+
+
+class CompileError(Exception):
+    """The program did not compile; carries the compiler's output"""
+
+    def __init__(self, stdout, stderr):
+        super().__init__('Compilation failed')
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+def _available_cpus():
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def _configured_limits():
+    """``RUNNER_MAX_CONCURRENCY`` ("c++=2,java=1") as a dict"""
+    limits = {}
+    for item in Config.RUNNER_MAX_CONCURRENCY.split(','):
+        language, _, limit = item.partition('=')
+        if language.strip() and limit.strip():
+            limits[language.strip()] = int(limit)
+    return limits
+
+
+class Runner:
+    """Base runner: interprets ``command + [source_code]``, through the warm pool when there is one"""
+    language = None
+    display_name = None
+    command = None
+    version_command = None
+    run_timeout = Config.EXECUTION_TIMEOUT
+    compile_timeout = None
+    # programs one worker process runs at once; None leaves it to the worker's concurrency
+    max_concurrency = None
+    missing_message = None
+    # limits.Limits fields that differ from the EXECUTION_* defaults, and what the
+    # runtime prints when an allocation fails under the memory limit
+    limit_overrides = {}
+    memory_markers = ()
+
+    def __init__(self):
+        limit = _configured_limits().get(self.language, self.max_concurrency)
+        self.max_concurrency = limit if limit and limit > 0 else None
+        self._slots = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else None
+        self.limits = execution_limits.configured(self.language, self.limit_overrides)
+
+    def acquire(self, timeout):
+        """Take an execution slot, waiting up to ``timeout`` seconds; False when none freed up"""
+        return self._slots is None or self._slots.acquire(timeout=timeout)
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def warm_up(self):
+        """Runs in every worker process before its first execution"""
+        runtime_pool.get_pool(self.language, self.limits)
+
+    def warm_up_host(self):
+        """Runs once per worker when it starts consuming this runner's queue"""
+
+    def run(self, source_code, on_output, phases, cgroup=None):
+        """Run the program under ``self.limits`` (inside ``cgroup`` when given) and return a CapturedProcess
+
+        Compiling runners record ``compile_cache`` and ``compile_time_ms`` in
+        ``phases`` and raise ``CompileError`` when compilation fails.
+        """
+        pool = runtime_pool.get_pool(self.language, self.limits)
+        if pool is not None:
+            return pool.run(source_code, timeout=self.run_timeout, on_output=on_output, cgroup=cgroup)
+        return capture.run(
+            execution_limits.command(self.command + [source_code], self.limits, cgroup),
+            timeout=self.run_timeout,
+            on_output=on_output
+        )
+
+    def execute(self, source_code, on_output=None):
+        """Run the program and return the task's result dict; never raises"""
+        phases = {}
+        try:
+            logger.info(f"Executing {self.display_name} code (timeout: {self.run_timeout}s)")
+            with execution_limits.cgroup(self.limits) as cgroup:
+                result = self.run(source_code, on_output, phases, cgroup)
+                events = cgroup.events() if cgroup is not None else None
+
+            status = 'COMPLETED' if result.returncode == 0 else 'FAILED'
+            stderr = result.stderr
+            breach = execution_limits.breach(
+                result.returncode, stderr, result.usage, self.limits, events, self.memory_markers
+            )
+            if breach is not None:
+                status, note = breach
+                stderr = (stderr or '') + f"\n... [{note}]"
+                logger.warning(f"{self.display_name} execution stopped: {note}")
+            elif status == 'FAILED':
+                logger.warning(f"{self.display_name} execution failed with return code {result.returncode}")
+            else:
+                logger.info(f"{self.display_name} execution completed successfully")
+
+            return dict(
+                phases,
+                stdout=result.stdout,
+                stderr=stderr,
+                status=status,
+                truncated=result.truncated,
+                usage=result.usage
+            )
+
+        except CompileError as e:
+            logger.warning(f"{self.display_name} compilation failed")
+            return dict(phases, stdout=e.stdout, stderr=f"Compilation Error:\n{e.stderr}", status='FAILED')
+        except capture.OutputLimitExceeded as e:
+            logger.warning(f"{self.display_name} execution killed: {str(e)}")
+            return dict(
+                phases,
+                stdout=e.stdout,
+                stderr=e.stderr + f"\n... [Output limit exceeded - program killed after writing more than {Config.OUTPUT_KILL_LIMIT} bytes]",
+                status='OUTPUT_LIMIT',
+                truncated=True,
+                usage=e.usage
+            )
+        except subprocess.TimeoutExpired as e:
+            logger.warning(f"{self.display_name} execution timed out")
+            return dict(
+                phases,
+                stdout='',
+                stderr=f'Execution timeout exceeded ({self.run_timeout} seconds)',
+                status='TIMEOUT',
+                usage=getattr(e, 'usage', None)
+            )
+        except FileNotFoundError as e:
+            logger.error(f"{self.display_name} runtime not found: {str(e)}")
+            return {'stdout': '', 'stderr': self.missing_message or str(e), 'status': 'FAILED'}
+        except Exception as e:
+            logger.error(f"{self.display_name} execution error: {str(e)}")
+            return {'stdout': '', 'stderr': str(e), 'status': 'FAILED'}
+
+
+class PythonRunner(Runner):
+    language = 'python'
+    display_name = 'Python'
+    command = ['python', '-c']
+    version_command = ['python', '--version']
+    memory_markers = ('MemoryError',)
+
+
+class JavaScriptRunner(Runner):
+    language = 'javascript'
+    display_name = 'JavaScript'
+    command = ['node', '-e']
+    version_command = ['node', '--version']
+    missing_message = 'Node.js is not installed'
+    # V8 reserves far more address space than it touches; Node does not start below about 1 GB
+    limit_overrides = {'memory_mb': 2048}
+    memory_markers = ('JavaScript heap out of memory', 'Array buffer allocation failed', 'Fatal process out of memory')
+
+
+class CppRunner(Runner):
+    """Compiles through the shared compile cache, then runs the executable"""
+    language = 'c++'
+    display_name = 'C++'
+    command = [cpp_cache.COMPILER] + cpp_cache.COMPILER_FLAGS
+    version_command = [cpp_cache.COMPILER, '--version']
+    compile_timeout = Config.COMPILE_TIMEOUT
+    # compiling is CPU-bound, more compiles than cores only slows every one of them
+    max_concurrency = _available_cpus()
+    missing_message = 'G++ compiler (g++) is not installed. Please install it to compile C++ code.'
+    memory_markers = ('std::bad_alloc',)
+
+    def warm_up_host(self):
+        cpp_pch.warm_up()
+
+    def run(self, source_code, on_output, phases, cgroup=None):
+        # cache hits skip the compiler entirely; only the program runs under the limits
+        compile_start = time.time()
+        with cpp_cache.compiled_program(source_code, timeout=self.compile_timeout) as compiled:
+            phases['compile_cache'] = compiled.cache_status
+            phases['compile_time_ms'] = int((time.time() - compile_start) * 1000)
+            if compiled.returncode != 0:
+                raise CompileError(compiled.stdout, compiled.stderr)
+
+            logger.info(f"C++ compilation successful ({compiled.cache_status}), running executable...")
+            return capture.run(
+                execution_limits.command([compiled.executable], self.limits, cgroup),
+                timeout=self.run_timeout,
+                on_output=on_output
+            )
+
+
+_runners = {}
+_plugins_loaded = False
+_registry_lock = threading.Lock()
+
+
+def register(runner):
+    """Add ``runner`` (an instance), replacing any runner for the same language"""
+    _runners[runner.language] = runner
+
+
+def _load_plugins():
+    global _plugins_loaded
+    with _registry_lock:
+        if _plugins_loaded:
+            return
+        _plugins_loaded = True
+        for module in filter(None, (name.strip() for name in Config.RUNNER_PLUGINS.split(','))):
+            try:
+                importlib.import_module(module)
+                logger.info(f"Loaded runner plugin {module}")
+            except Exception as e:
+                logger.error(f"Could not load runner plugin {module}: {str(e)}")
+
+
+def get(language):
+    """The runner for ``language``, or None when the language is not supported"""
+    _load_plugins()
+    return _runners.get(language)
+
+
+def all_runners():
+    _load_plugins()
+    return list(_runners.values())
+
+
+@contextlib.contextmanager
+def slot(runner, timeout):
+    """Hold one of ``runner``'s execution slots; yields False when none freed up in time"""
+    acquired = runner.acquire(timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            runner.release()
+
+
+def warm_up():
+    """Run every runner's per-process warm-up hook"""
+    for runner in all_runners():
+        try:
+            runner.warm_up()
+        except Exception as e:
+            logger.warning(f"Could not warm up the {runner.display_name} runner: {str(e)}")
+
+
+for _runner_class in (PythonRunner, JavaScriptRunner, CppRunner):
+    register(_runner_class())
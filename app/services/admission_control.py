@@ -0,0 +1,140 @@
+"""Admission control for new executions.
+
+Checked by the API before an execution row is created or a task is queued.
+One Lua script atomically checks and then consumes:
+
+- the per-session execution quota (a counter)
+- the per-session rate limit (a token bucket)
+- the global rate limit across all sessions (a token bucket)
+
+Nothing is consumed unless every check passes. Defaults come from the config.
+A single session can be given its own limits with a Redis hash, e.g.
+``HSET admission:limits:<session_id> max_executions 500 rate_limit 30``.
+"""
+import logging
+import math
+import time
+import uuid
+from app import metrics
+from app.config import Config
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+ADMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local overrides = redis.call('HMGET', KEYS[4], 'max_executions', 'rate_limit')
+local session_quota = tonumber(overrides[1]) or tonumber(ARGV[2])
+local quota_ttl = tonumber(ARGV[3])
+
+local function refill(key, capacity, window)
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  return math.min(capacity, tokens + math.max(0, now - ts) * capacity / window)
+end
+
+if session_quota > 0 then
+  local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+  if used >= session_quota then
+    return {'session_quota', tostring(redis.call('TTL', KEYS[1]))}
+  end
+end
+
+local buckets = {
+  {KEYS[2], tonumber(overrides[2]) or tonumber(ARGV[4]), tonumber(ARGV[5]), 'session_rate'},
+  {KEYS[3], tonumber(ARGV[6]), tonumber(ARGV[7]), 'global_rate'},
+}
+local levels = {}
+for i, bucket in ipairs(buckets) do
+  if bucket[2] > 0 then
+    local tokens = refill(bucket[1], bucket[2], bucket[3])
+    if tokens < 1 then
+      return {bucket[4], tostring((1 - tokens) * bucket[3] / bucket[2])}
+    end
+    levels[i] = tokens
+  end
+end
+
+for i, bucket in ipairs(buckets) do
+  if levels[i] then
+    redis.call('HSET', bucket[1], 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('EXPIRE', bucket[1], math.ceil(bucket[3]) * 2)
+  end
+end
+if session_quota > 0 then
+  redis.call('INCR', KEYS[1])
+  if quota_ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], quota_ttl)
+  end
+end
+return {'ok', '0'}
+"""
+
+REJECTION_MESSAGES = {
+    'session_quota': 'Execution limit exceeded for this session',
+    'session_rate': 'Rate limit exceeded for this session',
+    'global_rate': 'Too many executions right now, please retry shortly',
+}
+
+QUOTA_RETRY_AFTER = 3600
+
+_admit_script = None
+
+
+class AdmissionRejected(Exception):
+    """Raised when an execution may not be queued (maps to HTTP 429)"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(REJECTION_MESSAGES.get(reason, 'Too many requests'))
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _script():
+    global _admit_script
+    if _admit_script is None:
+        _admit_script = get_redis().register_script(ADMIT_SCRIPT)
+    return _admit_script
+
+
+def admit(session_id):
+    """Consume one execution for ``session_id`` or raise AdmissionRejected
+
+    Raises ValueError for an invalid session ID. Keys use the canonical form, so
+    another spelling of the same UUID cannot start a fresh quota and bucket.
+    """
+    session_id = str(uuid.UUID(str(session_id)))
+    keys = [
+        f'admission:quota:{session_id}',
+        f'admission:rate:{session_id}',
+        'admission:rate:global',
+        f'admission:limits:{session_id}',
+    ]
+    args = [
+        time.time(),
+        Config.SESSION_MAX_EXECUTIONS,
+        Config.SESSION_QUOTA_TTL,
+        Config.SESSION_RATE_LIMIT,
+        Config.SESSION_RATE_WINDOW,
+        Config.GLOBAL_RATE_LIMIT,
+        Config.GLOBAL_RATE_WINDOW,
+    ]
+    try:
+        reason, retry_after = _script()(keys=keys, args=args)
+    except Exception as e:
+        # fail open: losing Redis must not stop people from running code
+        logger.warning(f"Admission control unavailable, admitting session {session_id}: {str(e)}")
+        return
+
+    if reason == 'ok':
+        return
+
+    retry_after = float(retry_after)
+    if retry_after <= 0:
+        # a session quota without expiry never resets by itself
+        retry_after = QUOTA_RETRY_AFTER
+    retry_after = max(1, math.ceil(retry_after))
+    logger.warning(f"Session {session_id} rejected by admission control ({reason}), retry after {retry_after}s")
+    metrics.REJECTIONS.labels(reason).inc()
+    raise AdmissionRejected(reason, retry_after)
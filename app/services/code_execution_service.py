@@ -1,8 +1,17 @@
 from datetime import datetime
+import base64
 import logging
+import uuid
+from celery import group
+from sqlalchemy import func, insert, select, tuple_
+from app.config import Config
 from app.models.db import db
 from app.models.execution_model import Execution
 from app.models.code_sessions_model import CodeSession
+from app.services import (
+    admission_control, execution_archive, execution_events, execution_output, read_cache, result_memo,
+    session_drafts, source_store
+)
 from app.tasks.execution_tasks import execute_code_task
 
 # Configure logging
@@ -12,43 +21,232 @@ class CodeExecutionService:
     EXECUTION_TIMEOUT = 30
 
     @staticmethod
-    def execute_code(session_id):
+    def execute_code(session_id, bypass_cache=False):
+        try:
+            session_id = uuid.UUID(str(session_id))
+        except ValueError:
+            logger.error(f"Invalid session ID {session_id}")
+            return None
+        
         logger.info(f"Starting execution for session {session_id}")
         
-        session = CodeSession.query.get(session_id)
+        session_drafts.flush_if_dirty(session_id)
+        session = db.session.execute(
+            select(CodeSession.language, CodeSession.source_code).where(CodeSession.id == session_id)
+        ).first()
         if not session:
             logger.error(f"Session {session_id} not found")
             return None
         
+        # Quota and rate limits; raises AdmissionRejected before anything is written
+        admission_control.admit(session_id)
+        
+        # Identical program already ran: answer from the memo without queueing
+        memoize = not bypass_cache
+        cached = result_memo.lookup(session.language, session.source_code) if memoize else None
+        if cached:
+            now = datetime.utcnow()
+            execution_id = CodeExecutionService._insert_execution(
+                session_id=session_id,
+                status='COMPLETED',
+                queued_at=now,
+                started_at=now,
+                finished_at=now,
+                **cached
+            )
+            
+            read_cache.write_execution(read_cache.execution_view(
+                execution_id, 'COMPLETED', queued_at=now, started_at=now, finished_at=now, **cached
+            ))
+            logger.info(f"Execution {execution_id} served from result memo")
+            
+            return {
+                "execution_id": str(execution_id),
+                "status": 'COMPLETED'
+            }
+        
+        # the task message carries only the source's hash
+        source_hash = source_store.put(session.source_code)
+        
         # Create execution record with QUEUED status
-        execution = Execution(
+        queued_at = datetime.utcnow()
+        execution_id = CodeExecutionService._insert_execution(
             session_id=session_id,
             status='QUEUED',
-            queued_at=datetime.utcnow()
+            queued_at=queued_at
         )
-
-        db.session.add(execution)
-        db.session.commit()
         
-        logger.info(f"Execution {execution.id} created with status QUEUED at {execution.queued_at}")
+        logger.info(f"Execution {execution_id} created with status QUEUED at {queued_at}")
+        execution_events.mark_queued(execution_id)
+        read_cache.write_execution(read_cache.execution_view(execution_id, 'QUEUED', queued_at=queued_at))
 
         # Send task to Celery worker
         execute_code_task.delay(
-            str(execution.id),
+            str(execution_id),
             session.language,
-            session.source_code
+            source_hash,
+            memoize=memoize
         )
         
-        logger.info(f"Task sent to Celery for execution {execution.id}")
+        logger.info(f"Task sent to Celery for execution {execution_id}")
 
         return {
-            "execution_id": str(execution.id),
-            "status": execution.status
+            "execution_id": str(execution_id),
+            "status": 'QUEUED'
         }
     
     @staticmethod
-    def get_execution(execution_id):
-        """Get execution status and result"""
+    def _insert_execution(stdout=None, stderr=None, **values):
+        """Insert one execution without loading anything back
+        
+        A single statement, plus one for output too large to keep inline.
+        """
+        execution_id = uuid.uuid4()
+        columns, external = execution_output.split(stdout, stderr)
+        db.session.execute(insert(Execution).values(id=execution_id, **columns, **values))
+        execution_output.store(execution_id, external)
+        db.session.commit()
+        return execution_id
+    
+    @staticmethod
+    def execute_batch(session_ids, bypass_cache=False):
+        """Queue one execution per session with a single INSERT and one Celery group
+        
+        Sessions that do not exist or are refused by admission control are
+        reported under ``rejected``; the rest share one ``batch_id``. Raises
+        ValueError when ``session_ids`` is not a usable list of UUIDs.
+        """
+        if not isinstance(session_ids, list) or not session_ids:
+            raise ValueError("session_ids must be a non-empty list")
+        if len(session_ids) > Config.BATCH_MAX_SESSIONS:
+            raise ValueError(f"At most {Config.BATCH_MAX_SESSIONS} sessions per batch")
+        try:
+            session_ids = list(dict.fromkeys(uuid.UUID(str(session_id)) for session_id in session_ids))
+        except ValueError:
+            raise ValueError("session_ids must contain valid session IDs")
+        
+        batch_id = uuid.uuid4()
+        logger.info(f"Starting batch {batch_id} for {len(session_ids)} sessions")
+        
+        session_drafts.flush_if_dirty(*session_ids)
+        sessions = {
+            row.id: row for row in db.session.execute(
+                select(CodeSession.id, CodeSession.language, CodeSession.source_code)
+                .where(CodeSession.id.in_(session_ids))
+            )
+        }
+        
+        memoize = not bypass_cache
+        now = datetime.utcnow()
+        rows, outputs, tasks, executions, rejected = [], [], [], [], []
+        for session_id in session_ids:
+            session = sessions.get(session_id)
+            if session is None:
+                rejected.append({"session_id": str(session_id), "error": "Session not found"})
+                continue
+            try:
+                admission_control.admit(session_id)
+            except admission_control.AdmissionRejected as e:
+                rejected.append({"session_id": str(session_id), "error": str(e), "retry_after": e.retry_after})
+                continue
+            
+            row = {
+                "id": uuid.uuid4(),
+                "session_id": session_id,
+                "batch_id": batch_id,
+                "status": 'QUEUED',
+                "stdout": None,
+                "stderr": None,
+                "output_external": False,
+                "execution_time_ms": None,
+                "queued_at": now,
+                "started_at": None,
+                "finished_at": None
+            }
+            cached = result_memo.lookup(session.language, session.source_code) if memoize else None
+            if cached:
+                columns, external = execution_output.split(cached['stdout'], cached['stderr'])
+                row.update(columns, status='COMPLETED', started_at=now, finished_at=now,
+                           execution_time_ms=cached['execution_time_ms'])
+                if external:
+                    outputs.append((row["id"], external))
+            else:
+                tasks.append((str(row["id"]), session.language, session.source_code))
+            rows.append(row)
+            executions.append({
+                "session_id": str(session_id),
+                "execution_id": str(row["id"]),
+                "status": row["status"]
+            })
+        
+        if tasks:
+            source_hashes = source_store.put_many([source_code for _, _, source_code in tasks])
+            tasks = [
+                execute_code_task.s(execution_id, language, source_hash, memoize=memoize)
+                for (execution_id, language, _), source_hash in zip(tasks, source_hashes)
+            ]
+        
+        if rows:
+            db.session.execute(insert(Execution), rows)
+            for execution_id, external in outputs:
+                execution_output.store(execution_id, external)
+            db.session.commit()
+        
+        if tasks:
+            execution_events.mark_queued(*(row["id"] for row in rows if row["status"] == 'QUEUED'))
+            group(tasks).apply_async()
+        
+        logger.info(f"Batch {batch_id}: {len(tasks)} queued, {len(rows) - len(tasks)} from memo, {len(rejected)} rejected")
+        
+        return {
+            "batch_id": str(batch_id),
+            "executions": executions,
+            "rejected": rejected
+        }
+    
+    @staticmethod
+    def get_batch(batch_id):
+        """Aggregate progress of a batch, or None if it has no executions"""
+        try:
+            batch_id = uuid.UUID(str(batch_id))
+        except ValueError:
+            return None
+        
+        status_counts = dict(db.session.execute(
+            select(Execution.status, func.count())
+            .where(Execution.batch_id == batch_id)
+            .group_by(Execution.status)
+        ).all())
+        
+        if not status_counts:
+            return None
+        
+        total = sum(status_counts.values())
+        finished = sum(n for status, n in status_counts.items() if status in execution_events.TERMINAL_STATUSES)
+        
+        return {
+            "batch_id": str(batch_id),
+            "total": total,
+            "finished": finished,
+            "done": finished == total,
+            "status_counts": status_counts
+        }
+    
+    @staticmethod
+    def get_execution(execution_id, wait=0):
+        """Get execution status and result
+        
+        With ``wait`` > 0 the call long-polls: it blocks (without touching the
+        database) until the worker reports a terminal status or ``wait`` seconds
+        pass, then reads the execution once.
+        """
+        if wait and wait > 0:
+            execution_events.wait_for_terminal(execution_id, min(wait, Config.LONG_POLL_MAX_WAIT))
+        
+        cached = read_cache.get_execution(execution_id)
+        if cached:
+            return cached
+        
         execution = Execution.query.get(execution_id)
         
         if not execution:
@@ -57,47 +255,115 @@ class CodeExecutionService:
         
         logger.info(f"Retrieving execution {execution_id} - Status: {execution.status}")
         
-        result = {
-            "execution_id": str(execution.id),
-            "status": execution.status
-        }
-        
-        # Include timestamps for tracking lifecycle
-        if execution.queued_at:
-            result["queued_at"] = execution.queued_at.isoformat()
-        if execution.started_at:
-            result["started_at"] = execution.started_at.isoformat()
-        if execution.finished_at:
-            result["finished_at"] = execution.finished_at.isoformat()
-        
-        # Additional information when completed
-        if execution.status == 'COMPLETED':
-            result.update({
-                "stdout": execution.stdout or "",
-                "stderr": execution.stderr or "",
-                "execution_time_ms": execution.execution_time_ms
-            })
-            logger.info(f"Execution {execution_id} completed in {execution.execution_time_ms}ms")
-        elif execution.status in ['FAILED', 'TIMEOUT']:
-            result.update({
-                "stdout": execution.stdout or "",
-                "stderr": execution.stderr or ""
-            })
-            logger.warning(f"Execution {execution_id} ended with status {execution.status}")
+        result = read_cache.execution_view(
+            execution.id,
+            execution.status,
+            queued_at=execution.queued_at,
+            started_at=execution.started_at,
+            finished_at=execution.finished_at,
+            execution_time_ms=execution.execution_time_ms,
+            resources={field: getattr(execution, field) for field in read_cache.RESOURCE_FIELDS},
+            **(execution_output.load(execution) if execution.status in execution_events.TERMINAL_STATUSES else {})
+        )
+        read_cache.fill_execution(result)
         
         return result
     
     @staticmethod
-    def get_session_executions(session_id):
-        """Get all executions for a session"""
-        executions = Execution.query.filter_by(session_id=session_id).order_by(Execution.queued_at.desc()).all()
-        
-        return [{
-            "execution_id": str(exec.id),
-            "status": exec.status,
-            "queued_at": exec.queued_at.isoformat() if exec.queued_at else None,
-            "finished_at": exec.finished_at.isoformat() if exec.finished_at else None,
-            "execution_time_ms": exec.execution_time_ms
-        } for exec in executions]
+    def is_archived(execution_id):
+        """Whether the execution was moved to the archive (see restore_execution)"""
+        try:
+            return execution_archive.is_archived(uuid.UUID(str(execution_id)))
+        except ValueError:
+            return False
+    
+    @staticmethod
+    def restore_execution(execution_id):
+        """Bring an archived execution back into the executions table
+        
+        Returns the execution with ``restored`` (whether it came from the
+        archive), or None if it does not exist at all. Raises
+        ``execution_archive.SessionDeleted`` when its session is gone and
+        ``execution_archive.ArchiveUnavailable`` when its archive file cannot be read.
+        """
+        try:
+            execution_id = uuid.UUID(str(execution_id))
+        except ValueError:
+            return None
+        
+        restored = execution_archive.restore(execution_id)
+        result = CodeExecutionService.get_execution(execution_id)
+        if result is None:
+            return None
+        
+        return {**result, "restored": restored}
+    
+    @staticmethod
+    def stream_execution(execution_id, last_event_id=0):
+        """Server-Sent Events generator for an execution, or None if it does not exist"""
+        pubsub = execution_events.subscribe(execution_id)
+        current = CodeExecutionService.get_execution(execution_id)
+        
+        if current is None:
+            pubsub.close()
+            return None
+        
+        logger.info(f"Streaming execution {execution_id} from event {last_event_id}")
+        
+        return execution_events.stream(str(execution_id), pubsub, current, last_event_id)
+    
+    @staticmethod
+    def get_session_executions(session_id, limit=None, cursor=None):
+        """Get a page of a session's executions, newest first
+        
+        Keyset pagination on ``(queued_at, id)``: pass the returned
+        ``next_cursor`` back as ``cursor`` for the following page (it is None
+        on the last page). Raises ValueError for an invalid cursor or limit.
+        """
+        limit = Config.EXECUTION_PAGE_SIZE if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        limit = min(limit, Config.EXECUTION_PAGE_MAX)
+        
+        query = (
+            select(
+                Execution.id,
+                Execution.status,
+                Execution.queued_at,
+                Execution.finished_at,
+                Execution.execution_time_ms
+            )
+            .where(Execution.session_id == session_id)
+            .order_by(Execution.queued_at.desc(), Execution.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            queued_at, execution_id = _decode_cursor(cursor)
+            query = query.where(tuple_(Execution.queued_at, Execution.id) < tuple_(queued_at, execution_id))
+        
+        rows = db.session.execute(query).all()
+        page = rows[:limit]
+        next_cursor = _encode_cursor(page[-1].queued_at, page[-1].id) if len(rows) > limit else None
+        
+        return {
+            "executions": [{
+                "execution_id": str(row.id),
+                "status": row.status,
+                "queued_at": row.queued_at.isoformat() if row.queued_at else None,
+                "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+                "execution_time_ms": row.execution_time_ms
+            } for row in page],
+            "next_cursor": next_cursor
+        }
+
+
+def _encode_cursor(queued_at, execution_id):
+    return base64.urlsafe_b64encode(f"{queued_at.isoformat()}|{execution_id}".encode()).decode()
+
 
-        
\ No newline at end of file
+def _decode_cursor(cursor):
+    try:
+        queued_at, execution_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(queued_at), uuid.UUID(execution_id)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
@@ -1,6 +1,7 @@
-from datetime import datetime
+from redis.exceptions import RedisError
 from app.models.db import db
 from app.models.code_sessions_model import CodeSession
+from app.services import execution_archive, read_cache, session_drafts
 
 class Session_Service:
     @staticmethod
@@ -18,42 +19,67 @@ class Session_Service:
 
     #update the code session
     @staticmethod
-    def update_session(session_id, language=None, source_code=None):
-        code_session = CodeSession.query.get(session_id)
+    def update_session(session_id, language=None, source_code=None, ops=None, base_version=None):
+        """Autosave into the session's Redis draft (flushed to Postgres later).
 
-        if not code_session:
-            return None
-        
-        if language is not None:
-            code_session.language = language
-        if source_code is not None:
-            code_session.source_code = source_code
+        Takes either ``ops`` (text edits against ``base_version``) or a full
+        ``source_code``. Raises VersionConflict / ValueError (see session_drafts).
+        """
+        if base_version is not None and (not isinstance(base_version, int) or isinstance(base_version, bool)):
+            raise ValueError("base_version must be an integer")
 
-        code_session.updated_at = datetime.utcnow()
-        db.session.commit()
+        try:
+            draft = session_drafts.edit(
+                session_id, ops=ops, source_code=source_code, base_version=base_version, language=language
+            )
+        except RedisError:
+            draft = session_drafts.edit_in_database(
+                session_id, ops=ops, source_code=source_code, base_version=base_version, language=language
+            )
+
+        if draft is None:
+            return None
 
         return {
-            "session_id": str(code_session.id),
-            "status": code_session.status
+            "session_id": str(session_id),
+            "status": draft['status'],
+            "version": draft['version']
         }
     
 
     #get a coding sessiong by session_id
     @staticmethod
     def get_session(session_id):
+        cached = read_cache.get_session(session_id)
+        if cached:
+            return Session_Service._with_draft(cached)
+
         session = CodeSession.query.get(session_id)
 
         if not session:
             return None
         
-        return {
+        result = {
             "session_id": str(session.id),
             "language": session.language,
             "source_code": session.source_code,
             "status": session.status,
+            "version": session.version,
             "created_at": session.created_at.isoformat(),
             "updated_at": session.updated_at.isoformat()
         }
+        read_cache.fill_session(result)
+
+        return Session_Service._with_draft(result)
+
+    @staticmethod
+    def _with_draft(result):
+        """Overlay unsaved autosaves on the stored session"""
+        draft = session_drafts.get(result['session_id'])
+        if draft and draft['version'] >= result.get('version', 0):
+            for field in ('language', 'source_code', 'version', 'updated_at'):
+                result[field] = draft[field]
+        return result
     
     #delete base on session_id
     @staticmethod
@@ -63,7 +89,13 @@ class Session_Service:
         if not session:
             return False
         
+        execution_ids = [execution.id for execution in session.executions]
         db.session.delete(session)
+        # archived executions go with it; they could never be restored without the session
+        execution_archive.forget_session(session.id)
         db.session.commit()
+        session_drafts.discard(session_id)
+        read_cache.invalidate_session(session_id)
+        read_cache.invalidate_executions(*execution_ids)
 
         return True
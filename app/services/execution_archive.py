@@ -0,0 +1,295 @@
+"""Execution retention: time partitions, archival to disk and restore.
+
+On Postgres, ``executions`` is range-partitioned by ``queued_at`` into monthly
+partitions named ``executions_pYYYYMM``. A ``executions_default`` partition
+catches anything outside them, such as restored rows whose month was dropped.
+``ensure_partitions`` creates the current month and EXECUTION_PARTITIONS_AHEAD
+months ahead.
+
+``archive_expired`` runs from celery beat. It moves executions queued more
+than EXECUTION_RETENTION_DAYS ago, with their full output, into
+gzip-compressed JSON Lines files under EXECUTION_ARCHIVE_DIR, then drops
+monthly partitions that are past the cutoff and empty. Each record is its own
+gzip member, so the file is still one valid ``.jsonl.gz``, and ``restore``
+reads back a single execution by seeking to it. ``execution_archive`` indexes
+every archived execution. A file is fsynced and renamed into place before the
+index rows are written and the executions deleted, in one transaction.
+
+``restore`` puts an archived execution back into ``executions``. A restored
+row is kept for EXECUTION_RESTORE_DAYS before it is removed again. Its archive
+file still holds the record, so it is not rewritten.
+"""
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from app.config import Config
+from app.models.code_sessions_model import CodeSession
+from app.models.db import db
+from app.models.execution_archive_model import ExecutionArchive
+from app.models.execution_model import Execution
+from app.models.execution_output_model import ExecutionOutput
+from app.redis_client import get_redis
+from app.services import execution_output, read_cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'executions:archive:lock'
+PARTITION_PREFIX = 'executions_p'
+DEFAULT_PARTITION = 'executions_default'
+
+RECORD_COLUMNS = (
+    'id', 'session_id', 'batch_id', 'status', 'execution_time_ms', *read_cache.RESOURCE_FIELDS,
+    'queued_at', 'started_at', 'finished_at',
+)
+UUID_COLUMNS = ('id', 'session_id', 'batch_id')
+DATETIME_COLUMNS = ('queued_at', 'started_at', 'finished_at')
+
+
+class ArchiveUnavailable(Exception):
+    """The execution is archived but its archive file cannot be read"""
+
+
+class SessionDeleted(Exception):
+    """The execution is archived but its session has been deleted since (HTTP 410)"""
+
+
+def _is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('executions')"
+    )).first() is not None
+
+
+def _month_start(moment, months=0):
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def ensure_partitions(now=None):
+    """Create the default partition, this month's and the next EXECUTION_PARTITIONS_AHEAD (Postgres only)"""
+    if not _is_partitioned():
+        return []
+    now = now or datetime.utcnow()
+    created = []
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF executions DEFAULT"))
+    db.session.commit()
+    for months in range(Config.EXECUTION_PARTITIONS_AHEAD + 1):
+        start, end = _month_start(now, months), _month_start(now, months + 1)
+        name = f"{PARTITION_PREFIX}{start:%Y%m}"
+        try:
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF executions "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            db.session.commit()
+            created.append(name)
+        except Exception as e:
+            # e.g. the default partition already holds rows for this month
+            db.session.rollback()
+            logger.warning(f"Could not create partition {name}: {str(e)}")
+    return created
+
+
+def drop_expired_partitions(cutoff):
+    """Drop monthly partitions that end before ``cutoff`` and hold no rows (Postgres only)"""
+    if not _is_partitioned():
+        return []
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('executions') AND c.relname LIKE :prefix"
+    ), {'prefix': PARTITION_PREFIX + '%'}).scalars().all()
+    dropped = []
+    for name in sorted(names):
+        try:
+            end = _month_start(datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m'), 1)
+        except ValueError:
+            continue  # not one of ours
+        if end > cutoff:
+            continue
+        if db.session.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            continue  # restored executions still live here
+        db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.commit()
+        dropped.append(name)
+        logger.info(f"Dropped expired partition {name}")
+    return dropped
+
+
+def _record(row, output):
+    record = {}
+    for column in RECORD_COLUMNS:
+        value = getattr(row, column)
+        if value is not None and column in UUID_COLUMNS:
+            value = str(value)
+        elif value is not None and column in DATETIME_COLUMNS:
+            value = value.isoformat()
+        record[column] = value
+    record['stdout'] = output.get('stdout', row.stdout)
+    record['stderr'] = output.get('stderr', row.stderr)
+    return record
+
+
+def _write_archive(records):
+    """Write one gzip member per record; returns the file (relative) and each record's (offset, length)"""
+    now = datetime.utcnow()
+    relative = os.path.join(
+        f"{now:%Y}", f"{now:%m}", f"executions-{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    )
+    path = os.path.join(Config.EXECUTION_ARCHIVE_DIR, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    positions = []
+    with open(path + '.tmp', 'wb') as f:
+        for record in records:
+            member = gzip.compress((json.dumps(record) + '\n').encode('utf-8'), mtime=0)
+            positions.append((f.tell(), len(member)))
+            f.write(member)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(path + '.tmp', path)
+    return relative, positions
+
+
+def _archive_batch(cutoff, restored_cutoff):
+    """Archive up to EXECUTION_ARCHIVE_BATCH expired executions; returns how many rows left the table"""
+    rows = db.session.execute(
+        select(
+            *[getattr(Execution, column) for column in RECORD_COLUMNS],
+            Execution.stdout, Execution.stderr, Execution.output_external,
+            ExecutionArchive.execution_id.label('archived_id')
+        )
+        .outerjoin(ExecutionArchive, ExecutionArchive.execution_id == Execution.id)
+        .where(
+            Execution.queued_at < cutoff,
+            or_(ExecutionArchive.execution_id.is_(None), ExecutionArchive.restored_at < restored_cutoff)
+        )
+        .order_by(Execution.queued_at, Execution.id)
+        .limit(Config.EXECUTION_ARCHIVE_BATCH)
+    ).all()
+    if not rows:
+        return 0
+
+    # restored executions are already in an archive file, they only leave the table
+    fresh = [row for row in rows if row.archived_id is None]
+    if fresh:
+        external = execution_output.load_external([row.id for row in fresh if row.output_external])
+        relative, positions = _write_archive([_record(row, external.get(row.id, {})) for row in fresh])
+        db.session.execute(insert(ExecutionArchive), [
+            dict(
+                execution_id=row.id,
+                session_id=row.session_id,
+                queued_at=row.queued_at,
+                archive_file=relative,
+                byte_offset=offset,
+                length=length,
+            )
+            for row, (offset, length) in zip(fresh, positions)
+        ])
+
+    execution_ids = [row.id for row in rows]
+    db.session.execute(delete(ExecutionOutput).where(ExecutionOutput.execution_id.in_(execution_ids)))
+    db.session.execute(
+        delete(Execution)
+        .where(Execution.id.in_(execution_ids), Execution.queued_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    read_cache.invalidate_executions(*execution_ids)
+    logger.info(f"Archived {len(fresh)} executions, removed {len(rows)} from the executions table")
+    return len(rows)
+
+
+def archive_expired(now=None):
+    """Archive executions older than EXECUTION_RETENTION_DAYS and drop their partitions"""
+    summary = {'removed': 0, 'dropped_partitions': [], 'created_partitions': []}
+    if Config.EXECUTION_RETENTION_DAYS <= 0:
+        return summary
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=Config.EXECUTION_RETENTION_DAYS)
+    restored_cutoff = now - timedelta(days=Config.EXECUTION_RESTORE_DAYS)
+
+    # one archiver at a time, even if a run outlasts the beat interval
+    lock = get_redis().lock(LOCK_KEY, timeout=Config.EXECUTION_ARCHIVE_INTERVAL * 2, blocking=False)
+    if not lock.acquire():
+        logger.info("Execution archival already running elsewhere, skipping")
+        return summary
+    try:
+        summary['created_partitions'] = ensure_partitions(now)
+        for _ in range(Config.EXECUTION_ARCHIVE_MAX_BATCHES):
+            removed = _archive_batch(cutoff, restored_cutoff)
+            summary['removed'] += removed
+            if removed < Config.EXECUTION_ARCHIVE_BATCH:
+                break
+        summary['dropped_partitions'] = drop_expired_partitions(cutoff)
+    finally:
+        lock.release()
+    return summary
+
+
+def is_archived(execution_id):
+    return db.session.get(ExecutionArchive, execution_id) is not None
+
+
+def forget_session(session_id):
+    """Drop the archive index of a deleted session; its records can no longer be restored"""
+    db.session.execute(delete(ExecutionArchive).where(ExecutionArchive.session_id == session_id))
+
+
+def _read_record(entry):
+    try:
+        with open(os.path.join(Config.EXECUTION_ARCHIVE_DIR, entry.archive_file), 'rb') as f:
+            f.seek(entry.byte_offset)
+            return json.loads(gzip.decompress(f.read(entry.length)))
+    except (OSError, EOFError, ValueError) as e:
+        logger.error(f"Could not read execution {entry.execution_id} from {entry.archive_file}: {str(e)}")
+        raise ArchiveUnavailable(f"Archive file {entry.archive_file} is not readable")
+
+
+def _forget_orphan(entry):
+    if entry is not None:
+        db.session.delete(entry)
+        db.session.commit()
+    raise SessionDeleted("The session of this execution has been deleted")
+
+
+def restore(execution_id):
+    """Put an archived execution back into ``executions``; False when it was never archived
+
+    Raises SessionDeleted when its session no longer exists (the index entry is
+    dropped too) and ArchiveUnavailable when the archive file cannot be read.
+    """
+    entry = db.session.get(ExecutionArchive, execution_id)
+    if entry is None:
+        return False
+
+    if db.session.get(CodeSession, entry.session_id) is None:
+        _forget_orphan(entry)
+
+    live = db.session.execute(select(Execution.id).where(Execution.id == execution_id)).first()
+    if live is None:
+        record = _read_record(entry)
+        columns, external = execution_output.split(record.pop('stdout'), record.pop('stderr'))
+        for column in UUID_COLUMNS:
+            if record[column] is not None:
+                record[column] = uuid.UUID(record[column])
+        for column in DATETIME_COLUMNS:
+            if record[column] is not None:
+                record[column] = datetime.fromisoformat(record[column])
+        try:
+            db.session.execute(insert(Execution).values(**record, **columns))
+        except IntegrityError:
+            # the session was deleted between the check above and the insert
+            db.session.rollback()
+            _forget_orphan(db.session.get(ExecutionArchive, execution_id))
+        execution_output.store(execution_id, external)
+        logger.info(f"Restored execution {execution_id} from {entry.archive_file}")
+
+    entry.restored_at = datetime.utcnow()
+    db.session.commit()
+    return True
@@ -0,0 +1,181 @@
+"""Live execution events over Redis.
+
+The worker publishes status transitions and stdout/stderr chunks for each
+execution. Every event is appended to a short-lived Redis list (so late
+subscribers can replay what they missed) and published on a pub/sub channel.
+Events carry a sequence number that is the event's position in that list, so
+a subscriber that replays the list and then follows the channel can drop
+duplicates.
+"""
+import json
+import logging
+import time
+from app.config import Config
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('COMPLETED', 'FAILED', 'TIMEOUT', 'OUTPUT_LIMIT', 'MEMORY_LIMIT', 'CPU_LIMIT')
+
+
+def channel_name(execution_id):
+    return f'execution:{execution_id}:events'
+
+
+def log_key(execution_id):
+    return f'execution:{execution_id}:log'
+
+
+def status_key(execution_id):
+    return f'execution:{execution_id}:status'
+
+
+def mark_queued(*execution_ids):
+    """Record the QUEUED state so long-polls can wait without reading the database"""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for execution_id in execution_ids:
+            pipe.set(status_key(execution_id), 'QUEUED', ex=Config.EXECUTION_EVENTS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Executions {', '.join(map(str, execution_ids))}: could not record QUEUED status ({str(e)})")
+
+
+class ExecutionEventPublisher:
+    """Publishes events for one execution (single writer: the worker running it)"""
+
+    def __init__(self, execution_id):
+        self.execution_id = str(execution_id)
+        self.published_bytes = 0
+        try:
+            self.seq = get_redis().llen(log_key(self.execution_id))
+        except Exception as e:
+            logger.warning(f"Execution {self.execution_id}: live events unavailable ({str(e)})")
+            self.seq = None
+
+    def _publish(self, event, data):
+        if self.seq is None:
+            return
+        self.seq += 1
+        payload = json.dumps({'seq': self.seq, 'event': event, 'data': data})
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.rpush(log_key(self.execution_id), payload)
+            pipe.expire(log_key(self.execution_id), Config.EXECUTION_EVENTS_TTL)
+            if event == 'status':
+                pipe.set(status_key(self.execution_id), data['status'], ex=Config.EXECUTION_EVENTS_TTL)
+            pipe.publish(channel_name(self.execution_id), payload)
+            pipe.execute()
+        except Exception as e:
+            # live events are best effort, the result is still written to the database
+            logger.warning(f"Execution {self.execution_id}: could not publish {event} event ({str(e)})")
+            self.seq = None
+
+    def status(self, status, **details):
+        self._publish('status', dict(details, status=status))
+
+    def output(self, stream, text):
+        # never stream more than the worker would store
+        if self.published_bytes >= Config.MAX_STREAMED_OUTPUT:
+            return
+        self.published_bytes += len(text)
+        self._publish(stream, {'text': text})
+
+
+def format_sse(event, data, seq=None):
+    lines = []
+    if seq is not None:
+        lines.append(f'id: {seq}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def subscribe(execution_id):
+    """Subscribe before reading current state so no event can slip through"""
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel_name(execution_id))
+    return pubsub
+
+
+def wait_for_terminal(execution_id, timeout):
+    """Block until the worker reports a terminal status or ``timeout`` seconds pass.
+
+    Only Redis is consulted. Returns immediately when the status is unknown to
+    Redis (e.g. the execution predates the events TTL) so the caller falls back
+    to reading the database.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        pubsub = subscribe(execution_id)
+    except Exception as e:
+        logger.warning(f"Execution {execution_id}: cannot wait for completion ({str(e)})")
+        return
+    try:
+        status = get_redis().get(status_key(execution_id))
+        if status is None or status in TERMINAL_STATUSES:
+            return
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = pubsub.get_message(timeout=remaining)
+            if message is None:
+                continue
+            event = json.loads(message['data'])
+            if event['event'] == 'status' and event['data']['status'] in TERMINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
+
+
+def stream(execution_id, pubsub, current, last_event_id=0):
+    """Yield SSE frames for one execution.
+
+    ``current`` is the execution as returned by ``get_execution``, read after
+    ``pubsub`` was subscribed. Events up to ``last_event_id`` (the client's
+    ``Last-Event-ID``) are skipped. The current status is only sent up front
+    when there is nothing to replay and the run is still going, so statuses
+    never go backwards or repeat.
+    """
+    redis_client = get_redis()
+    last_seq = last_event_id
+    try:
+        replay = redis_client.lrange(log_key(execution_id), last_seq, -1)
+        if not replay and current['status'] not in TERMINAL_STATUSES:
+            # a replay carries the status history itself; ``current`` first would run ahead of it
+            yield format_sse('status', {'status': current['status']})
+        for payload in replay:
+            message = json.loads(payload)
+            last_seq = message['seq']
+            yield format_sse(message['event'], message['data'], message['seq'])
+            if message['event'] == 'status' and message['data']['status'] in TERMINAL_STATUSES:
+                return
+
+        if current['status'] in TERMINAL_STATUSES:
+            # finished before we connected and the live log has expired
+            if current.get('stdout'):
+                yield format_sse('stdout', {'text': current['stdout']})
+            if current.get('stderr'):
+                yield format_sse('stderr', {'text': current['stderr']})
+            yield format_sse('status', {k: v for k, v in current.items() if k not in ('stdout', 'stderr')})
+            return
+
+        last_event = last_frame = time.monotonic()
+        while time.monotonic() - last_event < Config.STREAM_IDLE_TIMEOUT:
+            message = pubsub.get_message(timeout=Config.STREAM_HEARTBEAT_SECONDS)
+            if message is None:
+                if time.monotonic() - last_frame >= Config.STREAM_HEARTBEAT_SECONDS:
+                    last_frame = time.monotonic()
+                    yield ': keep-alive\n\n'
+                continue
+            event = json.loads(message['data'])
+            if event['seq'] <= last_seq:
+                continue
+            last_seq = event['seq']
+            last_event = last_frame = time.monotonic()
+            yield format_sse(event['event'], event['data'], event['seq'])
+            if event['event'] == 'status' and event['data']['status'] in TERMINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
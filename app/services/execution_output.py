@@ -0,0 +1,84 @@
+"""Out-of-row storage for execution output.
+
+Output up to OUTPUT_INLINE_LIMIT bytes per stream stays in the executions row.
+A larger stream is written to ``execution_outputs`` and zlib-compressed when it
+exceeds OUTPUT_COMPRESS_THRESHOLD bytes. The row then keeps only a preview and
+``output_external`` is set. The output columns are deferred, so loading an
+execution never reads output unless a caller asks for it.
+"""
+import zlib
+from sqlalchemy import insert, select
+from app.config import Config
+from app.models.db import db
+from app.models.execution_output_model import ExecutionOutput
+
+STREAMS = ('stdout', 'stderr')
+
+
+def _encode(text):
+    data = text.encode('utf-8')
+    size = len(data)
+    if size > Config.OUTPUT_COMPRESS_THRESHOLD:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < size:
+            return {'codec': 'zlib', 'size': size, 'data': compressed}
+    return {'codec': 'raw', 'size': size, 'data': data}
+
+
+def _decode(codec, data):
+    if codec == 'zlib':
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+def split(stdout, stderr):
+    """Return ``(columns, external)`` for writing one execution's output.
+
+    ``columns`` always holds ``stdout``, ``stderr`` and ``output_external`` for
+    the executions row; ``external`` maps streams too large to keep inline to
+    their full text (pass it to ``store``).
+    """
+    columns = {}
+    external = {}
+    for stream, text in zip(STREAMS, (stdout, stderr)):
+        if text and len(text.encode('utf-8')) > Config.OUTPUT_INLINE_LIMIT:
+            external[stream] = text
+            text = text[:Config.OUTPUT_INLINE_LIMIT]
+        columns[stream] = text
+    columns['output_external'] = bool(external)
+    return columns, external
+
+
+def store(execution_id, external):
+    """Insert the out-of-row streams (part of the caller's transaction)"""
+    if external:
+        db.session.execute(insert(ExecutionOutput), [
+            dict(execution_id=execution_id, stream=stream, **_encode(text))
+            for stream, text in external.items()
+        ])
+
+
+def load(execution):
+    """Full ``{'stdout': ..., 'stderr': ...}`` of an execution"""
+    output = {'stdout': execution.stdout, 'stderr': execution.stderr}
+    if execution.output_external:
+        rows = db.session.execute(
+            select(ExecutionOutput.stream, ExecutionOutput.codec, ExecutionOutput.data)
+            .where(ExecutionOutput.execution_id == execution.id)
+        )
+        for row in rows:
+            output[row.stream] = _decode(row.codec, row.data)
+    return output
+
+
+def load_external(execution_ids):
+    """Out-of-row streams of many executions in one query: ``{execution_id: {stream: text}}``"""
+    output = {}
+    if execution_ids:
+        rows = db.session.execute(
+            select(ExecutionOutput.execution_id, ExecutionOutput.stream, ExecutionOutput.codec, ExecutionOutput.data)
+            .where(ExecutionOutput.execution_id.in_(execution_ids))
+        )
+        for row in rows:
+            output.setdefault(row.execution_id, {})[row.stream] = _decode(row.codec, row.data)
+    return output
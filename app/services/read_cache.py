@@ -0,0 +1,132 @@
+"""Redis read-through cache for execution and session reads.
+
+Executions: the API and the worker write each state through as it happens.
+Readers fill the cache from the database only for terminal states, which can
+no longer change, so a slow reader can never overwrite a newer status.
+QUEUED/RUNNING views only live for READ_CACHE_ACTIVE_TTL, and the worker drops
+the cached view before it writes the result, so a lost final write-through
+cannot leave readers on a stale status.
+Sessions are cached on read and dropped on PATCH/DELETE.
+"""
+import json
+import logging
+import uuid
+from app.config import Config
+from app.redis_client import get_redis
+from app.services.execution_events import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+def _key(kind, object_id):
+    try:
+        return f'cache:{kind}:{uuid.UUID(str(object_id))}'
+    except ValueError:
+        return None
+
+
+def _get(kind, object_id):
+    key = _key(kind, object_id)
+    if not Config.READ_CACHE_ENABLED or key is None:
+        return None
+    try:
+        cached = get_redis().get(key)
+    except Exception as e:
+        logger.warning(f"Read cache lookup failed: {str(e)}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def _set(kind, object_id, value, ttl):
+    key = _key(kind, object_id)
+    if not Config.READ_CACHE_ENABLED or key is None:
+        return
+    try:
+        get_redis().set(key, json.dumps(value), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Read cache write failed: {str(e)}")
+
+
+def _delete(kind, *object_ids):
+    keys = [key for key in (_key(kind, object_id) for object_id in object_ids) if key]
+    if not Config.READ_CACHE_ENABLED or not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Read cache invalidation failed: {str(e)}")
+
+
+# per-execution resource accounting, returned under "resources" once finished
+RESOURCE_FIELDS = (
+    'compile_time_ms', 'run_time_ms', 'cpu_user_ms', 'cpu_sys_ms', 'max_rss_kb',
+    'voluntary_ctx_switches', 'involuntary_ctx_switches',
+)
+
+
+def execution_view(execution_id, status, queued_at=None, started_at=None, finished_at=None,
+                   stdout=None, stderr=None, execution_time_ms=None, resources=None):
+    """The GET /executions/<id> representation of an execution"""
+    result = {
+        "execution_id": str(execution_id),
+        "status": status
+    }
+
+    # Include timestamps for tracking lifecycle
+    if queued_at:
+        result["queued_at"] = queued_at.isoformat()
+    if started_at:
+        result["started_at"] = started_at.isoformat()
+    if finished_at:
+        result["finished_at"] = finished_at.isoformat()
+
+    # Additional information when completed
+    if status == 'COMPLETED':
+        result.update({
+            "stdout": stdout or "",
+            "stderr": stderr or "",
+            "execution_time_ms": execution_time_ms
+        })
+    elif status in TERMINAL_STATUSES:
+        result.update({
+            "stdout": stdout or "",
+            "stderr": stderr or ""
+        })
+
+    resources = {field: value for field, value in (resources or {}).items() if value is not None}
+    if status in TERMINAL_STATUSES and resources:
+        result["resources"] = resources
+
+    return result
+
+
+def get_execution(execution_id):
+    return _get('execution', execution_id)
+
+
+def write_execution(view):
+    """Write-through from the execution's owner (the API on insert, then the worker)"""
+    terminal = view['status'] in TERMINAL_STATUSES
+    _set('execution', view['execution_id'], view, Config.READ_CACHE_TTL if terminal else Config.READ_CACHE_ACTIVE_TTL)
+
+
+def fill_execution(view):
+    """Read-through fill: only terminal states are safe to cache from a read"""
+    if view['status'] in TERMINAL_STATUSES:
+        _set('execution', view['execution_id'], view, Config.READ_CACHE_TTL)
+
+
+def invalidate_executions(*execution_ids):
+    _delete('execution', *execution_ids)
+
+
+def get_session(session_id):
+    return _get('session', session_id)
+
+
+def fill_session(view):
+    _set('session', view['session_id'], view, Config.SESSION_CACHE_TTL)
+
+
+def invalidate_session(session_id):
+    _delete('session', session_id)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import subprocess
+import time
+from app.config import Config
+from app.redis_client import get_redis
+from app.runtime import runners
+from app.services.source_store import hash_source
+
+logger = logging.getLogger(__name__)
+
+MEMO_KEY_PREFIX = 'memo:result:'
+MEMO_INDEX_KEY = 'memo:index'
+RUNTIME_VERSION_KEY = 'memo:runtime-version:'
+RUNTIME_VERSION_CACHE_SECONDS = 60
+
+# per-process caches: local runtime versions (worker) and published ones (API)
+_local_versions = {}
+_published_versions = {}
+
+
+def memo_key(language, source_code, stdin, runtime_version):
+    digest = hashlib.sha256()
+    for part in (language, hash_source(source_code), stdin or '', runtime_version):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return MEMO_KEY_PREFIX + digest.hexdigest()
+
+
+def local_runtime_version(language):
+    """Version string of the runtime installed on this worker"""
+    if language not in _local_versions:
+        runner = runners.get(language)
+        if runner is None or runner.version_command is None:
+            return None
+        try:
+            result = subprocess.run(runner.version_command, capture_output=True, text=True, timeout=10)
+            output = (result.stdout or result.stderr).strip()
+            _local_versions[language] = output.splitlines()[0] if output else None
+        except (OSError, subprocess.SubprocessError):
+            _local_versions[language] = None
+    return _local_versions[language]
+
+
+def publish_runtime_versions():
+    """Let the API know which runtime versions the workers run"""
+    try:
+        redis_client = get_redis()
+        for runner in runners.all_runners():
+            version = local_runtime_version(runner.language)
+            if version:
+                redis_client.set(RUNTIME_VERSION_KEY + runner.language, version)
+    except Exception as e:
+        logger.warning(f"Could not publish runtime versions: {str(e)}")
+
+
+def _published_runtime_version(language):
+    cached = _published_versions.get(language)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    version = get_redis().get(RUNTIME_VERSION_KEY + language)
+    _published_versions[language] = (version, time.monotonic() + RUNTIME_VERSION_CACHE_SECONDS)
+    return version
+
+
+def lookup(language, source_code, stdin=''):
+    """Return a memoized COMPLETED result or None"""
+    if not Config.RESULT_MEMO_ENABLED:
+        return None
+    try:
+        version = _published_runtime_version(language)
+        if not version:
+            return None
+        cached = get_redis().get(memo_key(language, source_code, stdin, version))
+    except Exception as e:
+        logger.warning(f"Result memo lookup failed: {str(e)}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def store(language, source_code, stdin, stdout, stderr, execution_time_ms):
+    """Remember a COMPLETED result, evicting the oldest entries past the size cap"""
+    version = local_runtime_version(language)
+    if not Config.RESULT_MEMO_ENABLED or not version:
+        return
+    key = memo_key(language, source_code, stdin, version)
+    value = json.dumps({
+        'stdout': stdout,
+        'stderr': stderr,
+        'execution_time_ms': execution_time_ms,
+    })
+    now = time.time()
+    try:
+        redis_client = get_redis()
+        pipe = redis_client.pipeline()
+        pipe.set(key, value, ex=Config.RESULT_MEMO_TTL)
+        pipe.zadd(MEMO_INDEX_KEY, {key: now})
+        pipe.zremrangebyscore(MEMO_INDEX_KEY, '-inf', now - Config.RESULT_MEMO_TTL)
+        pipe.zcard(MEMO_INDEX_KEY)
+        size = pipe.execute()[-1]
+
+        overflow = size - Config.RESULT_MEMO_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [member for member, _ in redis_client.zpopmin(MEMO_INDEX_KEY, overflow)]
+            if evicted:
+                redis_client.delete(*evicted)
+    except Exception as e:
+        logger.warning(f"Result memo store failed: {str(e)}")
@@ -0,0 +1,246 @@
+"""Redis drafts for code session autosave.
+
+Autosaves are applied to a Redis hash per session (the draft), never directly to
+Postgres. Every edit bumps the session's ``version``; an edit based on an older
+version is rejected with VersionConflict. Sessions with unsaved edits are kept
+in a set and flushed to Postgres periodically (``flush_session_drafts``) and
+right before a Run.
+"""
+import logging
+import uuid
+from datetime import datetime
+from redis.exceptions import WatchError
+from sqlalchemy import update
+from app.config import Config
+from app.models.db import db
+from app.models.code_sessions_model import CodeSession
+from app.redis_client import get_redis
+from app.services import read_cache
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'session:drafts:dirty'
+
+# drop the session from the dirty set only if no edit arrived since it was read
+MARK_CLEAN_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'version') == ARGV[1] then
+  redis.call('SREM', KEYS[2], ARGV[2])
+  redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+"""
+
+
+class VersionConflict(Exception):
+    """The edit was based on an outdated version of the session (HTTP 409)"""
+
+    def __init__(self, version, source_code):
+        super().__init__(f'Version conflict: the session is at version {version}')
+        self.version = version
+        self.source_code = source_code
+
+
+def canonical_id(session_id):
+    """The one spelling of ``session_id`` used in Redis; raises ValueError for an invalid ID
+
+    Postgres accepts upper case, braces and missing hyphens; without this each
+    spelling would get its own draft and dirty marker.
+    """
+    return str(uuid.UUID(str(session_id)))
+
+
+def draft_key(session_id):
+    return f'session:draft:{canonical_id(session_id)}'
+
+
+def apply_ops(source_code, ops):
+    """Apply text edits in order; each is ``{"pos": int, "delete": int, "insert": str}``.
+
+    Positions count characters in the text as left by the previous edit.
+    Raises ValueError for a malformed or out-of-range edit.
+    """
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError("each op must be an object")
+        pos = op.get('pos')
+        delete = op.get('delete', 0)
+        insert = op.get('insert', '')
+        if (
+            not isinstance(pos, int) or not isinstance(delete, int) or not isinstance(insert, str)
+            or pos < 0 or delete < 0 or pos + delete > len(source_code)
+        ):
+            raise ValueError(f"Invalid op {op} for a text of {len(source_code)} characters")
+        source_code = source_code[:pos] + insert + source_code[pos + delete:]
+    return source_code
+
+
+def _from_row(row):
+    return {
+        'source_code': row.source_code,
+        'language': row.language,
+        'status': row.status,
+        'version': row.version,
+        'updated_at': row.updated_at.isoformat(),
+    }
+
+
+def _load(session_id):
+    row = db.session.execute(
+        db.select(
+            CodeSession.source_code,
+            CodeSession.language,
+            CodeSession.status,
+            CodeSession.version,
+            CodeSession.updated_at
+        ).where(CodeSession.id == session_id)
+    ).first()
+    return _from_row(row) if row else None
+
+
+def get(session_id):
+    """The session's draft, or None when there is none (or Redis is unavailable)"""
+    try:
+        draft = get_redis().hgetall(draft_key(session_id))
+    except Exception as e:
+        logger.warning(f"Session {session_id}: could not read draft ({str(e)})")
+        return None
+    if not draft:
+        return None
+    draft['version'] = int(draft['version'])
+    return draft
+
+
+def _apply(draft, ops, source_code, language):
+    version = int(draft['version'])
+    draft.update(
+        source_code=source_code if source_code is not None else apply_ops(draft['source_code'], ops or []),
+        language=language or draft['language'],
+        version=version + 1,
+        updated_at=datetime.utcnow().isoformat(),
+    )
+    return draft
+
+
+def edit(session_id, ops=None, source_code=None, base_version=None, language=None):
+    """Apply an autosave to the draft and return the new draft (None if no such session).
+
+    The edit is either ``ops`` (see ``apply_ops``) or a full ``source_code``.
+    Raises VersionConflict when ``base_version`` is given and is not the
+    current version, and ValueError for invalid ops.
+    """
+    key = draft_key(session_id)
+    with get_redis().pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                draft = pipe.hgetall(key) or _load(session_id)
+                if draft is None:
+                    return None
+                version = int(draft['version'])
+                if base_version is not None and base_version != version:
+                    raise VersionConflict(version, draft['source_code'])
+
+                draft = _apply(draft, ops, source_code, language)
+                pipe.multi()
+                pipe.hset(key, mapping=draft)
+                pipe.persist(key)
+                pipe.sadd(DIRTY_KEY, canonical_id(session_id))
+                pipe.execute()
+                return draft
+            except WatchError:
+                continue
+
+
+def edit_in_database(session_id, ops=None, source_code=None, base_version=None, language=None):
+    """Fallback for ``edit`` when Redis is unavailable: same contract, written straight to Postgres"""
+    draft = _load(session_id)
+    if draft is None:
+        return None
+    version = draft['version']
+    if base_version is not None and base_version != version:
+        raise VersionConflict(version, draft['source_code'])
+
+    draft = _apply(draft, ops, source_code, language)
+    result = db.session.execute(
+        update(CodeSession)
+        .where(CodeSession.id == session_id, CodeSession.version == version)
+        .values(
+            source_code=draft['source_code'],
+            language=draft['language'],
+            version=draft['version'],
+            updated_at=datetime.fromisoformat(draft['updated_at'])
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount == 0:
+        current = _load(session_id)
+        if current is None:
+            return None
+        raise VersionConflict(current['version'], current['source_code'])
+    read_cache.invalidate_session(session_id)
+    return draft
+
+
+def flush(session_id):
+    """Write the session's draft to Postgres if it has unsaved edits"""
+    redis_client = get_redis()
+    draft = get(session_id)
+    if draft is None:
+        redis_client.srem(DIRTY_KEY, canonical_id(session_id))
+        return False
+
+    db.session.execute(
+        update(CodeSession)
+        .where(CodeSession.id == session_id, CodeSession.version < draft['version'])
+        .values(
+            source_code=draft['source_code'],
+            language=draft['language'],
+            version=draft['version'],
+            updated_at=datetime.fromisoformat(draft['updated_at'])
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    read_cache.invalidate_session(session_id)
+    redis_client.eval(
+        MARK_CLEAN_SCRIPT, 2, draft_key(session_id), DIRTY_KEY,
+        draft['version'], canonical_id(session_id), Config.SESSION_DRAFT_TTL
+    )
+    return True
+
+
+def flush_if_dirty(*session_ids):
+    """Flush before a Run so the worker executes what the user sees"""
+    try:
+        session_ids = [canonical_id(session_id) for session_id in session_ids]
+        dirty = get_redis().smismember(DIRTY_KEY, session_ids)
+        for session_id, is_dirty in zip(session_ids, dirty):
+            if is_dirty:
+                flush(uuid.UUID(session_id))
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not flush drafts before run ({str(e)})")
+
+
+def flush_all():
+    """Flush every session with unsaved edits; returns how many were flushed"""
+    flushed = 0
+    for session_id in get_redis().sscan_iter(DIRTY_KEY):
+        try:
+            flushed += flush(uuid.UUID(session_id))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Session {session_id}: draft flush failed ({str(e)})")
+    return flushed
+
+
+def discard(session_id):
+    try:
+        pipe = get_redis().pipeline()
+        pipe.delete(draft_key(session_id))
+        pipe.srem(DIRTY_KEY, canonical_id(session_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Session {session_id}: could not discard draft ({str(e)})")
@@ -0,0 +1,92 @@
+"""Content-addressed source snapshots for task messages.
+
+The API stores each program's source once in Redis under ``source:<sha256>``
+and queues only the hash, so a broker message stays the same size however large
+the source is and identical classroom submissions share one copy. Every put
+refreshes the snapshot's SOURCE_TTL, which must outlive the longest queue wait.
+Workers keep recently fetched sources in a small in-process LRU.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from app.config import Config
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SOURCE_KEY_PREFIX = 'source:'
+
+# worker-side LRU of source hash -> source code, bounded by SOURCE_LOCAL_CACHE_BYTES
+_local = OrderedDict()
+_local_bytes = 0
+_local_lock = threading.Lock()
+
+
+class SourceNotFound(Exception):
+    """The snapshot expired (or was never stored) before a worker fetched it"""
+
+
+def hash_source(source_code):
+    return hashlib.sha256(source_code.encode('utf-8')).hexdigest()
+
+
+def _key(source_hash):
+    return SOURCE_KEY_PREFIX + source_hash
+
+
+def put_many(sources):
+    """Store the sources and return their hashes, in order.
+
+    Snapshots already in Redis only get their TTL refreshed, so a source
+    travels to Redis once however many executions reference it.
+    """
+    hashes = [hash_source(source_code) for source_code in sources]
+    unique = dict(zip(hashes, sources))
+
+    redis_client = get_redis()
+    pipe = redis_client.pipeline(transaction=False)
+    for source_hash in unique:
+        pipe.expire(_key(source_hash), Config.SOURCE_TTL)
+    missing = [source_hash for source_hash, found in zip(unique, pipe.execute()) if not found]
+
+    if missing:
+        pipe = redis_client.pipeline(transaction=False)
+        for source_hash in missing:
+            pipe.set(_key(source_hash), unique[source_hash], ex=Config.SOURCE_TTL)
+        pipe.execute()
+    return hashes
+
+
+def put(source_code):
+    return put_many([source_code])[0]
+
+
+def _remember(source_hash, source_code):
+    global _local_bytes
+    size = len(source_code.encode('utf-8'))
+    if size > Config.SOURCE_LOCAL_CACHE_BYTES:
+        return
+    with _local_lock:
+        if source_hash in _local:
+            return
+        _local[source_hash] = source_code
+        _local_bytes += size
+        while _local_bytes > Config.SOURCE_LOCAL_CACHE_BYTES:
+            _, evicted = _local.popitem(last=False)
+            _local_bytes -= len(evicted.encode('utf-8'))
+
+
+def get(source_hash):
+    """Source code for a hash, from the local LRU or Redis; raises SourceNotFound"""
+    with _local_lock:
+        source_code = _local.get(source_hash)
+        if source_code is not None:
+            _local.move_to_end(source_hash)
+            return source_code
+
+    source_code = get_redis().get(_key(source_hash))
+    if source_code is None or hash_source(source_code) != source_hash:
+        raise SourceNotFound(f"Source snapshot {source_hash[:12]} is no longer available, please run again")
+    _remember(source_hash, source_code)
+    return source_code
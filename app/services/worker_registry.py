@@ -0,0 +1,110 @@
+"""Worker heartbeat registry in Redis.
+
+Every Celery worker publishes a heartbeat every WORKER_HEARTBEAT_INTERVAL
+seconds to ``workers:heartbeat:<hostname>``. The heartbeat records the worker's
+queues, its concurrency and how many executions it is running. Each key expires
+after WORKER_HEARTBEAT_TTL, so a worker that dies drops out on its own. The
+health endpoints read the registry (one SMEMBERS plus one MGET) instead of
+broadcasting ``celery inspect`` to every worker.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from app.config import Config
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'workers:heartbeat'
+KEY_PREFIX = 'workers:heartbeat:'
+
+_stop = threading.Event()
+_thread = None
+
+
+def publish(hostname, queues, concurrency, in_flight):
+    heartbeat = {
+        'hostname': hostname,
+        'queues': sorted(queues),
+        'concurrency': concurrency,
+        'in_flight': in_flight,
+        'pid': os.getpid(),
+        'updated_at': datetime.utcnow().isoformat(),
+    }
+    pipe = get_redis().pipeline()
+    pipe.set(KEY_PREFIX + hostname, json.dumps(heartbeat), ex=Config.WORKER_HEARTBEAT_TTL)
+    pipe.sadd(INDEX_KEY, hostname)
+    pipe.execute()
+
+
+def remove(hostname):
+    pipe = get_redis().pipeline()
+    pipe.delete(KEY_PREFIX + hostname)
+    pipe.srem(INDEX_KEY, hostname)
+    pipe.execute()
+
+
+def workers():
+    """Live heartbeats, newest data for every worker that has not expired"""
+    redis_client = get_redis()
+    hostnames = sorted(redis_client.smembers(INDEX_KEY))
+    if not hostnames:
+        return []
+    values = redis_client.mget([KEY_PREFIX + hostname for hostname in hostnames])
+    expired = [hostname for hostname, value in zip(hostnames, values) if value is None]
+    if expired:
+        redis_client.srem(INDEX_KEY, *expired)
+    return [json.loads(value) for value in values if value is not None]
+
+
+def capacity(heartbeats):
+    """Execution slots in total and free, overall and per queue"""
+    queues = {}
+    for heartbeat in heartbeats:
+        free = max(heartbeat['concurrency'] - heartbeat['in_flight'], 0)
+        for queue in heartbeat['queues']:
+            entry = queues.setdefault(queue, {'workers': 0, 'concurrency': 0, 'in_flight': 0, 'available': 0})
+            entry['workers'] += 1
+            entry['concurrency'] += heartbeat['concurrency']
+            entry['in_flight'] += heartbeat['in_flight']
+            entry['available'] += free
+    concurrency = sum(heartbeat['concurrency'] for heartbeat in heartbeats)
+    in_flight = sum(heartbeat['in_flight'] for heartbeat in heartbeats)
+    return {
+        'workers': len(heartbeats),
+        'concurrency': concurrency,
+        'in_flight': in_flight,
+        'available': max(concurrency - in_flight, 0),
+        'queues': queues,
+    }
+
+
+def start_heartbeat(hostname, queues, concurrency, in_flight):
+    """Publish from a daemon thread until ``stop_heartbeat``; ``in_flight`` is a callable"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+
+    def beat():
+        while True:
+            try:
+                publish(hostname, queues, concurrency, in_flight())
+            except Exception as e:
+                logger.warning(f"Worker heartbeat failed: {str(e)}")
+            if _stop.wait(Config.WORKER_HEARTBEAT_INTERVAL):
+                return
+
+    _stop.clear()
+    _thread = threading.Thread(target=beat, name='worker-heartbeat', daemon=True)
+    _thread.start()
+    logger.info(f"Publishing heartbeats for {hostname} every {Config.WORKER_HEARTBEAT_INTERVAL}s")
+
+
+def stop_heartbeat(hostname):
+    _stop.set()
+    try:
+        remove(hostname)
+    except Exception as e:
+        logger.warning(f"Could not remove heartbeat of {hostname}: {str(e)}")
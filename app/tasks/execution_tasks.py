@@ -1,22 +1,68 @@
-import tempfile
-import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask import current_app
-from app.celery_app import celery
+from sqlalchemy import select, update
+from celery.signals import worker_process_init, worker_ready, worker_shutdown
+from celery.worker import state as worker_state
+from app import metrics
+from app.celery_app import DEFAULT_QUEUE, EXECUTION_QUEUES, celery
+from app.config import Config
 from app.models.db import db
 from app.models.execution_model import Execution
-import subprocess
+from app.runtime import runners
+from app.services import execution_output, read_cache, result_memo, source_store, worker_registry
+from app.services.execution_events import TERMINAL_STATUSES, ExecutionEventPublisher
 import time
 import logging
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Limit Constraint
-MAX_EXECUTIONS_PER_SESSION = 100  
-MAX_OUTPUT_SIZE = 1024 * 100  
-RATE_LIMIT_WINDOW = 60  
+
+@worker_process_init.connect
+def _warm_runners_in_child(**kwargs):
+    runners.warm_up()
+    result_memo.publish_runtime_versions()
+
+
+@worker_ready.connect
+def _warm_runners(sender=None, **kwargs):
+    # prefork children warm their own runners in worker_process_init
+    pool = getattr(sender, 'pool', None)
+    if pool is None or type(pool).__module__ != 'celery.concurrency.prefork':
+        runners.warm_up()
+        result_memo.publish_runtime_versions()
+
+    # host-wide preparation (the C++ PCH directory is shared), for the languages this worker consumes
+    queues = {queue.name for queue in sender.task_consumer.queues}
+    for runner in runners.all_runners():
+        if queues & {EXECUTION_QUEUES.get(runner.language, DEFAULT_QUEUE), DEFAULT_QUEUE}:
+            try:
+                runner.warm_up_host()
+            except Exception as e:
+                logger.warning(f"Could not prepare the {runner.display_name} runner: {str(e)}")
+
+
+@worker_ready.connect
+def _start_metrics_exporter(**kwargs):
+    metrics.start_worker_exporter()
+
+
+@worker_ready.connect
+def _start_heartbeat(sender=None, **kwargs):
+    # active_requests is kept by the consumer, so it counts executions for any pool type
+    worker_registry.start_heartbeat(
+        sender.hostname,
+        [queue.name for queue in sender.task_consumer.queues],
+        getattr(sender.controller, 'concurrency', None) or Config.worker_concurrency(),
+        lambda: len(worker_state.active_requests),
+    )
+
+
+@worker_shutdown.connect
+def _stop_heartbeat(sender=None, **kwargs):
+    worker_registry.stop_heartbeat(sender.hostname)
 
 
 @celery.task(
@@ -27,59 +73,60 @@ RATE_LIMIT_WINDOW = 60
     autoretry_for=(Exception,),
     retry_kwargs={'max_retries': 3}
 )
-def execute_code_task(self, execution_id, language, source_code):
-        
-    execution = Execution.query.get(execution_id)
-    
-    if not execution:
-        logger.error(f"Execution {execution_id} not found")
-        return {'error': 'Execution not found'}
-    
-    # moving from queue to running
-    logger.info(f"Execution {execution_id}: QUEUED → RUNNING")
+def execute_code_task(self, execution_id, language, source_hash, memoize=False):
+    """Run one execution; ``source_hash`` references a snapshot in source_store"""
+    execution_id = uuid.UUID(str(execution_id))
+    runner = runners.get(language)
+    if runner is None:
+        return _run_execution(self, execution_id, language, source_hash, memoize, None)
     
-    # too many executions handling
-    session_exec_count = Execution.query.filter_by(session_id=execution.session_id).count()
-    if session_exec_count > MAX_EXECUTIONS_PER_SESSION:
-        logger.warning(f"Session {execution.session_id} exceeded execution limit ({session_exec_count})")
-        execution.status = 'FAILED'
-        execution.stderr = f'Execution limit exceeded: {MAX_EXECUTIONS_PER_SESSION} executions per session'
-        execution.finished_at = datetime.utcnow()
-        db.session.commit()
-        return {'execution_id': str(execution_id), 'status': 'FAILED'}
-    
-    # rapid repeated executions
-    recent_window = datetime.utcnow() - timedelta(seconds=RATE_LIMIT_WINDOW)
-    recent_executions = Execution.query.filter(
-        Execution.session_id == execution.session_id,
-        Execution.queued_at >= recent_window
-    ).count()
+    # every slot of this language busy: hand the message back so this thread can take other languages
+    with runners.slot(runner, Config.RUNNER_SLOT_WAIT) as acquired:
+        if acquired:
+            return _run_execution(self, execution_id, language, source_hash, memoize, runner)
+    logger.info(f"Execution {execution_id}: all {runner.max_concurrency} {language} slots busy, requeueing")
+    metrics.REQUEUES.labels(language).inc()
+    self.apply_async(
+        args=(str(execution_id), language, source_hash),
+        kwargs={'memoize': memoize},
+        countdown=Config.RUNNER_REQUEUE_DELAY
+    )
+    return {'execution_id': str(execution_id), 'status': 'QUEUED', 'requeued': True}
+
+def _run_execution(self, execution_id, language, source_hash, memoize, runner):
+    """The task body, run holding a slot of ``runner`` (None for an unsupported language)"""
+    # moving from queue to running (a retried task may find the row RUNNING already)
+    started_at = datetime.utcnow()
+    from_statuses = ('QUEUED', 'RUNNING') if self.request.retries else ('QUEUED',)
+    queued = _transition(execution_id, from_statuses, status='RUNNING', started_at=started_at)
     
-    if recent_executions > 10: 
-        logger.warning(f"Session {execution.session_id} rate limited: {recent_executions} executions in {RATE_LIMIT_WINDOW}s")
-        execution.status = 'FAILED'
-        execution.stderr = f'Rate limit exceeded: Maximum 10 executions per minute'
-        execution.finished_at = datetime.utcnow()
-        db.session.commit()
-        return {'execution_id': str(execution_id), 'status': 'FAILED'}
+    if queued is None:
+        logger.error(f"Execution {execution_id} not found or not in {'/'.join(from_statuses)}")
+        return {'error': 'Execution not found'}
     
-    execution.status = 'RUNNING'
-    execution.started_at = datetime.utcnow()
-    db.session.commit()
-    logger.info(f"Execution {execution_id} started at {execution.started_at}")
+    # write-through before publishing, so a woken long-poll reads the new state
+    read_cache.write_execution(read_cache.execution_view(
+        execution_id, 'RUNNING', queued_at=queued.queued_at, started_at=started_at
+    ))
+    events = ExecutionEventPublisher(execution_id)
+    events.status('RUNNING', started_at=started_at.isoformat())
+    logger.info(f"Execution {execution_id}: QUEUED → RUNNING at {started_at}")
     
+    compile_cache = None
+    compile_time = None
+    execution_time = None
+    truncated = False
+    resources = {}
+    metrics.IN_FLIGHT.labels(language).inc()
     try:
+        source_code = source_store.get(source_hash)
         start_time = time.time()
         
         # execute code based on language
         logger.info(f"Executing {language} code for execution {execution_id}")
         
-        if language == 'python':
-            result = _execute_python(source_code)
-        elif language == 'javascript':
-            result = _execute_javascript(source_code)
-        elif language == 'c++':
-            result = _execute_c_plusplus(source_code)
+        if runner is not None:
+            result = runner.execute(source_code, on_output=events.output)
         else:
             logger.error(f"Unsupported language: {language}")
             result = {
@@ -89,201 +136,128 @@ def execute_code_task(self, execution_id, language, source_code):
             }
         
         execution_time = int((time.time() - start_time) * 1000)
+        compile_cache = result.get('compile_cache')
+        compile_time = result.get('compile_time_ms')
+        truncated = result.get('truncated', False)
         
-        # handling excessive output (prevent memory/storage abuse)
+        # compile and run phases timed separately, plus the child's wait4 usage
+        usage = result.get('usage')
+        resources = dict(
+            compile_time_ms=compile_time,
+            run_time_ms=execution_time - (compile_time or 0),
+            **(usage._asdict() if usage else {})
+        )
+        
+        # output is already bounded to a head+tail of MAX_OUTPUT_SIZE per stream while capturing
+        status = result['status']
         stdout = result['stdout'] or ''
         stderr = result['stderr'] or ''
         
-        if len(stdout) > MAX_OUTPUT_SIZE:
-            logger.warning(f"Execution {execution_id} stdout truncated from {len(stdout)} to {MAX_OUTPUT_SIZE} bytes")
-            stdout = stdout[:MAX_OUTPUT_SIZE] + "\n... [Output truncated - exceeded 100KB limit]"
-        
-        if len(stderr) > MAX_OUTPUT_SIZE:
-            logger.warning(f"Execution {execution_id} stderr truncated from {len(stderr)} to {MAX_OUTPUT_SIZE} bytes")
-            stderr = stderr[:MAX_OUTPUT_SIZE] + "\n... [Error output truncated - exceeded 100KB limit]"
-        
-        # Update results
-        execution.status = result['status']
-        execution.stdout = stdout
-        execution.stderr = stderr
-        execution.execution_time_ms = execution_time
-        execution.finished_at = datetime.utcnow()
+        if result.get('truncated'):
+            logger.warning(f"Execution {execution_id} output truncated to head+tail of {Config.MAX_OUTPUT_SIZE} bytes per stream")
         
         # from RUNNING → COMPLETED/FAILED/TIMEOUT
-        logger.info(f"Execution {execution_id}: RUNNING → {execution.status} ({execution_time}ms)")
+        logger.info(f"Execution {execution_id}: RUNNING → {status} ({execution_time}ms)")
+        
+        if memoize and status == 'COMPLETED':
+            result_memo.store(language, source_code, '', stdout, stderr, execution_time)
         
     except Exception as e:
         logger.error(f"Execution {execution_id} failed with exception: {str(e)}")
-        execution.status = 'FAILED'
-        execution.stderr = str(e)
-        execution.finished_at = datetime.utcnow()
+        status = 'FAILED'
+        stdout = None
+        stderr = str(e)
+    finally:
+        # /health/ready reports capacity from this gauge, it must never stay raised
+        metrics.IN_FLIGHT.labels(language).dec()
     
-    db.session.commit()
+    # drop the RUNNING view first: if the write-through below never happens, readers fall back to the row
+    read_cache.invalidate_executions(execution_id)
+    
+    # the whole result in one statement
+    finished_at = datetime.utcnow()
+    if _transition(
+        execution_id,
+        ('RUNNING',),
+        status=status,
+        stdout=stdout,
+        stderr=stderr,
+        execution_time_ms=execution_time,
+        finished_at=finished_at,
+        **resources
+    ) is None:
+        logger.warning(f"Execution {execution_id} was no longer RUNNING, result discarded")
+        _publish_current_status(execution_id, events)
+        return {'execution_id': str(execution_id), 'error': 'Execution no longer running'}
+    
+    read_cache.write_execution(read_cache.execution_view(
+        execution_id,
+        status,
+        queued_at=queued.queued_at,
+        started_at=started_at,
+        finished_at=finished_at,
+        stdout=stdout,
+        stderr=stderr,
+        execution_time_ms=execution_time,
+        resources=resources
+    ))
+    events.status(
+        status,
+        finished_at=finished_at.isoformat(),
+        execution_time_ms=execution_time
+    )
+    
+    metrics.observe_execution(
+        language, status, queued.queued_at, started_at, finished_at,
+        execution_time_ms=execution_time, compile_time_ms=compile_time, truncated=truncated
+    )
     
     # Log final state
-    logger.info(f"Execution {execution_id} lifecycle: QUEUED({execution.queued_at}) → RUNNING({execution.started_at}) → {execution.status}({execution.finished_at})")
+    logger.info(f"Execution {execution_id} lifecycle: QUEUED({queued.queued_at}) → RUNNING({started_at}) → {status}({finished_at})")
     
-    return {
+    task_result = {
         'execution_id': str(execution_id),
-        'status': execution.status
+        'status': status
     }
+    if compile_cache:
+        task_result['compile_cache'] = compile_cache
+    return task_result
 
-def _execute_python(source_code):
-    try:
-        logger.info(f"Executing Python code (timeout: 30s)")
-        
-        result = subprocess.run(
-            ['python', '-c', source_code],
-            capture_output=True,
-            text=True,
-            timeout=30, 
+def _publish_current_status(execution_id, events):
+    """After a discarded result, publish what the row says instead so long-polls and streams wake up"""
+    current = db.session.execute(
+        select(Execution.status, Execution.finished_at, Execution.execution_time_ms)
+        .where(Execution.id == execution_id)
+    ).first()
+    if current is None:
+        events.status('FAILED', error='Execution no longer exists')
+    elif current.status in TERMINAL_STATUSES:
+        events.status(
+            current.status,
+            finished_at=current.finished_at.isoformat() if current.finished_at else None,
+            execution_time_ms=current.execution_time_ms
         )
-        
-        status = 'COMPLETED' if result.returncode == 0 else 'FAILED'
-        
-        if status == 'FAILED':
-            logger.warning(f"Python execution failed with return code {result.returncode}")
-        else:
-            logger.info(f"Python execution completed successfully")
-        
-        return {
-            'stdout': result.stdout,
-            'stderr': result.stderr,
-            'status': status
-        }
-        
-    except subprocess.TimeoutExpired:
-        logger.warning(f"Python execution timed out")
-        return {
-            'stdout': '',
-            'stderr': 'Execution timeout exceeded(30 seconds)',
-            'status': 'TIMEOUT'
-        }
-    except Exception as e:
-        logger.error(f"Python execution error: {str(e)}")
-        return {
-            'stdout': '',
-            'stderr': str(e),
-            'status': 'FAILED'
-        }
-
-def _execute_javascript(source_code):
-    try:
-        logger.info(f"Executing JavaScript code (timeout: 30s)")
-        
-        result = subprocess.run(
-            ['node', '-e', source_code],
-            capture_output=True,
-            text=True,
-            timeout=30  # Timeout prevents infinite loops
-        )
-        
-        status = 'COMPLETED' if result.returncode == 0 else 'FAILED'
-        
-        if status == 'FAILED':
-            logger.warning(f"JavaScript execution failed with return code {result.returncode}")
-        else:
-            logger.info(f"JavaScript execution completed successfully")
-        
-        return {
-            'stdout': result.stdout,
-            'stderr': result.stderr,
-            'status': status
-        }
-        
-    except subprocess.TimeoutExpired:
-        logger.warning(f"JavaScript execution timed out")
-        return {
-            'stdout': '',
-            'stderr': 'Execution timeout exceeded (30 seconds)',
-            'status': 'TIMEOUT'
-        }
-    except FileNotFoundError:
-        logger.error(f"Node.js not found")
-        return {
-            'stdout': '',
-            'stderr': 'Node.js is not installed',
-            'status': 'FAILED'
-        }
-    except Exception as e:
-        logger.error(f"JavaScript execution error: {str(e)}")
-        return {
-            'stdout': '',
-            'stderr': str(e),
-            'status': 'FAILED'
-        }
-
-def _execute_c_plusplus(source_code): 
-    try:
-        logger.info(f"Executing C++ code (timeout: 30s)")
-        
-        # Create temporary directory for compilation
-        with tempfile.TemporaryDirectory() as temp_dir:
-            source_file = os.path.join(temp_dir, 'program.cpp')
-            executable_file = os.path.join(temp_dir, 'program.exe' if os.name == 'nt' else 'program')
-            
-            with open(source_file, 'w') as f:
-                f.write(source_code)
-            
-            # Compile the code
-            logger.info(f"Compiling C++ code...")
-            compile_result = subprocess.run(
-                ['g++', source_file, '-o', executable_file, '-std=c++17'],
-                capture_output=True,
-                text=True,
-                timeout=10  # 10 seconds for compilation
-            )
-            
-            if compile_result.returncode != 0:
-                logger.warning(f"C++ compilation failed")
-                return {
-                    'stdout': compile_result.stdout,
-                    'stderr': f"Compilation Error:\n{compile_result.stderr}",
-                    'status': 'FAILED'
-                }
-            
-            logger.info(f"C++ compilation successful, running executable...")
-            
-            
-            run_result = subprocess.run(
-                [executable_file],
-                capture_output=True,
-                text=True,
-                timeout=30  # 30 seconds for execution
-            )
-            
-            status = 'COMPLETED' if run_result.returncode == 0 else 'FAILED'
-            
-            if status == 'FAILED':
-                logger.warning(f"C++ execution failed with return code {run_result.returncode}")
-            else:
-                logger.info(f"C++ execution completed successfully")
-            
-            return {
-                'stdout': run_result.stdout,
-                'stderr': run_result.stderr,
-                'status': status
-            }
-        
-    except subprocess.TimeoutExpired:
-        logger.warning(f"C++ execution timed out")
-        return {
-            'stdout': '',
-            'stderr': 'Execution timeout exceeded (30 seconds)',
-            'status': 'TIMEOUT'
-        }
-    except FileNotFoundError:
-        logger.error(f"G++ compiler not found")
-        return {
-            'stdout': '',
-            'stderr': 'G++ compiler (g++) is not installed. Please install it to compile C++ code.',
-            'status': 'FAILED'
-        }
-    except Exception as e:
-        logger.error(f"C++ execution error: {str(e)}")
-        return {
-            'stdout': '',
-            'stderr': str(e),
-            'status': 'FAILED'
-        }
 
+def _transition(execution_id, from_statuses, **values):
+    """Single-row ``UPDATE ... WHERE id = ? AND status IN (...)``
+    
+    Never loads the row (or its output). Returns a row with ``queued_at`` when
+    the execution was in one of ``from_statuses``, otherwise None. ``stdout``
+    and ``stderr`` too large to keep inline are inserted out of row in the same
+    transaction.
+    """
+    external = {}
+    if 'stdout' in values or 'stderr' in values:
+        columns, external = execution_output.split(values.pop('stdout', None), values.pop('stderr', None))
+        values.update(columns)
+    row = db.session.execute(
+        update(Execution)
+        .where(Execution.id == execution_id, Execution.status.in_(from_statuses))
+        .values(**values)
+        .returning(Execution.queued_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None:
+        execution_output.store(execution_id, external)
+    db.session.commit()
+    return row
@@ -0,0 +1,17 @@
+import logging
+from app.celery_app import celery
+from app.services import execution_archive
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name='archive_executions', ignore_result=True)
+def archive_executions():
+    """Move expired executions to the archive and drop empty partitions (scheduled by celery beat)"""
+    summary = execution_archive.archive_expired()
+    if summary['removed'] or summary['dropped_partitions']:
+        logger.info(
+            f"Archived {summary['removed']} executions, "
+            f"dropped partitions: {', '.join(summary['dropped_partitions']) or 'none'}"
+        )
+    return summary
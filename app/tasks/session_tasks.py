@@ -0,0 +1,14 @@
+import logging
+from app.celery_app import celery
+from app.services import session_drafts
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name='flush_session_drafts', ignore_result=True)
+def flush_session_drafts():
+    """Write coalesced autosaves to Postgres (scheduled by celery beat)"""
+    flushed = session_drafts.flush_all()
+    if flushed:
+        logger.info(f"Flushed {flushed} session drafts")
+    return flushed
@@ -0,0 +1,125 @@
+"""C++ compile latency with and without precompiled headers.
+
+For every sample program (one per common include set) the worker's compile
+path ``cpp_cache.compiled_program`` runs ``--runs`` times:
+- ``CPP_PCH_ENABLED=False``: the headers are parsed from scratch every time
+- ``CPP_PCH_ENABLED=True``: the PCH for the program's include set is built
+  once up front (its build time is reported), then reused
+
+The compile cache is off and every run gets a unique trailing comment, so
+nothing but the PCH is reused.
+
+Usage:
+    python benchmarks/bench_cpp_pch.py [--runs 10] [--json]
+
+PCHs are built in a temporary CPP_CACHE_DIR that is removed afterwards.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROGRAMS = {
+    'iostream': (
+        "#include <iostream>\nint main() {\n  long long total = 0;\n"
+        "  for (int i = 0; i < 1000; i++) total += i;\n  std::cout << total << std::endl;\n}\n"
+    ),
+    'iostream+vector+algorithm': (
+        "#include <algorithm>\n#include <iostream>\n#include <vector>\nint main() {\n"
+        "  std::vector<int> v = {5, 3, 1, 4, 2};\n  std::sort(v.begin(), v.end());\n"
+        "  for (int x : v) std::cout << x << ' ';\n  std::cout << std::endl;\n}\n"
+    ),
+    'bits/stdc++.h': (
+        "#include <bits/stdc++.h>\nusing namespace std;\nint main() {\n"
+        "  map<string, int> counts;\n  for (string w : {\"a\", \"b\", \"a\"}) counts[w]++;\n"
+        "  for (auto &[word, n] : counts) cout << word << ' ' << n << endl;\n}\n"
+    ),
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def compile_times(source_code, runs, label):
+    from app.runtime import cpp_cache
+
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        with cpp_cache.compiled_program(f'{source_code}// {label} {i} {time.time_ns()}\n', timeout=60) as compiled:
+            if compiled.returncode != 0:
+                raise SystemExit(f'sample program failed to compile:\n{compiled.stderr}')
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(statistics.median(samples), 1),
+        'p95_ms': round(percentile(samples, 0.95), 1),
+        'mean_ms': round(statistics.mean(samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare C++ compile latency with and without PCH')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='bench-cpp-pch-')
+    os.environ['CPP_CACHE_DIR'] = cache_dir
+    os.environ['CPP_CACHE_ENABLED'] = 'False'
+    from app.config import Config
+    from app.runtime import cpp_cache, cpp_pch
+
+    results = {}
+    try:
+        for name, source_code in PROGRAMS.items():
+            Config.CPP_PCH_ENABLED = False
+            without_pch = compile_times(source_code, args.runs, 'without')
+
+            Config.CPP_PCH_ENABLED = True
+            start = time.perf_counter()
+            cpp_pch.build(cpp_pch.standard_includes(source_code))
+            build_ms = (time.perf_counter() - start) * 1000
+            if cpp_pch.header_for(source_code) is None:
+                raise SystemExit(f'could not precompile the headers of {name}')
+            with_pch = compile_times(source_code, args.runs, 'with')
+
+            results[name] = {
+                'without_pch': without_pch,
+                'with_pch': with_pch,
+                'pch_build_ms': round(build_ms, 1),
+                'speedup': round(without_pch['p50_ms'] / with_pch['p50_ms'], 2),
+            }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({
+            'compiler': cpp_cache.compiler_version(),
+            'flags': cpp_cache.COMPILER_FLAGS,
+            'runs': args.runs,
+            'results': results,
+        }, indent=2))
+        return
+
+    print(f"{cpp_cache.compiler_version()} {' '.join(cpp_cache.COMPILER_FLAGS)}, {args.runs} runs each")
+    print(f"{'include set':<28}{'no PCH p50':>12}{'PCH p50':>10}{'no PCH p95':>12}{'PCH p95':>10}"
+          f"{'speedup':>9}{'PCH build ms':>14}")
+    for name, stats in results.items():
+        print(
+            f"{name:<28}{stats['without_pch']['p50_ms']:>12}{stats['with_pch']['p50_ms']:>10}"
+            f"{stats['without_pch']['p95_ms']:>12}{stats['with_pch']['p95_ms']:>10}"
+            f"{stats['speedup']:>8}x{stats['pch_build_ms']:>14}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Per-execution database cost of the execution lifecycle, before and after.
+
+"before" replays the ORM flow the API and worker used to run:
+- the API does an insert and commit, then reloads the row to read its id
+- the worker does ``query.get``, two COUNT(*) limit checks, a RUNNING commit,
+  and a final commit
+
+"after" calls the current code:
+- ``CodeExecutionService._insert_execution``
+- ``_transition`` (single-row UPDATE ... WHERE id AND status) for RUNNING and
+  for the final result
+
+Programs are not run, so only database time is measured.
+
+Usage:
+    python benchmarks/bench_execution_lifecycle.py [--iterations 200] [--history 100] [--output-kb 64]
+
+Uses DATABASE_URL when set (point it at Postgres for realistic numbers),
+otherwise a temporary SQLite file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('AUTO_CREATE_SCHEMA', 'true')
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app  # noqa: E402
+from app.models.db import db  # noqa: E402
+from app.models.code_sessions_model import CodeSession  # noqa: E402
+from app.models.execution_model import Execution  # noqa: E402
+from app.services.code_execution_service import CodeExecutionService  # noqa: E402
+from app.tasks.execution_tasks import _transition  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def lifecycle_before(session_id, output):
+    # API
+    execution = Execution(session_id=session_id, status='QUEUED', queued_at=datetime.utcnow())
+    db.session.add(execution)
+    db.session.commit()
+    execution_id = execution.id
+    db.session.remove()
+
+    # worker
+    execution = Execution.query.get(execution_id)
+    Execution.query.filter_by(session_id=execution.session_id).count()
+    Execution.query.filter(
+        Execution.session_id == execution.session_id,
+        Execution.queued_at >= datetime.utcnow() - timedelta(seconds=60)
+    ).count()
+    execution.status = 'RUNNING'
+    execution.started_at = datetime.utcnow()
+    db.session.commit()
+    execution.status = 'COMPLETED'
+    execution.stdout = output
+    execution.stderr = ''
+    execution.execution_time_ms = 5
+    execution.finished_at = datetime.utcnow()
+    db.session.commit()
+    execution.queued_at  # final log line reloads the row
+    db.session.remove()
+
+
+def lifecycle_after(session_id, output):
+    # API
+    execution_id = CodeExecutionService._insert_execution(
+        session_id=session_id, status='QUEUED', queued_at=datetime.utcnow()
+    )
+    db.session.remove()
+
+    # worker
+    _transition(execution_id, ('QUEUED',), status='RUNNING', started_at=datetime.utcnow())
+    _transition(
+        execution_id,
+        ('RUNNING',),
+        status='COMPLETED',
+        stdout=output,
+        stderr='',
+        execution_time_ms=5,
+        finished_at=datetime.utcnow()
+    )
+    db.session.remove()
+
+
+def measure(name, lifecycle, session_id, output, iterations, counter):
+    lifecycle(session_id, output)  # warm up
+    counter.count = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        lifecycle(session_id, output)
+    elapsed = time.perf_counter() - start
+    return {
+        'name': name,
+        'ms_per_execution': elapsed * 1000 / iterations,
+        'statements_per_execution': counter.count / iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--history', type=int, default=100, help='earlier executions of the session')
+    parser.add_argument('--output-kb', type=int, default=64, help='stdout size of every execution')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+        output = 'x' * (args.output_kb * 1024)
+
+        results = []
+        for name, lifecycle in (('before', lifecycle_before), ('after', lifecycle_after)):
+            session = CodeSession(language='python', source_code='print(1)', status='ACTIVE')
+            db.session.add(session)
+            db.session.commit()
+            session_id = session.id
+            for _ in range(args.history):
+                lifecycle(session_id, output)
+            results.append(measure(name, lifecycle, session_id, output, args.iterations, counter))
+        database = db.engine.url.render_as_string(hide_password=True)
+
+    print(f"database: {database}")
+    print(f"{args.iterations} executions, {args.history} earlier executions per session, {args.output_kb}KB stdout")
+    print(f"{'':8} {'ms/execution':>14} {'statements/execution':>22}")
+    for result in results:
+        print(f"{result['name']:8} {result['ms_per_execution']:>14.2f} {result['statements_per_execution']:>22.1f}")
+
+
+if __name__ == '__main__':
+    main()
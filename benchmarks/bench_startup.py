@@ -0,0 +1,110 @@
+"""Cold-start cost of the API and the Celery worker bootstrap.
+
+Each mode runs in a fresh interpreter, ``--runs`` times:
+- ``api``: ``create_app()`` as ``main.py`` does
+- ``worker``: what ``celery_worker.py`` does now, which is ``create_worker_app()``
+  plus the task modules
+- ``worker-legacy``: the old worker bootstrap, which was the full
+  ``create_app()`` (schema creation included), a pushed app context and the
+  task modules
+
+Reported per mode (medians):
+- import and bootstrap time inside the process
+- wall time of the whole process, interpreter start included
+- peak RSS
+- number of loaded modules
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--json]
+
+Uses DATABASE_URL when set, otherwise a temporary SQLite file. Only the
+engine is configured at startup, so no database server needs to be running.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOTSTRAPS = {
+    'api': """
+from app import create_app
+app = create_app()
+""",
+    'worker': """
+from app import create_worker_app
+app = create_worker_app()
+from app.tasks import execution_tasks, retention_tasks, session_tasks
+""",
+    'worker-legacy': """
+from app import create_app, init_db
+app = create_app()
+init_db(app)
+app.app_context().push()
+from app.tasks import execution_tasks, retention_tasks, session_tasks
+""",
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{bootstrap}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'bootstrap_ms': elapsed * 1000,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}}))
+"""
+
+
+def run_once(mode, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(bootstrap=BOOTSTRAPS[mode])],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample['process_ms'] = wall_ms
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API and worker startup time and memory')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db'))
+    env.setdefault('PYTHONDONTWRITEBYTECODE', '1')
+
+    results = {}
+    for mode in BOOTSTRAPS:
+        run_once(mode, env)  # warm the OS page cache and compile .pyc files
+        samples = [run_once(mode, env) for _ in range(args.runs)]
+        results[mode] = {
+            key: round(statistics.median(sample[key] for sample in samples), 1)
+            for key in ('bootstrap_ms', 'process_ms', 'max_rss_kb', 'modules')
+        }
+
+    if args.json:
+        print(json.dumps({'runs': args.runs, 'results': results}, indent=2))
+        return
+
+    print(f"{'mode':<15}{'bootstrap ms':>14}{'process ms':>12}{'peak RSS MiB':>14}{'modules':>9}")
+    for mode, stats in results.items():
+        print(
+            f"{mode:<15}{stats['bootstrap_ms']:>14}{stats['process_ms']:>12}"
+            f"{stats['max_rss_kb'] / 1024:>14.1f}{int(stats['modules']):>9}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""End-to-end load test: submit a language mix and poll until every execution finishes.
+
+The app is built with ``create_app()`` and driven through its HTTP routes with
+Flask test clients, one thread per simulated user:
+- ``POST /executions/session/<id>/execute`` submits a program
+- ``GET /executions/<id>`` is polled until the status is terminal
+  (``--long-poll`` uses ``?wait=`` instead)
+
+Stand-ins, unless real services are given:
+- Postgres: a temporary SQLite file, or DATABASE_URL when set
+- Redis: fakeredis (``pip install fakeredis lupa``), or ``--redis-url``
+- Celery: an in-process worker. ``execute_code_task.apply_async`` feeds a thread
+  pool of ``--workers`` threads, so queue wait is measured as in production.
+  ``--external-workers`` sends tasks to real Celery workers instead (requires
+  ``--redis-url`` and a DATABASE_URL that the workers share).
+
+Every program is made unique with a trailing comment, so the C++ compile cache
+and result memo do not hide run time (pass ``--repeat-sources`` to allow hits).
+
+Reported per language and overall:
+- throughput (completed executions per second)
+- p50/p95/p99 of queue wait (queued_at to started_at)
+- run time (execution_time_ms)
+- submit-to-result latency, as the client sees it
+
+Usage:
+    python benchmarks/load_test.py [--requests 200] [--clients 8] [--workers 8]
+        [--mix python=6,javascript=3,c++=1] [--output results.json]
+
+A summary goes to stderr. JSON goes to stdout, or to ``--output``, for
+comparing runs.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROGRAMS = {
+    'python': "total = sum(i * i for i in range(20000))\nprint(total)\n# {tag}\n",
+    'javascript': "let total = 0;\nfor (let i = 0; i < 20000; i++) total += i * i;\nconsole.log(total);\n// {tag}\n",
+    'c++': (
+        "#include <iostream>\nint main() {{\n  long long total = 0;\n"
+        "  for (int i = 0; i < 20000; i++) total += 1LL * i * i;\n"
+        "  std::cout << total << std::endl;\n  return 0;\n}}\n// {tag}\n"
+    ),
+}
+TERMINAL = {'COMPLETED', 'FAILED', 'TIMEOUT', 'OUTPUT_LIMIT', 'MEMORY_LIMIT', 'CPU_LIMIT'}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='total executions to submit')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent simulated users')
+    parser.add_argument('--workers', type=int, default=8, help='in-process worker threads')
+    parser.add_argument('--mix', default='python=6,javascript=3,c++=1', help='language weights')
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='seconds between status polls')
+    parser.add_argument('--long-poll', type=float, default=0, help='use ?wait=<seconds> instead of short polls')
+    parser.add_argument('--timeout', type=float, default=120, help='give up on an execution after this long')
+    parser.add_argument('--repeat-sources', action='store_true', help='submit identical programs per language')
+    parser.add_argument('--redis-url', help='use a real Redis instead of fakeredis')
+    parser.add_argument('--external-workers', action='store_true', help='send tasks to real Celery workers')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    if args.external_workers and not args.redis_url:
+        parser.error('--external-workers needs --redis-url (and a shared DATABASE_URL)')
+    try:
+        args.mix = {
+            language: float(weight)
+            for language, weight in (part.split('=') for part in args.mix.split(',') if part)
+        }
+    except ValueError:
+        parser.error('--mix looks like python=6,javascript=3,c++=1')
+    unknown = set(args.mix) - set(PROGRAMS)
+    if unknown:
+        parser.error(f'unknown languages in --mix: {", ".join(sorted(unknown))}')
+    return args
+
+
+def configure_environment(args):
+    """Point the app at the stand-ins before anything reads Config"""
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db'))
+    os.environ.setdefault('AUTO_CREATE_SCHEMA', 'true')
+    if args.redis_url:
+        os.environ['REDIS_URL'] = args.redis_url
+    # measure the execution path, not admission control
+    for name in ('SESSION_MAX_EXECUTIONS', 'SESSION_RATE_LIMIT', 'GLOBAL_RATE_LIMIT'):
+        os.environ.setdefault(name, '0')
+    os.environ.setdefault('WORKER_MAX_CONCURRENCY', str(args.workers))
+
+    from app.config import Config
+    if Config.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # worker threads and API threads write concurrently
+        Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30, 'check_same_thread': False}}
+
+    if not args.redis_url:
+        import fakeredis
+        import app.redis_client as redis_client
+        redis_client._client = fakeredis.FakeRedis(decode_responses=True)
+
+
+def start_in_process_worker(app, workers):
+    """Run execute_code_task on a local thread pool instead of a broker"""
+    from app.tasks.execution_tasks import execute_code_task
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='worker')
+
+    def run(args, kwargs, countdown):
+        time.sleep(countdown)
+        with app.app_context():
+            execute_code_task.apply(args=args, kwargs=kwargs)
+
+    def apply_async(args=None, kwargs=None, **options):
+        # requeues from busy runner slots come back with a countdown
+        pool.submit(run, tuple(args or ()), dict(kwargs or {}), options.get('countdown') or 0)
+
+    execute_code_task.apply_async = apply_async
+    return pool
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 2),
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': round(values[-1], 2),
+    }
+
+
+def milliseconds_between(start, end):
+    if not start or not end:
+        return None
+    return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() * 1000
+
+
+class Client:
+    """One simulated user: create a session, submit, poll to completion"""
+
+    def __init__(self, app, args):
+        self.http = app.test_client()
+        self.args = args
+
+    def run_one(self, language, tag):
+        source_code = PROGRAMS[language].format(tag='load-test' if self.args.repeat_sources else tag)
+        response = self.http.post('/code-sessions', json={'language': language, 'source_code': source_code})
+        session_id = response.get_json()['session_id']
+
+        submitted = time.perf_counter()
+        response = self.http.post(f'/executions/session/{session_id}/execute')
+        if response.status_code != 202:
+            return {'language': language, 'status': f'HTTP {response.status_code}'}
+        execution_id = response.get_json()['execution_id']
+
+        url = f'/executions/{execution_id}'
+        if self.args.long_poll:
+            url += f'?wait={self.args.long_poll}'
+        polls = 0
+        while True:
+            result = self.http.get(url).get_json()
+            polls += 1
+            if result['status'] in TERMINAL or time.perf_counter() - submitted > self.args.timeout:
+                break
+            if not self.args.long_poll:
+                time.sleep(self.args.poll_interval)
+        latency = (time.perf_counter() - submitted) * 1000
+
+        return {
+            'language': language,
+            'status': result['status'],
+            'latency_ms': latency,
+            'queue_wait_ms': milliseconds_between(result.get('queued_at'), result.get('started_at')),
+            'run_time_ms': result.get('execution_time_ms'),
+            'polls': polls,
+        }
+
+
+def summarize(results, elapsed):
+    def block(rows):
+        statuses = defaultdict(int)
+        for row in rows:
+            statuses[row['status']] += 1
+        completed = [row for row in rows if row['status'] in TERMINAL]
+        return {
+            'submitted': len(rows),
+            'statuses': dict(statuses),
+            'throughput_per_s': round(len(completed) / elapsed, 2) if elapsed else None,
+            'queue_wait_ms': percentiles([r['queue_wait_ms'] for r in completed if r['queue_wait_ms'] is not None]),
+            'run_time_ms': percentiles([r['run_time_ms'] for r in completed if r['run_time_ms'] is not None]),
+            'latency_ms': percentiles([r['latency_ms'] for r in completed]),
+            'polls_per_execution': round(sum(r['polls'] for r in completed) / len(completed), 2) if completed else None,
+        }
+
+    by_language = defaultdict(list)
+    for row in results:
+        by_language[row['language']].append(row)
+    return {
+        'overall': block(results),
+        'languages': {language: block(rows) for language, rows in sorted(by_language.items())},
+    }
+
+
+def print_summary(report):
+    def fmt(stats, key):
+        return f"{stats[key]:>9}" if stats else f"{'-':>9}"
+
+    print(f"{report['elapsed_s']}s, {report['summary']['overall']['throughput_per_s']} executions/s", file=sys.stderr)
+    print(f"{'language':<12}{'n':>5}  {'metric':<14}{'p50':>9}{'p95':>9}{'p99':>9}", file=sys.stderr)
+    rows = [('all', report['summary']['overall'])] + list(report['summary']['languages'].items())
+    for language, block in rows:
+        for metric in ('queue_wait_ms', 'run_time_ms', 'latency_ms'):
+            stats = block[metric]
+            print(
+                f"{language:<12}{block['submitted']:>5}  {metric:<14}"
+                f"{fmt(stats, 'p50')}{fmt(stats, 'p95')}{fmt(stats, 'p99')}",
+                file=sys.stderr
+            )
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app import create_app
+    from app.config import Config
+    app = create_app()
+    worker_pool = None if args.external_workers else start_in_process_worker(app, args.workers)
+
+    rng = random.Random(args.seed)
+    languages, weights = zip(*args.mix.items())
+    plan = [(rng.choices(languages, weights)[0], f'{args.seed}-{i}-{time.time_ns()}') for i in range(args.requests)]
+
+    local = threading.local()
+
+    def client_run(job):
+        if not hasattr(local, 'client'):
+            local.client = Client(app, args)
+        return local.client.run_one(*job)
+
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients, thread_name_prefix='client') as clients:
+        results = list(clients.map(client_run, plan))
+    elapsed = time.perf_counter() - started
+    if worker_pool:
+        worker_pool.shutdown(wait=True)
+
+    report = {
+        'started_at': started_at.isoformat(),
+        'elapsed_s': round(elapsed, 3),
+        'parameters': {
+            'requests': args.requests,
+            'clients': args.clients,
+            'workers': 'external' if args.external_workers else args.workers,
+            'mix': args.mix,
+            'polling': f'wait={args.long_poll}' if args.long_poll else f'interval={args.poll_interval}',
+            'repeat_sources': args.repeat_sources,
+        },
+        'environment': {
+            'database': Config.SQLALCHEMY_DATABASE_URI.split(':', 1)[0],
+            'redis': 'redis' if args.redis_url else 'fakeredis',
+            'runtime_pool': Config.RUNTIME_POOL_ENABLED,
+            'cpp_cache': Config.CPP_CACHE_ENABLED,
+            'result_memo': Config.RESULT_MEMO_ENABLED,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'summary': summarize(results, elapsed),
+    }
+
+    print_summary(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
-from app import create_app
+from app import create_worker_app
 from app.celery_app import celery
 
-# Create Flask app context
-app = create_app()
-app.app_context().push()
+# Worker-only app: config, DB engine and Celery (no routes, no schema creation).
+# Tasks push their own app context (see init_celery).
+app = create_worker_app()
 
 # Import tasks to register them with Celery
-from app.tasks import execution_tasks
+from app.tasks import execution_tasks, retention_tasks, session_tasks
@@ -0,0 +1,66 @@
+"""Shared fixtures: the API on a throwaway SQLite database, with fakeredis standing in for Redis."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Config reads the environment at import time
+_tmp = tempfile.mkdtemp(prefix='livecode-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault('EXECUTION_ARCHIVE_DIR', os.path.join(_tmp, 'archive'))
+os.environ.setdefault('CPP_CACHE_DIR', os.path.join(_tmp, 'cpp-cache'))
+os.environ.setdefault('WORKER_METRICS_PORT', '0')
+
+from unittest import mock  # noqa: E402
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    from app import redis_client
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, '_client', client)
+    return client
+
+
+@pytest.fixture
+def app(redis_client):
+    from app import create_app, init_db
+    from app.models.db import db
+    app = create_app()
+    app.config['TESTING'] = True
+    init_db(app)
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def session_id(client):
+    response = client.post('/code-sessions', json={'language': 'python', 'source_code': "print('hi')"})
+    return response.get_json()['session_id']
+
+
+@pytest.fixture
+def queued_tasks():
+    """The Celery task as seen by the API; nothing is sent to a broker"""
+    with mock.patch('app.services.code_execution_service.execute_code_task') as task:
+        yield task
+
+
+@pytest.fixture
+def run_queued_task(app, queued_tasks):
+    """Run the most recently queued execution in-process, as a worker would"""
+    def run():
+        from app.tasks.execution_tasks import execute_code_task
+        with app.app_context():
+            execute_code_task.run(*queued_tasks.delay.call_args.args, **queued_tasks.delay.call_args.kwargs)
+    return run
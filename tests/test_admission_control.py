@@ -0,0 +1,43 @@
+"""Per-session limits and drafts must not depend on how the session ID is spelled."""
+import uuid
+import pytest
+from app.config import Config
+from app.services import admission_control, session_drafts
+
+
+def spellings(session_id):
+    value = uuid.UUID(session_id)
+    return [str(value).upper(), value.hex, '{' + str(value) + '}']
+
+
+def test_variant_spellings_share_one_quota(client, session_id, queued_tasks, monkeypatch):
+    monkeypatch.setattr(Config, 'SESSION_MAX_EXECUTIONS', 1)
+
+    first = client.post(f'/api/v1/executions/session/{session_id}/execute', json={'bypass_cache': True})
+    assert first.status_code == 202
+
+    for variant in spellings(session_id):
+        response = client.post(f'/api/v1/executions/session/{variant}/execute', json={'bypass_cache': True})
+        assert response.status_code == 429, variant
+    assert queued_tasks.delay.call_count == 1
+
+
+def test_invalid_session_id_is_not_found(client, queued_tasks):
+    response = client.post('/api/v1/executions/session/not-a-uuid/execute', json={})
+    assert response.status_code == 404
+    queued_tasks.delay.assert_not_called()
+
+
+def test_admit_rejects_invalid_ids(redis_client):
+    with pytest.raises(ValueError):
+        admission_control.admit('not-a-uuid')
+
+
+def test_draft_saved_under_variant_spelling_is_flushed_before_run(app, session_id):
+    variant = str(uuid.UUID(session_id)).upper()
+    with app.app_context():
+        session_drafts.edit(uuid.UUID(session_id), source_code="print('draft')")
+        assert session_drafts.draft_key(variant) == session_drafts.draft_key(session_id)
+
+        session_drafts.flush_if_dirty(variant)
+        assert session_drafts._load(uuid.UUID(session_id))['source_code'] == "print('draft')"
@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+import pytest
+from app.config import Config
+from app.runtime import cpp_cache
+
+pytestmark = pytest.mark.skipif(shutil.which('g++') is None, reason='g++ is not installed')
+
+# no #include, so no precompiled header is built in the background
+HELLO = 'extern "C" int puts(const char *); int main() { puts("hi"); }\n'
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CPP_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'CPP_CACHE_ENABLED', True)
+    return tmp_path
+
+
+def entry_dir(source):
+    return os.path.join(Config.CPP_CACHE_DIR, 'entries', cpp_cache.cache_key(source))
+
+
+def run(executable):
+    return subprocess.run([executable], capture_output=True, text=True, timeout=10).stdout
+
+
+def test_entry_evicted_while_running_keeps_its_executable():
+    with cpp_cache.compiled_program(HELLO, timeout=30):
+        pass
+    with cpp_cache.compiled_program(HELLO, timeout=30) as compiled:
+        assert compiled.cache_status == 'hit'
+        shutil.rmtree(entry_dir(HELLO))
+        assert run(compiled.executable) == 'hi\n'
+
+
+def test_entry_evicted_before_it_is_linked_compiles_again():
+    with cpp_cache.compiled_program(HELLO, timeout=30):
+        pass
+    # result.json was read but the program is already gone
+    os.remove(os.path.join(entry_dir(HELLO), 'program'))
+    with cpp_cache.compiled_program(HELLO, timeout=30) as compiled:
+        assert compiled.cache_status == 'miss'
+        assert run(compiled.executable) == 'hi\n'
+
+
+def test_compiler_output_is_bounded(monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_OUTPUT_SIZE', 1024)
+    source = ''.join(f'int f{i}() {{ return undeclared_{i}; }}\n' for i in range(200))
+    with cpp_cache.compiled_program(source, timeout=30) as compiled:
+        assert compiled.returncode != 0
+        assert compiled.executable is None
+        assert 'Output truncated' in compiled.stderr
+        assert len(compiled.stderr) < 2048
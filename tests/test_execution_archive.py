@@ -0,0 +1,61 @@
+"""Archival, restore, and what happens to archived executions when their session is deleted."""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app.models.code_sessions_model import CodeSession
+from app.models.db import db
+from app.models.execution_model import Execution
+from app.services import execution_archive
+
+
+@pytest.fixture
+def archived_execution(app, client, session_id, run_queued_task):
+    """A finished execution of ``session_id`` that has been moved to the archive"""
+    execution_id = client.post(
+        f'/executions/session/{session_id}/execute', json={'bypass_cache': True}
+    ).get_json()['execution_id']
+    run_queued_task()
+
+    with app.app_context():
+        db.session.query(Execution).filter(Execution.id == uuid.UUID(execution_id)).update(
+            {Execution.queued_at: datetime.utcnow() - timedelta(days=365)}, synchronize_session=False
+        )
+        db.session.commit()
+        assert execution_archive.archive_expired()['removed'] == 1
+    return execution_id
+
+
+def test_archived_execution_can_be_restored(client, archived_execution):
+    response = client.get(f'/executions/{archived_execution}')
+    assert response.status_code == 404
+    assert response.get_json()['archived'] is True
+
+    response = client.post(f'/executions/{archived_execution}/restore')
+    assert response.status_code == 200
+    assert response.get_json()['restored'] is True
+    assert response.get_json()['stdout'] == 'hi\n'
+    assert client.get(f'/executions/{archived_execution}').status_code == 200
+
+
+def test_deleting_the_session_forgets_its_archived_executions(app, client, session_id, archived_execution):
+    assert client.delete(f'/code-sessions/{session_id}').status_code < 300
+
+    response = client.get(f'/executions/{archived_execution}')
+    assert response.status_code == 404
+    assert 'archived' not in response.get_json()
+    assert client.post(f'/executions/{archived_execution}/restore').status_code == 404
+    with app.app_context():
+        assert not execution_archive.is_archived(uuid.UUID(archived_execution))
+
+
+def test_restore_of_an_orphaned_archive_entry_is_gone(app, client, session_id, archived_execution):
+    # the session disappeared without going through the API (e.g. removed by hand)
+    with app.app_context():
+        db.session.query(CodeSession).filter(CodeSession.id == uuid.UUID(session_id)).delete()
+        db.session.commit()
+
+    response = client.post(f'/api/v1/executions/{archived_execution}/restore')
+    assert response.status_code == 410
+    with app.app_context():
+        assert not execution_archive.is_archived(uuid.UUID(archived_execution))
+        assert db.session.get(Execution, uuid.UUID(archived_execution)) is None
@@ -0,0 +1,60 @@
+"""SSE streams must never report the status of an execution going backwards."""
+import json
+import uuid
+import pytest
+from app.services import execution_events, read_cache
+
+
+def frames(body):
+    found = []
+    for frame in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in frame.split('\n') if not line.startswith(':'))
+        found.append((lines['event'], json.loads(lines['data'])))
+    return found
+
+
+def statuses(body):
+    return [data['status'] for event, data in frames(body) if event == 'status']
+
+
+def stdout(body):
+    return ''.join(data['text'] for event, data in frames(body) if event == 'stdout')
+
+
+def execute(client, session_id):
+    return client.post(
+        f'/executions/session/{session_id}/execute', json={'bypass_cache': True}
+    ).get_json()['execution_id']
+
+
+@pytest.mark.parametrize('url', ['/executions/{}/stream', '/api/v1/executions/{}/stream'])
+def test_late_subscriber_sees_statuses_in_order(client, session_id, run_queued_task, url):
+    execution_id = execute(client, session_id)
+    run_queued_task()
+
+    body = client.get(url.format(execution_id)).get_data(as_text=True)
+    assert statuses(body) == ['RUNNING', 'COMPLETED']
+    assert stdout(body) == 'hi\n'
+
+
+def test_subscriber_after_the_log_expired_gets_the_result_once(app, client, session_id, run_queued_task, redis_client):
+    execution_id = execute(client, session_id)
+    run_queued_task()
+    redis_client.delete(f'execution:{execution_id}:log')
+    read_cache.invalidate_executions(execution_id)
+
+    body = client.get(f'/executions/{execution_id}/stream').get_data(as_text=True)
+    assert statuses(body) == ['COMPLETED']
+    assert stdout(body) == 'hi\n'
+
+
+def test_subscriber_before_the_run_gets_the_current_status(redis_client):
+    execution_id = str(uuid.uuid4())
+    publisher = execution_events.ExecutionEventPublisher(execution_id)
+    events = execution_events.stream(execution_id, execution_events.subscribe(execution_id), {'status': 'QUEUED'})
+    assert statuses(next(events)) == ['QUEUED']
+
+    # the run starts and finishes while the stream is open
+    publisher.status('RUNNING')
+    publisher.status('COMPLETED')
+    assert statuses(''.join(events)) == ['RUNNING', 'COMPLETED']
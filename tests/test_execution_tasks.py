@@ -0,0 +1,66 @@
+"""What the execution task leaves behind when its result cannot be stored."""
+import threading
+import uuid
+from unittest import mock
+import pytest
+from app import metrics
+from app.models.db import db
+from app.models.execution_model import Execution
+from app.services import execution_events
+from app.tasks import execution_tasks
+
+
+def execute(client, session_id):
+    return client.post(
+        f'/executions/session/{session_id}/execute', json={'bypass_cache': True}
+    ).get_json()['execution_id']
+
+
+def test_discarded_result_still_wakes_long_polls(app, client, session_id, run_queued_task):
+    execution_id = execute(client, session_id)
+    transition = execution_tasks._transition
+
+    def finished_elsewhere(row_id, from_statuses, **values):
+        if from_statuses == ('RUNNING',):
+            # e.g. another delivery of the task stored its result first
+            transition(row_id, from_statuses, **dict(values, status='TIMEOUT'))
+            return None
+        return transition(row_id, from_statuses, **values)
+
+    # a long-poll that is not woken sits out its whole wait
+    waiter = threading.Thread(target=execution_events.wait_for_terminal, args=(execution_id, 30), daemon=True)
+    with mock.patch.object(execution_tasks, '_transition', side_effect=finished_elsewhere):
+        waiter.start()
+        run_queued_task()
+    waiter.join(5)
+    assert not waiter.is_alive()
+    result = client.get(f'/executions/{execution_id}?wait=10').get_json()
+    assert result['status'] == 'TIMEOUT'
+
+
+def test_deleted_execution_ends_its_streams(app, client, session_id, run_queued_task, redis_client):
+    execution_id = execute(client, session_id)
+    transition = execution_tasks._transition
+
+    def deleted_meanwhile(row_id, from_statuses, **values):
+        if from_statuses == ('RUNNING',):
+            db.session.query(Execution).filter(Execution.id == row_id).delete(synchronize_session=False)
+            db.session.commit()
+        return transition(row_id, from_statuses, **values)
+
+    with mock.patch.object(execution_tasks, '_transition', side_effect=deleted_meanwhile):
+        run_queued_task()
+
+    assert redis_client.get(execution_events.status_key(uuid.UUID(execution_id))) == 'FAILED'
+
+
+def test_in_flight_gauge_is_released_when_the_run_is_interrupted(app, client, session_id, run_queued_task):
+    execute(client, session_id)
+    gauge = metrics.IN_FLIGHT.labels('python')
+    before = gauge._value.get()
+
+    with mock.patch.object(execution_tasks.source_store, 'get', side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            run_queued_task()
+
+    assert gauge._value.get() == before
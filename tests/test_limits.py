@@ -0,0 +1,15 @@
+import resource
+from app.config import Config
+from app.runtime import limits as execution_limits
+
+
+def test_process_cap_is_not_a_per_user_rlimit():
+    limits = execution_limits.configured('python')
+    assert limits.processes
+    assert resource.RLIMIT_NPROC not in dict(execution_limits.rlimits(limits))
+
+
+def test_rlimit_nproc_is_opt_in(monkeypatch):
+    monkeypatch.setattr(Config, 'EXECUTION_RLIMIT_NPROC', 64)
+    settings = dict(execution_limits.rlimits(execution_limits.configured('python')))
+    assert settings[resource.RLIMIT_NPROC] == (64, 64)
@@ -0,0 +1,33 @@
+"""The read cache must never pin a stale QUEUED/RUNNING status."""
+from unittest import mock
+from app.config import Config
+from app.services import read_cache
+
+
+def test_active_views_get_the_short_ttl(redis_client):
+    view = read_cache.execution_view('00000000-0000-0000-0000-000000000001', 'RUNNING')
+    read_cache.write_execution(view)
+    assert 0 < redis_client.ttl(read_cache._key('execution', view['execution_id'])) <= Config.READ_CACHE_ACTIVE_TTL
+
+    read_cache.write_execution(dict(view, status='COMPLETED'))
+    assert redis_client.ttl(read_cache._key('execution', view['execution_id'])) > Config.READ_CACHE_ACTIVE_TTL
+
+
+def test_lost_final_write_through_falls_back_to_the_database(client, session_id, run_queued_task):
+    response = client.post(f'/executions/session/{session_id}/execute', json={'bypass_cache': True})
+    execution_id = response.get_json()['execution_id']
+
+    write_execution = read_cache.write_execution
+
+    def drop_terminal_writes(view):
+        # a Redis blip (or a killed worker) right after the result was committed
+        if view['status'] not in ('QUEUED', 'RUNNING'):
+            return
+        write_execution(view)
+
+    with mock.patch.object(read_cache, 'write_execution', side_effect=drop_terminal_writes):
+        run_queued_task()
+
+    result = client.get(f'/executions/{execution_id}').get_json()
+    assert result['status'] == 'COMPLETED'
+    assert result['stdout'] == 'hi\n'
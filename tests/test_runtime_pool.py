@@ -0,0 +1,113 @@
+"""Warm runners must produce what the cold ``python -c`` / ``node -e`` path produces."""
+import shutil
+import subprocess
+import pytest
+from app.runtime import capture, pool
+from app.runtime import limits as execution_limits
+
+node = pytest.mark.skipif(shutil.which('node') is None, reason='Node.js is not installed')
+
+NO_LIMITS = execution_limits.Limits(0, 0, 0, 0)
+
+
+def cold(command, source_code):
+    return capture.run(command + [source_code], timeout=10)
+
+
+def warm(factory, source_code):
+    runner = factory(NO_LIMITS)
+    try:
+        return runner.run(source_code, timeout=10)
+    finally:
+        runner.close()
+
+
+def assert_same(cold_result, warm_result):
+    assert (warm_result.returncode, warm_result.stdout) == (cold_result.returncode, cold_result.stdout)
+
+
+@node
+@pytest.mark.parametrize('source_code', [
+    "console.log(1 + 1)",
+    "import os from 'os'; console.log(typeof os.cpus, typeof require)",
+    "export const x = 1; console.log(import.meta.url.startsWith('file:'))",
+    "const x = await Promise.resolve(5); console.log(x)",
+    "await new Promise((resolve) => setTimeout(resolve, 10)); process.exit(3)",
+    "let x = ;",
+])
+def test_node_runner_matches_node_e(source_code):
+    cold_result = cold(['node', '-e'], source_code)
+    warm_result = warm(pool.NodeRunner, source_code)
+    assert_same(cold_result, warm_result)
+    assert warm_result.stderr == cold_result.stderr
+
+
+@node
+def test_node_runner_hides_its_own_stack_frames():
+    result = warm(pool.NodeRunner, "function f() { null.x }\nf()")
+    assert result.returncode == 1
+    assert 'at f ([eval]:1:' in result.stderr
+    assert 'node_runner.js' not in result.stderr
+    assert 'node:vm' not in result.stderr
+
+
+@node
+def test_node_runner_keeps_primitive_throw_location():
+    cold_result = cold(['node', '-e'], "throw 'oops'")
+    warm_result = warm(pool.NodeRunner, "throw 'oops'")
+    assert_same(cold_result, warm_result)
+    assert warm_result.stderr == cold_result.stderr
+
+
+@pytest.mark.parametrize('source_code', [
+    "print('hi')",
+    "import sys; sys.exit(4)",
+    "raise ValueError('boom')",
+])
+def test_python_fork_server_matches_python_c(source_code):
+    cold_result = cold(['python', '-c'], source_code)
+    warm_result = warm(pool.PythonForkServer, source_code)
+    assert_same(cold_result, warm_result)
+    assert warm_result.stderr == cold_result.stderr
+
+
+def test_python_fork_server_reseeds_random_per_child():
+    server = pool.PythonForkServer(NO_LIMITS)
+    try:
+        outputs = {server.run("import random; print(random.random())", timeout=10).stdout for _ in range(3)}
+    finally:
+        server.close()
+    assert len(outputs) == 3
+
+
+def test_python_fork_server_that_never_reports_a_killed_child_is_replaced(monkeypatch):
+    monkeypatch.setattr(pool, 'KILL_WAIT', 0.2)
+    runtime_pool = pool.RuntimePool('python', lambda: pool.PythonForkServer(NO_LIMITS), 1, 100)
+    try:
+        server = runtime_pool._idle.queue[0]
+
+        def stuck(timeout):
+            raise TimeoutError('timed out')
+        monkeypatch.setattr(server, '_recv_exit', stuck)
+
+        with pytest.raises(subprocess.TimeoutExpired) as error:
+            runtime_pool.run('import time; time.sleep(30)', timeout=0.5)
+        assert error.value.usage is None
+        assert not server.alive()
+
+        replacement = runtime_pool._idle.queue[0]
+        assert replacement is not server
+        assert replacement.run("print('ok')", timeout=10).stdout == 'ok\n'
+    finally:
+        runtime_pool.close()
+
+
+def test_python_fork_server_kills_a_timed_out_child():
+    server = pool.PythonForkServer(NO_LIMITS)
+    try:
+        with pytest.raises(subprocess.TimeoutExpired) as error:
+            server.run('import time; time.sleep(30)', timeout=0.5)
+        assert error.value.usage is not None
+        assert server.run("print('ok')", timeout=10).stdout == 'ok\n'
+    finally:
+        server.close()
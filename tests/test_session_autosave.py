@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('base_version', ['1', 1.0, True, [1]])
+def test_non_integer_base_version_is_rejected(client, session_id, base_version):
+    payload = {'base_version': base_version, 'source_code': "print('x')"}
+    for url in (f'/code-sessions/{session_id}', f'/api/v1/code-sessions/{session_id}'):
+        response = client.patch(url, json=payload)
+        assert response.status_code == 400, url
+
+    session = client.get(f'/code-sessions/{session_id}').get_json()
+    assert session['source_code'] == "print('hi')"
+
+
+def test_integer_base_version_is_applied(client, session_id):
+    version = client.get(f'/code-sessions/{session_id}').get_json()['version']
+    response = client.patch(
+        f'/code-sessions/{session_id}', json={'base_version': version, 'source_code': "print('x')"}
+    )
+    assert response.status_code == 200
+    assert response.get_json()['version'] == version + 1